@@ -1,6 +1,4 @@
-import os
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, status
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, Request, UploadFile, File, Form, Query, status
 from typing import Optional
 
 from app.schemas.file import (
@@ -17,24 +15,39 @@ from app.schemas.file import (
     FileMoveRequest,
     FileMoveResponse,
     FileCopyRequest,
-    FileCopyResponse
+    FileCopyResponse,
+    FileVersionListResponse,
+    FileVersionDiffResponse,
+    FileVersionRestoreRequest,
+    SnapshotCreateRequest,
+    SnapshotResponse,
+    SnapshotListResponse,
+    SnapshotRestoreResponse,
+    BulkFileRequest,
+    BulkReadRequest,
+    BulkInfoResponse,
+    BulkReadResponse,
+    FileChecksumResponse,
+    ChecksumVerifyRequest,
+    ChecksumVerifyResponse
 )
 from app.services.file_service import file_service
-from app.core.security import get_mime_type, resolve_path
+from app.core.admission import admit, checksum_class, listing_class, METADATA, IO
 
 router = APIRouter()
 
 
-@router.get("/", response_model=FileListResponse, operation_id="list_files")
+@router.get("/", response_model=FileListResponse, operation_id="list_files", dependencies=[Depends(admit(listing_class))])
 async def list_files(
     chat_id: str = Query(..., description="Chat ID"),
     path: Optional[str] = Query(None, description="Directory path to list", json_schema_extra={"type": ["string", "null"]}),
-    recursive: bool = Query(False, description="List files recursively")
+    recursive: bool = Query(False, description="List files recursively"),
+    checksum: bool = Query(False, description="Include the SHA-256 of each file")
 ):
-    return await file_service.list_files(chat_id, path, recursive)
+    return await file_service.list_files(chat_id, path, recursive, checksum)
 
 
-@router.post("/upload", response_model=FileUploadResponse, operation_id="upload_file")
+@router.post("/upload", response_model=FileUploadResponse, operation_id="upload_file", dependencies=[Depends(admit(IO))])
 async def upload_file(
     chat_id: str = Form(..., description="Chat ID"),
     file: UploadFile = File(..., description="File to upload"),
@@ -43,7 +56,7 @@ async def upload_file(
     return await file_service.upload_file(chat_id, file, path)
 
 
-@router.post("/upload/multiple", response_model=MultipleFileUploadResponse, operation_id="upload_multiple_files")
+@router.post("/upload/multiple", response_model=MultipleFileUploadResponse, operation_id="upload_multiple_files", dependencies=[Depends(admit(IO))])
 async def upload_multiple_files(
     chat_id: str = Form(..., description="Chat ID"),
     files: list[UploadFile] = File(..., description="Files to upload"),
@@ -52,29 +65,19 @@ async def upload_multiple_files(
     return await file_service.upload_multiple_files(chat_id, files, path)
 
 
-@router.get("/download/{filename:path}", operation_id="download_file")
+@router.get("/download/{filename:path}", operation_id="download_file", dependencies=[Depends(admit(IO))])
 async def download_file(
+    request: Request,
     chat_id: str = Query(..., description="Chat ID"),
     filename: str = ...,
     path: Optional[str] = Query(None, json_schema_extra={"type": ["string", "null"]})
 ):
-    target_dir = resolve_path(path, base_dir=file_service._get_chat_dir(chat_id))
-    file_path = f"{target_dir}/{filename}"
-    
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="File not found")
-    
-    if os.path.isdir(file_path):
-        raise HTTPException(status_code=400, detail="Cannot download directory")
-    
-    return FileResponse(
-        path=file_path,
-        filename=filename,
-        media_type=get_mime_type(filename)
+    return await file_service.download_file(
+        chat_id, filename, path, request.headers.get("accept-encoding"), request.headers.get("range")
     )
 
 
-@router.get("/read/{filename:path}", response_model=FileReadResponse, operation_id="read_file")
+@router.get("/read/{filename:path}", response_model=FileReadResponse, operation_id="read_file", dependencies=[Depends(admit(IO))])
 async def read_file(
     chat_id: str = Query(..., description="Chat ID"),
     filename: str = ...,
@@ -83,15 +86,25 @@ async def read_file(
     return await file_service.read_file(chat_id, filename, path)
 
 
-@router.put("/write/{filename:path}", response_model=FileWriteResponse, operation_id="write_file")
+@router.put("/write/{filename:path}", response_model=FileWriteResponse, operation_id="write_file", dependencies=[Depends(admit(IO))])
 async def write_file(
     filename: str,
-    request: FileWriteRequest
+    request: FileWriteRequest,
+    http_request: Request
 ):
-    return await file_service.write_file(request.chat_id, filename, request.content, request.path)
+    return await file_service.write_file(
+        request.chat_id,
+        filename,
+        request.content,
+        request.path,
+        mode=request.mode,
+        patch=request.patch,
+        edits=request.edits,
+        base_etag=request.base_etag or http_request.headers.get("if-match")
+    )
 
 
-@router.post("/directory", response_model=DirectoryCreateResponse, operation_id="create_directory", status_code=status.HTTP_201_CREATED)
+@router.post("/directory", response_model=DirectoryCreateResponse, operation_id="create_directory", status_code=status.HTTP_201_CREATED, dependencies=[Depends(admit(METADATA))])
 async def create_directory(
     chat_id: str = Form(..., description="Chat ID"),
     name: str = Form(..., description="Directory name"),
@@ -100,12 +113,70 @@ async def create_directory(
     return await file_service.create_directory(chat_id, name, path)
 
 
-@router.delete("/chat/{chat_id}", response_model=FileDeleteResponse, operation_id="delete_chat_folder")
+@router.get("/versions/diff/{filename:path}", response_model=FileVersionDiffResponse, operation_id="diff_file_versions", dependencies=[Depends(admit(IO))])
+async def diff_file_versions(
+    chat_id: str = Query(..., description="Chat ID"),
+    filename: str = ...,
+    from_version: int = Query(..., description="Base version ID"),
+    to_version: Optional[int] = Query(None, description="Target version ID (default: current file)", json_schema_extra={"type": ["integer", "null"]}),
+    path: Optional[str] = Query(None, json_schema_extra={"type": ["string", "null"]})
+):
+    return await file_service.diff_versions(chat_id, filename, from_version, to_version, path)
+
+
+@router.post("/versions/restore/{filename:path}", response_model=FileWriteResponse, operation_id="restore_file_version", dependencies=[Depends(admit(IO))])
+async def restore_file_version(
+    filename: str,
+    request: FileVersionRestoreRequest
+):
+    return await file_service.restore_version(request.chat_id, filename, request)
+
+
+@router.get("/versions/{filename:path}", response_model=FileVersionListResponse, operation_id="list_file_versions", dependencies=[Depends(admit(METADATA))])
+async def list_file_versions(
+    chat_id: str = Query(..., description="Chat ID"),
+    filename: str = ...,
+    path: Optional[str] = Query(None, json_schema_extra={"type": ["string", "null"]})
+):
+    return await file_service.list_versions(chat_id, filename, path)
+
+
+@router.post("/snapshots", response_model=SnapshotResponse, operation_id="create_snapshot", status_code=status.HTTP_201_CREATED, dependencies=[Depends(admit(IO))])
+async def create_snapshot(
+    request: SnapshotCreateRequest
+):
+    return await file_service.create_snapshot(request.chat_id, request.name)
+
+
+@router.get("/snapshots", response_model=SnapshotListResponse, operation_id="list_snapshots", dependencies=[Depends(admit(METADATA))])
+async def list_snapshots(
+    chat_id: str = Query(..., description="Chat ID")
+):
+    return await file_service.list_snapshots(chat_id)
+
+
+@router.post("/snapshots/{snapshot_id}/restore", response_model=SnapshotRestoreResponse, operation_id="restore_snapshot", dependencies=[Depends(admit(IO))])
+async def restore_snapshot(
+    snapshot_id: int,
+    chat_id: str = Query(..., description="Chat ID")
+):
+    return await file_service.restore_snapshot(chat_id, snapshot_id)
+
+
+@router.delete("/snapshots/{snapshot_id}", response_model=FileDeleteResponse, operation_id="delete_snapshot", dependencies=[Depends(admit(METADATA))])
+async def delete_snapshot(
+    snapshot_id: int,
+    chat_id: str = Query(..., description="Chat ID")
+):
+    return await file_service.delete_snapshot(chat_id, snapshot_id)
+
+
+@router.delete("/chat/{chat_id}", response_model=FileDeleteResponse, operation_id="delete_chat_folder", dependencies=[Depends(admit(IO))])
 async def delete_chat_folder(chat_id: str):
     return await file_service.delete_chat_folder(chat_id)
 
 
-@router.delete("/{filename:path}", response_model=FileDeleteResponse, operation_id="delete_file")
+@router.delete("/{filename:path}", response_model=FileDeleteResponse, operation_id="delete_file", dependencies=[Depends(admit(IO))])
 async def delete_file(
     chat_id: str = Query(..., description="Chat ID"),
     filename: str = ...,
@@ -114,7 +185,7 @@ async def delete_file(
     return await file_service.delete_file(chat_id, filename, path)
 
 
-@router.get("/search", response_model=FileSearchResponse, operation_id="search_files")
+@router.get("/search", response_model=FileSearchResponse, operation_id="search_files", dependencies=[Depends(admit(IO))])
 async def search_files(
     chat_id: str = Query(..., description="Chat ID"),
     query: str = Query(..., description="Search query"),
@@ -124,23 +195,58 @@ async def search_files(
     return await file_service.search_files(chat_id, query, path, extensions)
 
 
-@router.get("/info/{filename:path}", response_model=FileInfoResponse, operation_id="get_file_info")
+@router.get("/info/{filename:path}", response_model=FileInfoResponse, operation_id="get_file_info", dependencies=[Depends(admit(checksum_class))])
 async def get_file_info(
     chat_id: str = Query(..., description="Chat ID"),
     filename: str = ...,
-    path: Optional[str] = Query(None, json_schema_extra={"type": ["string", "null"]})
+    path: Optional[str] = Query(None, json_schema_extra={"type": ["string", "null"]}),
+    checksum: bool = Query(False, description="Include the SHA-256 of the file")
+):
+    return await file_service.get_file_info(chat_id, filename, path, checksum)
+
+
+@router.post("/bulk/info", response_model=BulkInfoResponse, operation_id="get_files_info", dependencies=[Depends(admit(METADATA))])
+async def get_files_info(
+    request: BulkFileRequest
+):
+    """Stat many paths in one call; per-path failures are reported in `error`."""
+    return await file_service.get_files_info(request.chat_id, request)
+
+
+@router.post("/bulk/read", response_model=BulkReadResponse, operation_id="read_files", dependencies=[Depends(admit(IO))])
+async def read_files(
+    request: BulkReadRequest
+):
+    """Read many text files in one call, capped per file and in total; capped files are marked `truncated`."""
+    return await file_service.read_files(request.chat_id, request)
+
+
+@router.get("/checksum/{filename:path}", response_model=FileChecksumResponse, operation_id="get_file_checksum", dependencies=[Depends(admit(IO))])
+async def get_file_checksum(
+    chat_id: str = Query(..., description="Chat ID"),
+    filename: str = ...,
+    path: Optional[str] = Query(None, json_schema_extra={"type": ["string", "null"]}),
+    chunks: bool = Query(True, description="Include per-chunk checksums")
+):
+    return await file_service.get_checksum(chat_id, filename, path, chunks)
+
+
+@router.post("/checksum/verify", response_model=ChecksumVerifyResponse, operation_id="verify_checksums", dependencies=[Depends(admit(IO))])
+async def verify_checksums(
+    request: ChecksumVerifyRequest
 ):
-    return await file_service.get_file_info(chat_id, filename, path)
+    """Checksum every file of a chat directory, comparing against `expected` when given."""
+    return await file_service.verify_checksums(request.chat_id, request)
 
 
-@router.post("/move", response_model=FileMoveResponse, operation_id="move_file")
+@router.post("/move", response_model=FileMoveResponse, operation_id="move_file", dependencies=[Depends(admit(IO))])
 async def move_file(
     request: FileMoveRequest
 ):
     return await file_service.move_file(request.chat_id, request)
 
 
-@router.post("/copy", response_model=FileCopyResponse, operation_id="copy_file")
+@router.post("/copy", response_model=FileCopyResponse, operation_id="copy_file", dependencies=[Depends(admit(IO))])
 async def copy_file(
     request: FileCopyRequest
 ):
@@ -0,0 +1,88 @@
+from fastapi import APIRouter, Header, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional, Union
+
+from app.schemas.langflow import (
+    LangflowSessionListResponse,
+    LangflowMessageListResponse,
+    LangflowSyncResponse,
+    LangflowSessionActionResponse,
+    ChatStreamRequest,
+    ChatStreamCancelResponse
+)
+from app.services.langflow_service import langflow_service
+from app.services.chat_stream_service import chat_stream_service, StoredStreamRun, StreamRun
+
+router = APIRouter()
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def _sse(run: Union[StreamRun, StoredStreamRun], offset: int) -> StreamingResponse:
+    return StreamingResponse(
+        run.frames_from(offset),
+        media_type="text/event-stream",
+        headers={**SSE_HEADERS, "X-Stream-Id": run.id}
+    )
+
+
+@router.get("/sessions", response_model=LangflowSessionListResponse, operation_id="list_langflow_sessions")
+async def list_sessions(
+    limit: int = Query(50, ge=1, le=500, description="Page size"),
+    offset: int = Query(0, ge=0, description="Number of sessions to skip"),
+    flow_id: Optional[str] = Query(None, description="Only sessions of this flow", json_schema_extra={"type": ["string", "null"]})
+):
+    return await langflow_service.list_sessions(limit, offset, flow_id)
+
+
+@router.get("/sessions/{session_id}/messages", response_model=LangflowMessageListResponse, operation_id="get_langflow_session_messages")
+async def get_session_messages(
+    session_id: str,
+    limit: int = Query(500, ge=1, le=5000, description="Page size"),
+    offset: int = Query(0, ge=0, description="Number of messages to skip")
+):
+    return await langflow_service.session_messages(session_id, limit, offset)
+
+
+@router.post("/sync", response_model=LangflowSyncResponse, operation_id="sync_langflow_index")
+async def sync_index(
+    force: bool = Query(False, description="Refetch every session instead of only new and active ones")
+):
+    return await langflow_service.sync(force=force)
+
+
+@router.post("/sessions/{session_id}/invalidate", response_model=LangflowSessionActionResponse, operation_id="invalidate_langflow_session")
+async def invalidate_session(session_id: str):
+    return await langflow_service.invalidate(session_id)
+
+
+@router.delete("/sessions/{session_id}", response_model=LangflowSessionActionResponse, operation_id="delete_langflow_session")
+async def delete_session(session_id: str):
+    return await langflow_service.delete_session(session_id)
+
+
+@router.post("/chat/stream", operation_id="stream_langflow_chat")
+async def stream_chat(request: ChatStreamRequest):
+    """Run a flow and stream the reply as SSE (events: start, delta, message, end, error)."""
+    run = await chat_stream_service.start(
+        request.flow_id, request.input_value, request.session_id, request.api, request.tweaks
+    )
+    return _sse(run, 0)
+
+
+@router.get("/chat/streams/{stream_id}", operation_id="resume_langflow_chat_stream")
+async def resume_chat_stream(
+    stream_id: str,
+    offset: Optional[int] = Query(None, ge=0, description="First event ID to send", json_schema_extra={"type": ["integer", "null"]}),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    run = await chat_stream_service.get(stream_id)
+    if offset is None:
+        offset = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+    return _sse(run, offset)
+
+
+@router.delete("/chat/streams/{stream_id}", response_model=ChatStreamCancelResponse, operation_id="cancel_langflow_chat_stream")
+async def cancel_chat_stream(stream_id: str):
+    await chat_stream_service.cancel(stream_id)
+    return ChatStreamCancelResponse(success=True, stream_id=stream_id, message="Stream cancelled")
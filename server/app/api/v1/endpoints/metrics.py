@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+
+from app.schemas.metrics import AdmissionMetricsResponse, FileCacheMetricsResponse
+from app.core.admission import admission_controller
+from app.services.file_cache import file_cache
+
+router = APIRouter()
+
+
+@router.get("/admission", response_model=AdmissionMetricsResponse, operation_id="get_admission_metrics")
+async def get_admission_metrics():
+    return admission_controller.metrics()
+
+
+@router.get("/file-cache", response_model=FileCacheMetricsResponse, operation_id="get_file_cache_metrics")
+async def get_file_cache_metrics():
+    return file_cache.metrics()
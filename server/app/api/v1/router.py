@@ -1,6 +1,8 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import files
+from app.api.v1.endpoints import files, langflow, metrics
 
 api_router = APIRouter()
 
 api_router.include_router(files.router, prefix="/files", tags=["files"])
+api_router.include_router(langflow.router, prefix="/langflow", tags=["langflow"])
+api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
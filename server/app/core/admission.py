@@ -0,0 +1,283 @@
+import math
+import time
+import asyncio
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, Optional, Tuple, Union
+from fastapi import HTTPException, Request
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Cheap metadata calls vs. calls that read, write or walk file contents
+METADATA = "metadata"
+IO = "io"
+
+
+@dataclass
+class OperationLimits:
+    rate: float
+    burst: int
+    concurrency: int
+    global_concurrency: int
+
+
+def operation_limits() -> Dict[str, OperationLimits]:
+    return {
+        METADATA: OperationLimits(
+            rate=settings.ADMISSION_METADATA_RATE,
+            burst=settings.ADMISSION_METADATA_BURST,
+            concurrency=settings.ADMISSION_METADATA_CONCURRENCY,
+            global_concurrency=settings.ADMISSION_METADATA_GLOBAL_CONCURRENCY
+        ),
+        IO: OperationLimits(
+            rate=settings.ADMISSION_IO_RATE,
+            burst=settings.ADMISSION_IO_BURST,
+            concurrency=settings.ADMISSION_IO_CONCURRENCY,
+            global_concurrency=settings.ADMISSION_IO_GLOBAL_CONCURRENCY
+        ),
+    }
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> Tuple[bool, float]:
+        """Take one token, or return how many seconds until one is available."""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True, 0.0
+        return False, (1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+
+class FairSemaphore:
+    """Semaphore whose waiters are served round-robin per owner (chat).
+
+    A chat with a hundred queued requests gets one slot per turn, the same as
+    a chat with a single queued request.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.in_use = 0
+        self._waiters: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+    def waiting(self, owner: Optional[str] = None) -> int:
+        if owner is not None:
+            return len(self._waiters.get(owner, ()))
+        return sum(len(q) for q in self._waiters.values())
+
+    async def acquire(self, owner: str, timeout: float) -> None:
+        if self.in_use < self.capacity and not self._waiters:
+            self.in_use += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(owner, deque()).append(future)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the deadline hit
+                self.release()
+            else:
+                self._discard(owner, future)
+            raise
+
+    def release(self) -> None:
+        self.in_use -= 1
+        while self.in_use < self.capacity and self._waiters:
+            owner, queue = next(iter(self._waiters.items()))
+            future = queue.popleft()
+            if queue:
+                self._waiters.move_to_end(owner)
+            else:
+                del self._waiters[owner]
+            if not future.done():
+                future.set_result(True)
+                self.in_use += 1
+
+    def _discard(self, owner: str, future: asyncio.Future) -> None:
+        queue = self._waiters.get(owner)
+        if queue is None:
+            return
+        try:
+            queue.remove(future)
+        except ValueError:
+            pass
+        if not queue:
+            del self._waiters[owner]
+
+
+@dataclass
+class ChatLoad:
+    bucket: TokenBucket
+    slots: FairSemaphore
+    in_flight: int = 0
+    admitted: int = 0
+    rejected: int = 0
+    last_seen: float = field(default_factory=time.monotonic)
+
+
+class AdmissionController:
+    """Per-chat admission control for file operations.
+
+    Each (chat, operation class) pair has a token bucket and a concurrency
+    cap; each operation class also has a global concurrency cap shared fairly
+    between chats. Requests that cannot start before the queue deadline are
+    rejected with 429 and a Retry-After hint instead of piling up. Limits are
+    per worker process.
+    """
+
+    IDLE_EXPIRY = 600.0
+
+    def __init__(self):
+        self.limits = operation_limits()
+        self._chats: Dict[Tuple[str, str], ChatLoad] = {}
+        self._global = {name: FairSemaphore(limits.global_concurrency) for name, limits in self.limits.items()}
+        self._last_sweep = time.monotonic()
+
+    def _load(self, chat_id: str, op_class: str) -> ChatLoad:
+        load = self._chats.get((chat_id, op_class))
+        if load is None:
+            limits = self.limits[op_class]
+            load = ChatLoad(bucket=TokenBucket(limits.rate, limits.burst), slots=FairSemaphore(limits.concurrency))
+            self._chats[(chat_id, op_class)] = load
+        load.last_seen = time.monotonic()
+        return load
+
+    def _sweep(self) -> None:
+        now = time.monotonic()
+        if now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        for key, load in list(self._chats.items()):
+            if load.in_flight == 0 and load.slots.waiting() == 0 and now - load.last_seen > self.IDLE_EXPIRY:
+                del self._chats[key]
+
+    def _reject(self, load: ChatLoad, detail: str, retry_after: float) -> HTTPException:
+        load.rejected += 1
+        return HTTPException(
+            status_code=429,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+    async def acquire(self, chat_id: str, op_class: str) -> ChatLoad:
+        self._sweep()
+        load = self._load(chat_id, op_class)
+        allowed, retry_after = load.bucket.try_acquire()
+        if not allowed:
+            raise self._reject(load, f"Rate limit exceeded for {op_class} operations", retry_after)
+        if load.slots.waiting() >= settings.ADMISSION_MAX_QUEUE:
+            raise self._reject(load, f"Too many queued {op_class} operations", settings.ADMISSION_QUEUE_TIMEOUT)
+
+        deadline = time.monotonic() + settings.ADMISSION_QUEUE_TIMEOUT
+        try:
+            await load.slots.acquire(chat_id, settings.ADMISSION_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise self._reject(load, f"Timed out waiting for a {op_class} slot", settings.ADMISSION_QUEUE_TIMEOUT)
+        try:
+            await self._global[op_class].acquire(chat_id, max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            load.slots.release()
+            raise self._reject(load, f"Server busy with {op_class} operations", settings.ADMISSION_QUEUE_TIMEOUT)
+        except asyncio.CancelledError:
+            load.slots.release()
+            raise
+        load.in_flight += 1
+        load.admitted += 1
+        return load
+
+    def release(self, load: ChatLoad, op_class: str) -> None:
+        load.in_flight -= 1
+        self._global[op_class].release()
+        load.slots.release()
+
+    def metrics(self) -> dict:
+        chats: Dict[str, dict] = {}
+        for (chat_id, op_class), load in self._chats.items():
+            load.bucket._refill()
+            chats.setdefault(chat_id, {})[op_class] = {
+                "in_flight": load.in_flight,
+                "queued": load.slots.waiting(),
+                "admitted": load.admitted,
+                "rejected": load.rejected,
+                "tokens": round(load.bucket.tokens, 2)
+            }
+        classes = {
+            name: {
+                "rate": limits.rate,
+                "burst": limits.burst,
+                "concurrency": limits.concurrency,
+                "global_concurrency": limits.global_concurrency,
+                "global_in_use": self._global[name].in_use,
+                "global_queued": self._global[name].waiting()
+            }
+            for name, limits in self.limits.items()
+        }
+        return {"enabled": settings.ADMISSION_ENABLED, "classes": classes, "chats": chats}
+
+
+admission_controller = AdmissionController()
+
+
+async def _request_chat_id(request: Request) -> str:
+    chat_id = request.path_params.get("chat_id") or request.query_params.get("chat_id")
+    if chat_id:
+        return chat_id
+    # FastAPI has already read and cached the body by the time dependencies run
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith("application/json"):
+            body = await request.json()
+            if isinstance(body, dict) and body.get("chat_id"):
+                return str(body["chat_id"])
+        elif content_type.startswith(("multipart/form-data", "application/x-www-form-urlencoded")):
+            form = await request.form()
+            if form.get("chat_id"):
+                return str(form["chat_id"])
+    except Exception:
+        pass
+    return "_anonymous"
+
+
+def admit(op_class: Union[str, Callable[[Request], str]]):
+    """Route dependency: `dependencies=[Depends(admit(IO))]`."""
+
+    async def dependency(request: Request):
+        if not settings.ADMISSION_ENABLED:
+            yield
+            return
+        resolved = op_class(request) if callable(op_class) else op_class
+        chat_id = await _request_chat_id(request)
+        load = await admission_controller.acquire(chat_id, resolved)
+        try:
+            yield
+        finally:
+            admission_controller.release(load, resolved)
+
+    return dependency
+
+
+def _flag(request: Request, name: str) -> bool:
+    return request.query_params.get(name, "").lower() in ("1", "true")
+
+
+def listing_class(request: Request) -> str:
+    # A recursive listing walks the whole tree and checksums read every file; both cost like I/O
+    return IO if _flag(request, "recursive") or _flag(request, "checksum") else METADATA
+
+
+def checksum_class(request: Request) -> str:
+    return IO if _flag(request, "checksum") else METADATA
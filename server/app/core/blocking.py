@@ -0,0 +1,37 @@
+import asyncio
+import sqlite3
+import threading
+from typing import Any, Callable, Optional
+
+
+async def run_blocking(fn: Callable[..., Any], *args) -> Any:
+    """Run a blocking call (disk, network, SQLite) in a worker thread, off the event loop."""
+    return await asyncio.to_thread(fn, *args)
+
+
+class ThreadLocalConnection:
+    """One autocommit SQLite connection per thread; call the instance to get it.
+
+    SQLite connections cannot be shared between threads, and run_blocking
+    hands calls to whichever pool thread is free. A long busy timeout lets
+    writers on other workers and nodes queue instead of failing.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def __call__(self) -> sqlite3.Connection:
+        conn: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout = 30000")
+            self._local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        """Close this thread's connection, if it has one."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,184 @@
+import zlib
+from typing import Dict, List, Optional, Tuple
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import get_settings
+
+try:
+    import brotli
+except ImportError:  # optional, enables "br"
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional, enables "zstd"
+    zstandard = None
+
+settings = get_settings()
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/x-ndjson",
+    "image/svg+xml",
+)
+
+# Levels for responses compressed on the fly vs. variants compressed once and cached
+DYNAMIC_LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+STATIC_LEVELS = {"zstd": 19, "br": 9, "gzip": 9}
+
+
+def available_encodings() -> List[str]:
+    # Server preference order
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return [e for e in encodings if e in settings.COMPRESSION_ENCODINGS]
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    if not accept_encoding:
+        return None
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    best: Tuple[float, Optional[str]] = (0.0, None)
+    for encoding in available_encodings():
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best[0]:
+            best = (q, encoding)
+    return best[1]
+
+
+def is_compressible(media_type: Optional[str]) -> bool:
+    if not media_type:
+        return False
+    media_type = media_type.split(";")[0].strip().lower()
+    return media_type.startswith(COMPRESSIBLE_TYPES) and media_type != "text/event-stream"
+
+
+class StreamCompressor:
+    def __init__(self, encoding: str, level: Optional[int] = None):
+        level = DYNAMIC_LEVELS[encoding] if level is None else level
+        if encoding == "gzip":
+            obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+            self._compress, self._finish = obj.compress, obj.flush
+            self._flush = lambda: obj.flush(zlib.Z_SYNC_FLUSH)
+        elif encoding == "br":
+            obj = brotli.Compressor(quality=level)
+            self._compress, self._finish, self._flush = obj.process, obj.finish, obj.flush
+        elif encoding == "zstd":
+            obj = zstandard.ZstdCompressor(level=level).compressobj()
+            self._compress, self._finish = obj.compress, obj.flush
+            self._flush = lambda: obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        else:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compress(data)
+
+    def flush(self) -> bytes:
+        """Emit everything compressed so far without ending the stream."""
+        return self._flush()
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    compressor = StreamCompressor(encoding, level)
+    return compressor.compress(data) + compressor.finish()
+
+
+class CompressionMiddleware:
+    """Content-Encoding negotiation (zstd, br, gzip) for compressible responses.
+
+    Responses that already carry a Content-Encoding (e.g. cached download
+    variants) and event streams pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = settings.COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressionResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Send = None
+        self.start_message: Optional[Message] = None
+        self.passthrough = False
+        self.compressor: Optional[StreamCompressor] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_with_compression)
+
+    async def send_with_compression(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self.passthrough = "content-encoding" in headers or not is_compressible(headers.get("content-type"))
+            if self.passthrough:
+                await self.send(message)
+            else:
+                # Delay until the first body chunk tells us whether compression pays off
+                self.start_message = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            self.compressor = StreamCompressor(self.encoding)
+            if not more_body:
+                body = self.compressor.compress(body) + self.compressor.finish()
+                headers["Content-Length"] = str(len(body))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            del headers["Content-Length"]
+            await self.send(start)
+
+        data = self.compressor.compress(body)
+        # Flush every chunk so streamed responses (NDJSON results) reach the client as they are produced
+        data += self.compressor.flush() if more_body else self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
@@ -1,7 +1,10 @@
+import os
 from pydantic_settings import BaseSettings
-from pydantic import ConfigDict
+from pydantic import ConfigDict, model_validator
 from functools import lru_cache
-from typing import List
+from typing import List, Optional
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
 class Settings(BaseSettings):
@@ -19,12 +22,127 @@ class Settings(BaseSettings):
         'jpg', 'jpeg', 'png', 'gif', 'webp', 'svg', 'pdf', 'doc', 'docx', 'xls', 'xlsx'
     ]
     MAX_UPLOAD_SIZE: int = 100 * 1024 * 1024
+
+    # Bulk info/read endpoints: paths per request, concurrent filesystem calls, byte caps
+    BULK_MAX_PATHS: int = 500
+    BULK_CONCURRENCY: int = 16
+    BULK_READ_MAX_FILE_BYTES: int = 1024 * 1024
+    BULK_READ_MAX_TOTAL_BYTES: int = 16 * 1024 * 1024
+
+    # Checksums: SHA-256 over memory-mapped files, per-chunk digests above CHECKSUM_CHUNK_SIZE
+    CHECKSUM_WORKERS: int = 4
+    CHECKSUM_CHUNK_SIZE: int = 4 * 1024 * 1024
+    CHECKSUM_CACHE_ENTRIES: int = 10000
+
+    # In-memory hot-file cache for read_file/download_file (W-TinyLFU, per worker process)
+    FILE_CACHE_ENABLED: bool = True
+    FILE_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    FILE_CACHE_MAX_FILE_BYTES: int = 4 * 1024 * 1024
+    FILE_CACHE_WINDOW_RATIO: float = 0.01
+    FILE_CACHE_PROTECTED_RATIO: float = 0.8
+
+    # Server state (locks, version store, Langflow index, caches). Relative state
+    # paths below resolve against DATA_DIR, never against the working directory.
+    DATA_DIR: str = os.path.join(SERVER_DIR, "data")
+
+    # Deployment: several workers per node and several nodes on a shared volume
+    WORKERS: int = 1
+    COORDINATION_BACKEND: str = "sqlite"
+    COORDINATION_DIR: str = "coordination"
+    LOCK_TIMEOUT: float = 10.0
+    INVALIDATION_POLL_INTERVAL: float = 1.0
+
+    # Storage: "local" (UPLOAD_DIR), "memory" (tests/benchmarks) or "s3"
+    STORAGE_BACKEND: str = "local"
+    # Local writes go to a temp file renamed into place; fsync: "none", "data" or "full"
+    WRITE_FSYNC: str = "data"
+    S3_BUCKET: str = ""
+    S3_PREFIX: str = ""
+    S3_ENDPOINT_URL: Optional[str] = None
+    S3_REGION: Optional[str] = None
+    S3_ACCESS_KEY_ID: Optional[str] = None
+    S3_SECRET_ACCESS_KEY: Optional[str] = None
+    S3_MAX_POOL_CONNECTIONS: int = 32
+    S3_MULTIPART_THRESHOLD: int = 8 * 1024 * 1024
+    S3_PART_SIZE: int = 8 * 1024 * 1024
+    S3_MAX_CONCURRENCY: int = 8
+    # Empty disables the read-through cache
+    S3_CACHE_DIR: Optional[str] = "s3cache"
+    S3_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024
+
+    # Response compression and compressed at-rest storage for text files
+    COMPRESSION_ENCODINGS: List[str] = ["zstd", "br", "gzip"]
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_CACHE_DIR: str = "compression-cache"
+    COMPRESSION_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    COMPRESSED_STORAGE: bool = False
+    COMPRESSED_STORAGE_EXTENSIONS: List[str] = [
+        'txt', 'md', 'json', 'js', 'ts', 'tsx', 'jsx', 'py', 'html', 'css', 'csv', 'svg'
+    ]
+
+    # Per-file version history (deduplicated chunk store)
+    VERSIONING_ENABLED: bool = True
+    VERSION_STORE_DIR: str = "versions"
+    VERSION_CHUNK_SIZE: int = 16 * 1024
+    VERSION_MAX_FILE_SIZE: int = 20 * 1024 * 1024
+    VERSION_MAX_COUNT: int = 50
+    VERSION_MAX_AGE_DAYS: float = 30
+    VERSION_MAX_BYTES: int = 1024 * 1024 * 1024
+
+    # Per-chat admission control for the files API and MCP tools (per worker process)
+    ADMISSION_ENABLED: bool = True
+    # Opening a chat in the UI fetches every file separately, so bursts cover a few hundred requests;
+    # requests over the concurrency caps queue rather than fail
+    ADMISSION_METADATA_RATE: float = 100.0
+    ADMISSION_METADATA_BURST: int = 500
+    ADMISSION_METADATA_CONCURRENCY: int = 16
+    ADMISSION_METADATA_GLOBAL_CONCURRENCY: int = 128
+    ADMISSION_IO_RATE: float = 50.0
+    ADMISSION_IO_BURST: int = 300
+    ADMISSION_IO_CONCURRENCY: int = 8
+    ADMISSION_IO_GLOBAL_CONCURRENCY: int = 32
+    ADMISSION_MAX_QUEUE: int = 512
+    ADMISSION_QUEUE_TIMEOUT: float = 10.0
+
+    # Langflow: session/history index synced incrementally from the monitor API
+    LANGFLOW_URL: str = ""
+    LANGFLOW_API_KEY: Optional[str] = None
+    LANGFLOW_INDEX_DB: str = "langflow/index.db"
+    LANGFLOW_SYNC_INTERVAL: float = 5.0
+    # Known sessions are only refetched while active within this window (seconds)
+    LANGFLOW_ACTIVE_WINDOW: float = 3600.0
+    # Every this many seconds a sync refetches all sessions, picking up messages added to older ones
+    LANGFLOW_FULL_SYNC_INTERVAL: float = 600.0
+    LANGFLOW_SYNC_CONCURRENCY: int = 8
+    LANGFLOW_SUGGESTION_SESSION_ID: Optional[str] = None
+    LANGFLOW_TIMEOUT: float = 60.0
+    LANGFLOW_MAX_CONNECTIONS: int = 100
+    LANGFLOW_MAX_KEEPALIVE: int = 20
+    # Streaming chat proxy: token deltas are coalesced into one SSE frame per budget
+    LANGFLOW_STREAM_COALESCE_MS: float = 50.0
+    LANGFLOW_STREAM_COALESCE_CHARS: int = 256
+    LANGFLOW_STREAM_READ_TIMEOUT: float = 300.0
+    LANGFLOW_STREAM_KEEPALIVE: float = 15.0
+    # Finished streams stay resumable for this many seconds
+    LANGFLOW_STREAM_RETENTION: float = 300.0
+    # Frames of running streams are shared here so any worker or node can resume or cancel them
+    LANGFLOW_STREAM_DB: str = "langflow/streams.db"
+    LANGFLOW_STREAM_POLL_INTERVAL: float = 0.25
     
     model_config = ConfigDict(
         env_file=".env",
         case_sensitive=True
     )
 
+    @model_validator(mode="after")
+    def _resolve_state_paths(self) -> "Settings":
+        self.DATA_DIR = os.path.abspath(self.DATA_DIR)
+        for name in ("COORDINATION_DIR", "S3_CACHE_DIR", "COMPRESSION_CACHE_DIR", "VERSION_STORE_DIR", "LANGFLOW_INDEX_DB", "LANGFLOW_STREAM_DB"):
+            value = getattr(self, name)
+            if value:
+                setattr(self, name, os.path.join(self.DATA_DIR, value))
+        return self
+
 
 @lru_cache()
 def get_settings() -> Settings:
@@ -0,0 +1,97 @@
+import re
+from typing import List, Sequence, Tuple
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class PatchError(ValueError):
+    """The patch itself is malformed."""
+
+
+class PatchConflictError(ValueError):
+    """The patch does not apply to the current content."""
+
+
+def apply_edits(text: str, edits: Sequence[Tuple[int, int, str]]) -> str:
+    """Replace character ranges [start, end) of `text`; ranges refer to the original text."""
+    ordered = sorted(edits, key=lambda e: (e[0], e[1]))
+    previous_end = 0
+    for start, end, _ in ordered:
+        if start < previous_end or start > end:
+            raise PatchError("Edit ranges must be non-overlapping with start <= end")
+        previous_end = end
+    if ordered and previous_end > len(text):
+        raise PatchConflictError("Edit range extends past the end of the file")
+
+    parts: List[str] = []
+    cursor = 0
+    for start, end, replacement in ordered:
+        parts.append(text[cursor:start])
+        parts.append(replacement)
+        cursor = end
+    parts.append(text[cursor:])
+    return "".join(parts)
+
+
+def apply_unified_diff(text: str, diff: str) -> str:
+    """Apply a unified diff (as produced by `diff -u` / `git diff`) to `text`.
+
+    Context and removed lines must match exactly; anything else is a conflict.
+    """
+    source = text.splitlines(keepends=True)
+    diff_lines = diff.splitlines(keepends=True)
+    result: List[str] = []
+    cursor = 0
+    i = 0
+
+    while i < len(diff_lines) and not diff_lines[i].startswith("@@"):
+        i += 1
+    if i == len(diff_lines):
+        raise PatchError("No hunks found in diff")
+
+    while i < len(diff_lines):
+        match = HUNK_HEADER.match(diff_lines[i])
+        if not match:
+            raise PatchError(f"Invalid hunk header: {diff_lines[i].rstrip()}")
+        old_start = int(match.group(1))
+        old_count = int(match.group(2)) if match.group(2) is not None else 1
+        # A zero-length old range points at the line *before* the insertion
+        position = old_start - 1 if old_count else old_start
+        if position < cursor:
+            raise PatchError("Hunks overlap or are out of order")
+        result.extend(source[cursor:position])
+        cursor = position
+        last_op = ""
+        i += 1
+
+        while i < len(diff_lines) and not diff_lines[i].startswith("@@"):
+            line = diff_lines[i]
+            i += 1
+            if line.startswith("\\"):
+                # "\ No newline at end of file" applies to the previous line
+                if result and result[-1].endswith("\n") and last_op != "-":
+                    result[-1] = result[-1][:-1]
+                continue
+            op, body = line[:1], line[1:]
+            last_op = op
+            if op == "+":
+                result.append(body)
+            elif op in (" ", "-"):
+                current = source[cursor] if cursor < len(source) else None
+                if current is None or current.rstrip("\r\n") != body.rstrip("\r\n"):
+                    raise PatchConflictError(f"Patch does not apply at line {cursor + 1}")
+                if op == " ":
+                    result.append(current)
+                cursor += 1
+            elif line.strip() == "":
+                # Some tools strip the leading space of empty context lines
+                current = source[cursor] if cursor < len(source) else None
+                if current is None or current.strip() != "":
+                    raise PatchConflictError(f"Patch does not apply at line {cursor + 1}")
+                result.append(current)
+                cursor += 1
+            else:
+                raise PatchError(f"Invalid diff line: {line.rstrip()}")
+
+    result.extend(source[cursor:])
+    return "".join(result)
@@ -1,4 +1,5 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi_mcp import FastApiMCP
@@ -6,7 +7,10 @@ from fastmcp.server.openapi import RouteMap, MCPType
 import uvicorn
 
 from app.core.config import get_settings
+from app.core.compression import CompressionMiddleware
 from app.api.v1.router import api_router
+from app.services.coordination import coordinator
+from app.services.langflow_service import langflow_client
 from FDocs import f_docs
 
 settings = get_settings()
@@ -17,7 +21,13 @@ async def lifespan(app: FastAPI):
     print(f"Starting {settings.TITLE} server...")
     print(f"Upload directory: {settings.UPLOAD_DIR}")
     print(f"MCP endpoint: /mcp")
+    print(f"Coordination: {settings.COORDINATION_BACKEND} ({coordinator.node_id})")
+    listener = asyncio.create_task(coordinator.run_invalidation_listener())
     yield
+    listener.cancel()
+    with suppress(asyncio.CancelledError):
+        await listener
+    await langflow_client.close()
     print(f"Shutting down {settings.TITLE} server...")
 
 
@@ -30,6 +40,7 @@ app = FastAPI(
 )
 app = f_docs(app)
 
+app.add_middleware(CompressionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.ALLOWED_ORIGINS,
@@ -65,6 +76,7 @@ combined_app = FastAPI(
     lifespan=lifespan,
 )
 
+combined_app.add_middleware(CompressionMiddleware)
 combined_app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.ALLOWED_ORIGINS,
@@ -77,10 +89,20 @@ mcp = FastApiMCP(combined_app)
 mcp.mount()
 
 if __name__ == "__main__":
-    uvicorn.run(
-        combined_app,
-        host=settings.HOST,
-        port=settings.PORT,
-        log_level="info"
-    )
+    if settings.WORKERS > 1:
+        # Worker processes import the app themselves, so it has to be passed by reference
+        uvicorn.run(
+            "app.main:combined_app",
+            host=settings.HOST,
+            port=settings.PORT,
+            workers=settings.WORKERS,
+            log_level="info"
+        )
+    else:
+        uvicorn.run(
+            combined_app,
+            host=settings.HOST,
+            port=settings.PORT,
+            log_level="info"
+        )
 
@@ -1,4 +1,4 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 from pydantic import BaseModel, Field
 
 
@@ -11,6 +11,7 @@ class FileItem(BaseModel):
     mime_type: Optional[str] = None
     chat_id: str
     children: Optional[List[Any]] = None
+    checksum: Optional[str] = None
 
 
 
@@ -44,12 +45,23 @@ class FileReadResponse(BaseModel):
     mime_type: Optional[str]
     size: int
     chat_id: str
+    etag: Optional[str] = None
+
+
+class FileEdit(BaseModel):
+    start: int = Field(..., ge=0, description="Start character offset in the current content")
+    end: int = Field(..., ge=0, description="End character offset (exclusive) in the current content")
+    content: str = Field(..., description="Replacement text")
 
 
 class FileWriteRequest(BaseModel):
     chat_id: str = Field(..., description="Chat ID")
-    content: str = Field(..., description="Content to write")
+    content: Optional[str] = Field(None, description="Content to write (overwrite) or append (append)", json_schema_extra={"type": ["string", "null"]})
     path: Optional[str] = Field(None, description="Target directory path", json_schema_extra={"type": ["string", "null"]})
+    mode: Literal["overwrite", "append", "patch"] = Field("overwrite", description="'overwrite', 'append' or 'patch'")
+    patch: Optional[str] = Field(None, description="Unified diff to apply (patch mode)", json_schema_extra={"type": ["string", "null"]})
+    edits: Optional[List[FileEdit]] = Field(None, description="Character range replacements (patch mode)")
+    base_etag: Optional[str] = Field(None, description="Only write if the file still has this ETag", json_schema_extra={"type": ["string", "null"]})
 
 
 class FileWriteResponse(BaseModel):
@@ -58,6 +70,7 @@ class FileWriteResponse(BaseModel):
     path: str
     size: int
     chat_id: str
+    etag: Optional[str] = None
 
 
 class DirectoryCreateResponse(BaseModel):
@@ -96,6 +109,98 @@ class FileInfoResponse(BaseModel):
     is_directory: bool
     is_file: bool
     mime_type: Optional[str]
+    etag: Optional[str] = None
+    checksum: Optional[str] = None
+
+
+class BulkFileRequest(BaseModel):
+    chat_id: str = Field(..., description="Chat ID")
+    paths: List[str] = Field(..., min_length=1, description="File paths relative to `path` (or the chat root)")
+    path: Optional[str] = Field(None, description="Base directory path", json_schema_extra={"type": ["string", "null"]})
+    stream: bool = Field(False, description="Stream results as NDJSON lines in completion order")
+
+
+class BulkReadRequest(BulkFileRequest):
+    max_file_bytes: Optional[int] = Field(None, ge=0, description="Read at most this many bytes per file", json_schema_extra={"type": ["integer", "null"]})
+    max_total_bytes: Optional[int] = Field(None, ge=0, description="Read at most this many bytes in total", json_schema_extra={"type": ["integer", "null"]})
+
+
+class BulkFileError(BaseModel):
+    status_code: int
+    detail: str
+
+
+class BulkInfoItem(BaseModel):
+    path: str
+    info: Optional[FileInfoResponse] = None
+    error: Optional[BulkFileError] = None
+
+
+class BulkInfoResponse(BaseModel):
+    results: List[BulkInfoItem]
+    count: int
+    chat_id: str
+
+
+class BulkReadItem(BaseModel):
+    path: str
+    file: Optional[FileReadResponse] = None
+    truncated: bool = False
+    truncated_by: Optional[Literal["file", "total"]] = Field(
+        None, description="Which cap cut the content short: 'file' (max_file_bytes) or 'total' (max_total_bytes)"
+    )
+    error: Optional[BulkFileError] = None
+
+
+class BulkReadResponse(BaseModel):
+    results: List[BulkReadItem]
+    count: int
+    total_bytes: int
+    chat_id: str
+
+
+class ChunkChecksum(BaseModel):
+    index: int
+    offset: int
+    size: int
+    checksum: str
+
+
+class FileChecksumResponse(BaseModel):
+    filename: str
+    path: str
+    size: int
+    algorithm: str
+    checksum: str
+    chunk_size: int
+    chunks: Optional[List[ChunkChecksum]] = Field(None, description="Per-chunk checksums; byte ranges for Range requests on download")
+    etag: Optional[str] = None
+    chat_id: str
+
+
+class ChecksumVerifyRequest(BaseModel):
+    chat_id: str = Field(..., description="Chat ID")
+    path: Optional[str] = Field(None, description="Directory to verify (defaults to the whole chat)", json_schema_extra={"type": ["string", "null"]})
+    expected: Optional[Dict[str, str]] = Field(None, description="Checksums the client holds, keyed by path relative to the chat root")
+
+
+class ChecksumVerifyItem(BaseModel):
+    path: str
+    size: Optional[int] = None
+    checksum: Optional[str] = None
+    expected: Optional[str] = None
+    status: Literal["match", "mismatch", "missing", "extra", "computed"] = Field(
+        ..., description="'missing': expected but not on the server; 'extra': on the server but not expected"
+    )
+
+
+class ChecksumVerifyResponse(BaseModel):
+    results: List[ChecksumVerifyItem]
+    count: int
+    mismatched: int
+    missing: int
+    algorithm: str
+    chat_id: str
 
 
 class FileMoveRequest(BaseModel):
@@ -124,3 +229,59 @@ class FileCopyResponse(BaseModel):
     success: bool
     source: str
     destination: str
+
+
+class FileVersion(BaseModel):
+    id: int
+    size: int
+    created: float
+    manifest_hash: str = Field(..., description="Identifies the content (equal hashes mean equal bytes); not a SHA-256 of the file")
+    source: str = Field(..., description="'baseline', 'write', 'restore' or 'snapshot'")
+
+
+class FileVersionListResponse(BaseModel):
+    versions: List[FileVersion]
+    filename: str
+    path: str
+    count: int
+    chat_id: str
+
+
+class FileVersionDiffResponse(BaseModel):
+    filename: str
+    from_version: int
+    to_version: Optional[int] = Field(None, description="None means the current file")
+    diff: str
+    chat_id: str
+
+
+class FileVersionRestoreRequest(BaseModel):
+    chat_id: str = Field(..., description="Chat ID")
+    version_id: int = Field(..., description="Version to restore")
+    path: Optional[str] = Field(None, description="Directory path", json_schema_extra={"type": ["string", "null"]})
+
+
+class SnapshotCreateRequest(BaseModel):
+    chat_id: str = Field(..., description="Chat ID")
+    name: Optional[str] = Field(None, description="Snapshot name", json_schema_extra={"type": ["string", "null"]})
+
+
+class SnapshotResponse(BaseModel):
+    id: int
+    name: Optional[str]
+    created: float
+    file_count: int
+    chat_id: str
+
+
+class SnapshotListResponse(BaseModel):
+    snapshots: List[SnapshotResponse]
+    count: int
+    chat_id: str
+
+
+class SnapshotRestoreResponse(BaseModel):
+    success: bool
+    snapshot_id: int
+    restored: int
+    chat_id: str
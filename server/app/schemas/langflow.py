@@ -0,0 +1,67 @@
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Any, Dict, List, Literal, Optional, Union
+
+
+class LangflowMessage(BaseModel):
+    # Langflow's message schema varies between versions; unknown fields pass through
+    model_config = ConfigDict(extra="allow")
+
+    id: str
+    session_id: str
+    flow_id: Optional[str] = None
+    timestamp: Optional[Union[str, float]] = None
+    sender: Optional[str] = None
+    sender_name: Optional[str] = None
+    text: Optional[str] = None
+
+
+class LangflowSession(BaseModel):
+    session_id: str
+    flow_id: Optional[str] = None
+    title: str
+    created_at: Optional[float] = None
+    updated_at: Optional[float] = None
+    message_count: int
+
+
+class LangflowSessionListResponse(BaseModel):
+    sessions: List[LangflowSession]
+    total: int
+    limit: int
+    offset: int
+
+
+class LangflowMessageListResponse(BaseModel):
+    session_id: str
+    messages: List[LangflowMessage]
+    total: int
+    limit: int
+    offset: int
+
+
+class LangflowSyncResponse(BaseModel):
+    sessions_synced: int
+    messages_upserted: int
+    removed: int
+    duration: float
+    skipped: bool = False
+
+
+class LangflowSessionActionResponse(BaseModel):
+    success: bool
+    session_id: str
+    message: str
+
+
+class ChatStreamRequest(BaseModel):
+    flow_id: str
+    input_value: str
+    session_id: Optional[str] = None
+    api: Literal["run", "responses"] = Field("run", description="Langflow endpoint: /run (flows) or /responses (OpenAI-compatible)")
+    tweaks: Optional[Dict[str, Any]] = None
+
+
+class ChatStreamCancelResponse(BaseModel):
+    success: bool
+    stream_id: str
+    message: str
@@ -0,0 +1,45 @@
+from typing import Dict
+from pydantic import BaseModel
+
+
+class OperationClassMetrics(BaseModel):
+    rate: float
+    burst: int
+    concurrency: int
+    global_concurrency: int
+    global_in_use: int
+    global_queued: int
+
+
+class ChatLoadMetrics(BaseModel):
+    in_flight: int
+    queued: int
+    admitted: int
+    rejected: int
+    tokens: float
+
+
+class AdmissionMetricsResponse(BaseModel):
+    enabled: bool
+    classes: Dict[str, OperationClassMetrics]
+    chats: Dict[str, Dict[str, ChatLoadMetrics]]
+
+
+class CacheSegmentMetrics(BaseModel):
+    entries: int
+    bytes: int
+
+
+class FileCacheMetricsResponse(BaseModel):
+    enabled: bool
+    max_bytes: int
+    max_file_bytes: int
+    used_bytes: int
+    entries: int
+    segments: Dict[str, CacheSegmentMetrics]
+    hits: int
+    misses: int
+    hit_rate: float
+    evictions: int
+    rejections: int
+    invalidations: int
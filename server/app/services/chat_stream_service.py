@@ -0,0 +1,462 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+import httpx
+from fastapi import HTTPException
+
+from app.core.blocking import ThreadLocalConnection, run_blocking
+from app.core.config import get_settings
+from app.services.langflow_service import LangflowClient, langflow_client, langflow_service
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+def parse_stream_line(line: str) -> Optional[Dict[str, Any]]:
+    """Decode one line of a Langflow stream (NDJSON from /run, SSE from /responses)."""
+    line = line.strip()
+    if line.startswith("_19"):
+        line = line[3:]
+    if line.startswith("data:"):
+        line = line[5:]
+    line = line.strip()
+    if not line or line == "[DONE]" or line.startswith(("event:", "id:", ":")):
+        return None
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _end_text(data: Dict[str, Any]) -> Tuple[Optional[str], Optional[list]]:
+    """Final message text and content blocks of a /run `end` event."""
+    try:
+        message = data["result"]["outputs"][0]["outputs"][0]["results"]["message"]["data"]
+    except (KeyError, IndexError, TypeError):
+        return None, None
+    text = message.get("text")
+    return (text if isinstance(text, str) else None), message.get("content_blocks")
+
+
+class StreamNormalizer:
+    """Turns upstream Langflow events into proxy events: delta, message, end, error.
+
+    Mirrors the parsing the UI did per token, so the client only has to
+    append `delta` frames and render `message` content blocks.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._last_chunk: Optional[str] = None
+        self.final_text: Optional[str] = None
+        self.final_blocks: Optional[list] = None
+
+    def _delta(self, content: Any, dedupe: bool = False) -> List[Tuple[str, Any]]:
+        if not content:
+            return []
+        content = content if isinstance(content, str) else json.dumps(content)
+        if dedupe:
+            # /run repeats a chunk in its token and message events; other
+            # streams can legitimately repeat a token ("\n", "  ")
+            if content == self._last_chunk:
+                return []
+            self._last_chunk = content
+        self.text += content
+        return [("delta", content)]
+
+    def feed(self, event: Dict[str, Any]) -> List[Tuple[str, Any]]:
+        name = event.get("event")
+        data = event.get("data")
+        if name == "add_message" and isinstance(data, dict):
+            if data.get("content_blocks"):
+                return [("message", {"content_blocks": data["content_blocks"], "sender": data.get("sender")})]
+            return []
+        if name in ("token", "message") and isinstance(data, dict):
+            events = []
+            if name == "message" and data.get("content_blocks"):
+                events.append(("message", {"content_blocks": data["content_blocks"], "sender": data.get("sender")}))
+            return events + self._delta(data.get("chunk"), dedupe=True)
+        if name == "end":
+            self.final_text, self.final_blocks = _end_text(data if isinstance(data, dict) else {})
+            return []
+        if name == "error":
+            detail = data.get("error") or data.get("text") if isinstance(data, dict) else data
+            return [("error", {"detail": str(detail or "Langflow error")})]
+
+        # OpenAI-compatible /responses events
+        delta = event.get("delta")
+        if isinstance(delta, dict) and delta.get("content"):
+            return self._delta(delta["content"])
+        choices = event.get("choices")
+        if isinstance(choices, list) and choices and isinstance(choices[0], dict):
+            content = (choices[0].get("delta") or {}).get("content")
+            if content:
+                return self._delta(content)
+        if event.get("output_text"):
+            self.final_text = event["output_text"]
+            return []
+
+        # Non-streaming fallbacks
+        content = event.get("output") or event.get("text") or event.get("content") or event.get("chunk")
+        if content and not self.text:
+            return self._delta(content)
+        return []
+
+    def end(self) -> Dict[str, Any]:
+        text = self.final_text if self.final_text is not None else self.text
+        # `full_text` tells the client to replace what it has appended so far
+        return {"text": text, "full_text": self.final_text is not None and self.final_text != self.text}
+
+
+class StreamStore:
+    """Frames and status of chat runs in SQLite under DATA_DIR.
+
+    The worker that runs a stream writes its frames here as they are
+    produced, so a client that reconnects to any worker or node on the shared
+    volume can resume it, and a cancel request can reach the owning worker.
+    """
+
+    def __init__(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        self._connect = ThreadLocalConnection(self.db_path)
+        self._connect().executescript(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                id TEXT PRIMARY KEY, session_id TEXT NOT NULL, updated REAL NOT NULL,
+                finished REAL, cancelled INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS frames (
+                run_id TEXT NOT NULL, id INTEGER NOT NULL, data BLOB NOT NULL,
+                PRIMARY KEY (run_id, id)
+            );
+            """
+        )
+
+    def append(self, run_id: str, session_id: str, start: int, frames: List[bytes], finished: bool) -> bool:
+        """Store frames `start`.. of a run (and whether it has finished); returns True if it was cancelled."""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO runs (id, session_id, updated, finished) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET updated = excluded.updated, finished = excluded.finished",
+                (run_id, session_id, now, now if finished else None)
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO frames (run_id, id, data) VALUES (?, ?, ?)",
+                [(run_id, start + i, frame) for i, frame in enumerate(frames)]
+            )
+            cancelled = conn.execute("SELECT cancelled FROM runs WHERE id = ?", (run_id,)).fetchone()[0]
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return bool(cancelled)
+
+    def exists(self, run_id: str) -> bool:
+        return self._connect().execute("SELECT 1 FROM runs WHERE id = ?", (run_id,)).fetchone() is not None
+
+    def read(self, run_id: str, start: int) -> Tuple[List[bytes], Optional[bool]]:
+        """Frames `start`.. and whether the run had finished before them; None once the run is gone."""
+        conn = self._connect()
+        # Status first: a finished run has all of its frames stored
+        row = conn.execute("SELECT finished FROM runs WHERE id = ?", (run_id,)).fetchone()
+        if row is None:
+            return [], None
+        frames = conn.execute(
+            "SELECT data FROM frames WHERE run_id = ? AND id >= ? ORDER BY id", (run_id, start)
+        ).fetchall()
+        return [frame[0] for frame in frames], row[0] is not None
+
+    def cancelled(self, run_id: str) -> bool:
+        row = self._connect().execute("SELECT cancelled FROM runs WHERE id = ?", (run_id,)).fetchone()
+        return bool(row and row[0])
+
+    def cancel(self, run_id: str) -> bool:
+        return self._connect().execute(
+            "UPDATE runs SET cancelled = 1 WHERE id = ? AND finished IS NULL", (run_id,)
+        ).rowcount > 0
+
+    def sweep(self, retention: float, stale: float) -> None:
+        """Drop runs finished more than `retention` seconds ago, and unfinished ones silent for `stale`."""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            expired = [row[0] for row in conn.execute(
+                "SELECT id FROM runs WHERE finished < ? OR (finished IS NULL AND updated < ?)",
+                (now - retention, now - stale)
+            ).fetchall()]
+            conn.executemany("DELETE FROM frames WHERE run_id = ?", [(run_id,) for run_id in expired])
+            conn.executemany("DELETE FROM runs WHERE id = ?", [(run_id,) for run_id in expired])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class StreamRun:
+    """One upstream chat run and the SSE frames produced from it.
+
+    Frames are kept until the run has been finished for
+    LANGFLOW_STREAM_RETENTION seconds, so a client that reconnects can resume
+    from the last event ID it saw. The worker that started the run serves
+    it from memory; other workers follow it through the StreamStore.
+    """
+
+    def __init__(self, run_id: str, session_id: str):
+        self.id = run_id
+        self.session_id = session_id
+        self.frames: List[bytes] = []
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.writer: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+        self._pending: List[str] = []
+        self._pending_size = 0
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    def emit(self, event: str, data: Any) -> None:
+        self.flush()
+        self._append(event, data)
+
+    def _append(self, event: str, data: Any) -> None:
+        frame_id = len(self.frames)
+        payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        self.frames.append(f"id: {frame_id}\nevent: {event}\ndata: {payload}\n\n".encode("utf-8"))
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def add_delta(self, content: str) -> None:
+        """Buffer a token; frames go out once LANGFLOW_STREAM_COALESCE_CHARS or _MS is reached."""
+        self._pending.append(content)
+        self._pending_size += len(content)
+        if self._pending_size >= settings.LANGFLOW_STREAM_COALESCE_CHARS:
+            self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                settings.LANGFLOW_STREAM_COALESCE_MS / 1000, self.flush
+            )
+
+    def flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._pending:
+            content = "".join(self._pending)
+            self._pending = []
+            self._pending_size = 0
+            self._append("delta", {"content": content})
+
+    def finish(self) -> None:
+        self.flush()
+        self.finished_at = time.monotonic()
+        self._changed.set()
+
+    async def wait(self, position: int, timeout: float) -> bool:
+        """Wait until there are frames past `position` or the run finishes; False on timeout."""
+        changed = self._changed
+        if position < len(self.frames) or self.done:
+            return True
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def frames_from(self, offset: int) -> AsyncIterator[bytes]:
+        """Yield frames with id >= offset, waiting for new ones until the run finishes."""
+        position = max(0, offset)
+        while True:
+            if position < len(self.frames):
+                batch = self.frames[position:]
+                position += len(batch)
+                yield b"".join(batch)
+                continue
+            if self.done:
+                return
+            if not await self.wait(position, settings.LANGFLOW_STREAM_KEEPALIVE):
+                # SSE comment keeps proxies from closing an idle connection
+                yield b": keep-alive\n\n"
+
+
+class StoredStreamRun:
+    """A run started by another worker, followed by polling the StreamStore."""
+
+    def __init__(self, store: StreamStore, run_id: str):
+        self.store = store
+        self.id = run_id
+
+    async def frames_from(self, offset: int) -> AsyncIterator[bytes]:
+        position = max(0, offset)
+        idle = 0.0
+        while True:
+            frames, finished = await run_blocking(self.store.read, self.id, position)
+            if frames:
+                position += len(frames)
+                idle = 0.0
+                yield b"".join(frames)
+                continue
+            if finished or finished is None:
+                return
+            await asyncio.sleep(settings.LANGFLOW_STREAM_POLL_INTERVAL)
+            idle += settings.LANGFLOW_STREAM_POLL_INTERVAL
+            if idle >= settings.LANGFLOW_STREAM_KEEPALIVE:
+                idle = 0.0
+                yield b": keep-alive\n\n"
+
+
+class ChatStreamService:
+    """Streaming chat proxy in front of Langflow.
+
+    Upstream requests reuse the pooled keep-alive client from LangflowClient;
+    token deltas are coalesced into SSE frames on a time/size budget.
+    """
+
+    def __init__(self, client: LangflowClient, store: StreamStore):
+        self.client = client
+        self.store = store
+        self._runs: Dict[str, StreamRun] = {}
+
+    def _sweep(self) -> None:
+        now = time.monotonic()
+        for run_id, run in list(self._runs.items()):
+            if run.done and now - run.finished_at > settings.LANGFLOW_STREAM_RETENTION:
+                del self._runs[run_id]
+    def _upstream_request(
+        self,
+        flow_id: str,
+        input_value: str,
+        session_id: str,
+        api: str,
+        tweaks: Optional[Dict[str, Any]]
+    ) -> Tuple[str, Dict[str, Any]]:
+        if api == "responses":
+            return "/api/v1/responses", {"model": flow_id, "input": input_value, "stream": True}
+        payload = {
+            "input_value": input_value,
+            "input_type": "chat",
+            "output_type": "chat",
+            "tweaks": tweaks or {},
+            "session_id": session_id
+        }
+        return f"/api/v1/run/{flow_id}?stream=true", {"input_request": payload}
+
+    async def _pump(self, run: StreamRun, path: str, body: Dict[str, Any]) -> None:
+        normalizer = StreamNormalizer()
+        timeout = httpx.Timeout(settings.LANGFLOW_TIMEOUT, connect=10.0, read=settings.LANGFLOW_STREAM_READ_TIMEOUT)
+        try:
+            async with self.client.client.stream("POST", path, json=body, timeout=timeout) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    run.emit("error", {"detail": f"Langflow API error: {response.status_code}", "status": response.status_code})
+                    return
+                async for line in response.aiter_lines():
+                    event = parse_stream_line(line)
+                    if event is None:
+                        continue
+                    for kind, data in normalizer.feed(event):
+                        if kind == "delta":
+                            run.add_delta(data)
+                        else:
+                            run.emit(kind, data)
+            end = normalizer.end()
+            if normalizer.final_blocks:
+                end["content_blocks"] = normalizer.final_blocks
+            run.emit("end", end)
+        except asyncio.CancelledError:
+            run.emit("error", {"detail": "Stream cancelled"})
+            raise
+        except httpx.HTTPError as e:
+            run.emit("error", {"detail": f"Langflow stream failed: {str(e)}"})
+        finally:
+            run.finish()
+            # The run added messages to the session, so its cached history is stale
+            await langflow_service.invalidate(run.session_id)
+
+    async def _persist(self, run: StreamRun) -> None:
+        """Copy the run's frames to the shared store, and pick up cancel requests made on other workers."""
+        position = 0
+        try:
+            while True:
+                done = run.done
+                batch = run.frames[position:]
+                if batch or done:
+                    cancelled = await run_blocking(self.store.append, run.id, run.session_id, position, batch, done)
+                    position += len(batch)
+                    if done:
+                        return
+                else:
+                    cancelled = await run_blocking(self.store.cancelled, run.id)
+                if cancelled and run.task is not None and not run.task.done():
+                    run.task.cancel()
+                await run.wait(position, settings.LANGFLOW_STREAM_POLL_INTERVAL)
+        except Exception:
+            # The stream itself goes on; only resuming it elsewhere is affected
+            logger.exception("Could not store frames of stream %s", run.id)
+
+    async def start(
+        self,
+        flow_id: str,
+        input_value: str,
+        session_id: Optional[str] = None,
+        api: str = "run",
+        tweaks: Optional[Dict[str, Any]] = None
+    ) -> StreamRun:
+        if not self.client.base_url:
+            raise HTTPException(status_code=503, detail="LANGFLOW_URL is not configured")
+        self._sweep()
+        await run_blocking(
+            self.store.sweep,
+            settings.LANGFLOW_STREAM_RETENTION,
+            settings.LANGFLOW_STREAM_READ_TIMEOUT + settings.LANGFLOW_STREAM_RETENTION
+        )
+        run = StreamRun(uuid.uuid4().hex, session_id or f"chat-{int(time.time() * 1000)}")
+        path, body = self._upstream_request(flow_id, input_value, run.session_id, api, tweaks)
+        run.emit("start", {"stream_id": run.id, "session_id": run.session_id})
+        # Registered in the shared store before the ID reaches the client
+        await run_blocking(self.store.append, run.id, run.session_id, 0, run.frames, False)
+        self._runs[run.id] = run
+        # The run outlives a disconnected client so it can resume
+        run.task = asyncio.create_task(self._pump(run, path, body))
+        run.writer = asyncio.create_task(self._persist(run))
+        return run
+
+    async def get(self, stream_id: str) -> Union[StreamRun, StoredStreamRun]:
+        self._sweep()
+        run = self._runs.get(stream_id)
+        if run is not None:
+            return run
+        if await run_blocking(self.store.exists, stream_id):
+            return StoredStreamRun(self.store, stream_id)
+        raise HTTPException(status_code=404, detail="Stream not found or expired")
+
+    async def cancel(self, stream_id: str) -> None:
+        run = await self.get(stream_id)
+        if isinstance(run, StoredStreamRun):
+            # The worker running it checks for this on its next write
+            await run_blocking(self.store.cancel, stream_id)
+            return
+        if run.task is not None and not run.task.done():
+            run.task.cancel()
+            try:
+                await run.task
+            except asyncio.CancelledError:
+                pass
+
+
+chat_stream_service = ChatStreamService(langflow_client, StreamStore(settings.LANGFLOW_STREAM_DB))
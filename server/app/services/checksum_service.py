@@ -0,0 +1,136 @@
+import mmap
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from app.core.config import get_settings
+from app.services.storage import StorageBackend, StorageStat
+
+settings = get_settings()
+
+ALGORITHM = "sha256"
+
+
+@dataclass
+class FileChecksum:
+    digest: str
+    size: int
+    chunk_size: int
+    # Digest of each chunk_size slice, in order; empty when the file fits in one chunk
+    chunks: List[str]
+
+
+def _hash(data) -> str:
+    return hashlib.new(ALGORITHM, data).hexdigest()
+
+
+class ChecksumService:
+    """SHA-256 of stored files, with per-chunk digests for large files.
+
+    Local files are memory-mapped and hashed by a thread pool: one thread
+    digests the whole file while the others digest its chunks (hashlib
+    releases the GIL on large buffers). Results are cached per
+    (key, inode or object ETag, size, mtime), so a rewritten file never matches a stale entry
+    and nothing has to be invalidated.
+    """
+
+    def __init__(self, workers: int, chunk_size: int, cache_entries: int):
+        self.chunk_size = chunk_size
+        self.cache_entries = cache_entries
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="checksum")
+        self._cache: "OrderedDict[Tuple, FileChecksum]" = OrderedDict()
+        self._pending: Dict[Tuple, Future] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cache_key(stat: StorageStat) -> Tuple:
+        return stat.key, stat.inode, stat.version, stat.size, stat.modified
+
+    def checksum(self, storage: StorageBackend, stat: StorageStat) -> FileChecksum:
+        """Blocking; call from a worker thread."""
+        cache_key = self._cache_key(stat)
+        with self._lock:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._cache.move_to_end(cache_key)
+                return cached
+            # Concurrent requests for the same file share one computation
+            pending = self._pending.get(cache_key)
+            owner = pending is None
+            if owner:
+                pending = self._pending[cache_key] = Future()
+        if not owner:
+            return pending.result()
+
+        try:
+            result = self._compute(storage, stat)
+        except BaseException as e:
+            with self._lock:
+                del self._pending[cache_key]
+            pending.set_exception(e)
+            raise
+        with self._lock:
+            del self._pending[cache_key]
+            self._cache[cache_key] = result
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        pending.set_result(result)
+        return result
+
+    def _compute(self, storage: StorageBackend, stat: StorageStat) -> FileChecksum:
+        path = storage.local_path(stat.key)
+        if path is None or stat.size == 0:
+            return self._compute_stream(storage, stat)
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                size = len(view)
+                if size <= self.chunk_size:
+                    return FileChecksum(digest=_hash(view), size=size, chunk_size=self.chunk_size, chunks=[])
+                whole = self._pool.submit(_hash, view)
+                chunks = list(self._pool.map(
+                    lambda offset: _hash(view[offset:offset + self.chunk_size]),
+                    range(0, size, self.chunk_size)
+                ))
+                return FileChecksum(digest=whole.result(), size=size, chunk_size=self.chunk_size, chunks=chunks)
+            finally:
+                view.release()
+
+    def _compute_stream(self, storage: StorageBackend, stat: StorageStat) -> FileChecksum:
+        # Backends without a local file (object stores, compressed-at-rest files) are hashed while streaming
+        whole = hashlib.new(ALGORITHM)
+        chunks: List[str] = []
+        current = hashlib.new(ALGORITHM)
+        filled = 0
+        size = 0
+        for block in storage.iter_bytes(stat.key):
+            size += len(block)
+            whole.update(block)
+            view = memoryview(block)
+            while view:
+                take = view[:self.chunk_size - filled]
+                current.update(take)
+                filled += len(take)
+                view = view[len(take):]
+                if filled == self.chunk_size:
+                    chunks.append(current.hexdigest())
+                    current = hashlib.new(ALGORITHM)
+                    filled = 0
+        if filled:
+            chunks.append(current.hexdigest())
+        return FileChecksum(
+            digest=whole.hexdigest(),
+            size=size,
+            chunk_size=self.chunk_size,
+            chunks=chunks if size > self.chunk_size else []
+        )
+
+
+checksum_service = ChecksumService(
+    workers=settings.CHECKSUM_WORKERS,
+    chunk_size=settings.CHECKSUM_CHUNK_SIZE,
+    cache_entries=settings.CHECKSUM_CACHE_ENTRIES
+)
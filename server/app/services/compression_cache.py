@@ -0,0 +1,92 @@
+import os
+import time
+import hashlib
+import threading
+from typing import Dict, Optional
+
+from app.core.config import get_settings
+from app.core.compression import STATIC_LEVELS, StreamCompressor
+from app.services.storage import StorageBackend, StorageStat, make_etag
+
+settings = get_settings()
+
+
+class CompressionCache:
+    """Precompressed variants of downloadable files, one per (key, ETag, encoding).
+
+    The file's ETag (which covers same-size rewrites within one mtime tick)
+    is part of the variant name, so a write never serves a stale variant and
+    nothing needs explicit invalidation; superseded variants simply age out
+    of the byte budget. Eviction order
+    comes from last use recorded in memory (atime is not updated on
+    noatime/relatime mounts); variants this process has not used yet fall
+    back to their creation time.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+        # variant file name -> last time it was served by this process
+        self._last_used: Dict[str, float] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _variant_path(self, stat: StorageStat, encoding: str) -> str:
+        version = f"{stat.key}\0{make_etag(stat)}"
+        return os.path.join(self.directory, f"{hashlib.sha1(version.encode('utf-8')).hexdigest()}.{encoding}")
+
+    def get_variant(self, storage: StorageBackend, stat: StorageStat, encoding: str) -> str:
+        encoded = storage.encoded_local_path(stat.key, encoding)
+        if encoded:
+            return encoded
+
+        path = self._variant_path(stat, encoding)
+        if os.path.exists(path):
+            self._touch(path)
+            return path
+
+        compressor = StreamCompressor(encoding, STATIC_LEVELS[encoding])
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            for chunk in storage.iter_bytes(stat.key):
+                f.write(compressor.compress(chunk))
+            f.write(compressor.finish())
+        # Atomic publish: concurrent workers compressing the same version just race to an identical file
+        os.replace(tmp_path, path)
+        self._touch(path)
+        self._account(os.path.getsize(path))
+        return path
+
+    def _touch(self, path: str) -> None:
+        with self._lock:
+            self._last_used[os.path.basename(path)] = time.time()
+
+    def _account(self, added: int) -> None:
+        with self._lock:
+            if self._size is None:
+                self._size = sum(e.stat().st_size for e in os.scandir(self.directory) if e.is_file())
+            else:
+                self._size += added
+            if self._size <= self.max_bytes:
+                return
+            entries = sorted(
+                (e for e in os.scandir(self.directory) if e.is_file() and not e.name.endswith(".tmp")),
+                key=lambda e: self._last_used.get(e.name, e.stat().st_mtime)
+            )
+            # Forget variants other workers have already removed
+            present = {e.name for e in entries}
+            self._last_used = {name: used for name, used in self._last_used.items() if name in present}
+            for entry in entries:
+                if self._size <= self.max_bytes * 0.9:
+                    break
+                try:
+                    size = entry.stat().st_size
+                    os.remove(entry.path)
+                    self._size -= size
+                except FileNotFoundError:
+                    pass
+                self._last_used.pop(entry.name, None)
+
+
+compression_cache = CompressionCache(settings.COMPRESSION_CACHE_DIR, settings.COMPRESSION_CACHE_MAX_BYTES)
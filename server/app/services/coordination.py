@@ -0,0 +1,310 @@
+import os
+import time
+import logging
+import socket
+import asyncio
+import hashlib
+import importlib
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional
+from fastapi import HTTPException
+
+from app.core.blocking import ThreadLocalConnection, run_blocking
+from app.core.config import get_settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+InvalidationListener = Callable[[List[str]], None]
+
+
+class CoordinationBackend(ABC):
+    """Shared state used by every worker process and node serving the same UPLOAD_DIR.
+
+    Backends provide hierarchical path locks and a cache invalidation broadcast.
+    Keys are paths relative to UPLOAD_DIR. File metadata is not shared through
+    the backend: every worker keeps its own caches and drops entries when an
+    invalidation arrives.
+    """
+
+    def __init__(self):
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._listeners: List[InvalidationListener] = []
+
+    @abstractmethod
+    def acquire_lock(self, key: str, timeout: float, shared: bool = False) -> Any:
+        """Block until the lock for `key` is held and return a handle, or raise TimeoutError.
+
+        Shared locks exclude exclusive holders of the same key but not each other.
+        """
+
+    @abstractmethod
+    def release_lock(self, handle: Any) -> None:
+        ...
+
+    @abstractmethod
+    def publish(self, keys: List[str]) -> None:
+        """Record invalidated keys so that other workers can pick them up."""
+
+    @abstractmethod
+    def fetch_invalidations(self) -> List[str]:
+        """Return keys invalidated by other workers since the previous call."""
+
+    def close(self) -> None:
+        pass
+
+    @asynccontextmanager
+    async def lock(self, *keys: str, timeout: Optional[float] = None):
+        # Each key is locked exclusively and its parent directories shared, so an operation on a
+        # directory waits for writes anywhere below it while writes to sibling paths run in parallel
+        modes: Dict[str, bool] = {}
+        for key in keys:
+            key = normalize_key(key)
+            modes[key] = True
+            parent = parent_key(key)
+            while parent:
+                modes.setdefault(parent, False)
+                parent = parent_key(parent)
+        timeout = settings.LOCK_TIMEOUT if timeout is None else timeout
+        handles = []
+        try:
+            # Sorted acquisition order (parents before children) keeps multi-path operations deadlock free
+            for key in sorted(modes):
+                acquire = asyncio.ensure_future(run_blocking(self.acquire_lock, key, timeout, not modes[key]))
+                try:
+                    # The worker thread cannot be interrupted; if the request is cancelled while it
+                    # waits, release the lock as soon as the thread gets it
+                    handles.append(await asyncio.shield(acquire))
+                except asyncio.CancelledError:
+                    acquire.add_done_callback(self._release_abandoned)
+                    raise
+                except TimeoutError:
+                    raise HTTPException(status_code=409, detail=f"Path is locked by another writer: {key}")
+            yield
+        finally:
+            for handle in reversed(handles):
+                self.release_lock(handle)
+
+    def _release_abandoned(self, acquire: asyncio.Future) -> None:
+        if not acquire.cancelled() and acquire.exception() is None:
+            self.release_lock(acquire.result())
+
+    def subscribe(self, listener: InvalidationListener) -> None:
+        self._listeners.append(listener)
+
+    def invalidate(self, *keys: str) -> None:
+        normalized = sorted({normalize_key(key) for key in keys})
+        if not normalized:
+            return
+        self.publish(normalized)
+        self._dispatch(normalized)
+
+    def poll_invalidations(self) -> List[str]:
+        keys = self.fetch_invalidations()
+        if keys:
+            self._dispatch(keys)
+        return keys
+
+    async def run_invalidation_listener(self, interval: Optional[float] = None) -> None:
+        interval = settings.INVALIDATION_POLL_INTERVAL if interval is None else interval
+        while True:
+            try:
+                await run_blocking(self.poll_invalidations)
+            except Exception as e:
+                logger.warning("Invalidation poll failed: %s", e)
+            await asyncio.sleep(interval)
+
+    def _dispatch(self, keys: List[str]) -> None:
+        for listener in self._listeners:
+            try:
+                listener(keys)
+            except Exception:
+                logger.exception("Invalidation listener failed")
+
+
+def normalize_key(key: str) -> str:
+    return key.replace("\\", "/").strip("/")
+
+
+def parent_key(key: str) -> str:
+    return normalize_key(key).rpartition("/")[0]
+
+
+class _SharedLock:
+    """Reader-writer lock; waiting exclusive holders block new shared ones so they are not starved."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._shared = 0
+        self._exclusive = False
+        self._waiting = 0
+
+    def acquire(self, shared: bool, timeout: float) -> bool:
+        with self._condition:
+            if shared:
+                if not self._condition.wait_for(lambda: not self._exclusive and not self._waiting, timeout):
+                    return False
+                self._shared += 1
+                return True
+            self._waiting += 1
+            try:
+                if not self._condition.wait_for(lambda: not self._exclusive and not self._shared, timeout):
+                    return False
+            finally:
+                self._waiting -= 1
+                # Shared waiters held back by this one may proceed if it gave up
+                self._condition.notify_all()
+            self._exclusive = True
+            return True
+
+    def release(self, shared: bool) -> None:
+        with self._condition:
+            if shared:
+                self._shared -= 1
+            else:
+                self._exclusive = False
+            self._condition.notify_all()
+
+
+class MemoryCoordinationBackend(CoordinationBackend):
+    """In-process coordination, only correct when running a single worker."""
+
+    def __init__(self):
+        super().__init__()
+        self._guard = threading.Lock()
+        self._locks: Dict[str, _SharedLock] = {}
+
+    def acquire_lock(self, key: str, timeout: float, shared: bool = False) -> Any:
+        with self._guard:
+            lock = self._locks.setdefault(key, _SharedLock())
+        if not lock.acquire(shared, timeout):
+            raise TimeoutError(key)
+        return lock, shared
+
+    def release_lock(self, handle: Any) -> None:
+        lock, shared = handle
+        lock.release(shared)
+
+    def publish(self, keys: List[str]) -> None:
+        pass
+
+    def fetch_invalidations(self) -> List[str]:
+        return []
+
+
+class SQLiteCoordinationBackend(CoordinationBackend):
+    """Coordination through a directory on the shared volume.
+
+    Path locks are advisory file locks on one lock file per key, so they hold
+    across processes and across nodes mounting the same volume. Invalidations
+    are recorded in a SQLite database next to the lock files.
+    """
+
+    INVALIDATION_RETENTION = 300.0
+
+    def __init__(self, directory: str):
+        super().__init__()
+        self.directory = directory
+        self.lock_dir = os.path.join(directory, "locks")
+        self.db_path = os.path.join(directory, "coordination.db")
+        os.makedirs(self.lock_dir, exist_ok=True)
+        self._connect = ThreadLocalConnection(self.db_path)
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS invalidations ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, "
+                "origin TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            row = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM invalidations").fetchone()
+        self._last_seq = row[0]
+        self._publish_count = 0
+
+    def _lock_path(self, key: str) -> str:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.lock_dir, f"{digest}.lock")
+
+    def acquire_lock(self, key: str, timeout: float, shared: bool = False) -> Any:
+        fd = os.open(self._lock_path(key), os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+                else:
+                    # msvcrt has no shared mode; parent directories are then locked exclusively too
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return fd
+            except OSError:
+                if time.monotonic() >= deadline:
+                    os.close(fd)
+                    raise TimeoutError(key)
+                time.sleep(0.01)
+
+    def release_lock(self, handle: Any) -> None:
+        try:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+            else:
+                os.lseek(handle, 0, os.SEEK_SET)
+                msvcrt.locking(handle, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(handle)
+
+    def publish(self, keys: List[str]) -> None:
+        now = time.time()
+        conn = self._connect()
+        conn.executemany(
+            "INSERT INTO invalidations (key, origin, created) VALUES (?, ?, ?)",
+            [(key, self.node_id, now) for key in keys]
+        )
+        self._publish_count += 1
+        if self._publish_count % 100 == 0:
+            conn.execute("DELETE FROM invalidations WHERE created < ?", (now - self.INVALIDATION_RETENTION,))
+
+    def fetch_invalidations(self) -> List[str]:
+        rows = self._connect().execute(
+            "SELECT seq, key, origin FROM invalidations WHERE seq > ? ORDER BY seq",
+            (self._last_seq,)
+        ).fetchall()
+        if not rows:
+            return []
+        self._last_seq = rows[-1][0]
+        return sorted({key for _, key, origin in rows if origin != self.node_id})
+
+    def close(self) -> None:
+        self._connect.close()
+
+
+_backends: Dict[str, Callable[[], CoordinationBackend]] = {
+    "memory": MemoryCoordinationBackend,
+    "sqlite": lambda: SQLiteCoordinationBackend(settings.COORDINATION_DIR),
+}
+
+
+def register_backend(name: str, factory: Callable[[], CoordinationBackend]) -> None:
+    """Make an external store (Redis, etcd, ...) selectable through COORDINATION_BACKEND."""
+    _backends[name] = factory
+
+
+def create_coordinator(name: Optional[str] = None) -> CoordinationBackend:
+    name = name or settings.COORDINATION_BACKEND
+    if name in _backends:
+        return _backends[name]()
+    # Allow "package.module:factory" for backends living outside this repo
+    module_name, _, attr = name.partition(":")
+    if not attr:
+        raise ValueError(f"Unknown coordination backend: {name}")
+    return getattr(importlib.import_module(module_name), attr)()
+
+
+coordinator = create_coordinator()
@@ -0,0 +1,265 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+from app.core.config import get_settings
+from app.services.coordination import coordinator
+from app.services.storage import StorageStat
+
+settings = get_settings()
+
+WINDOW = "window"
+PROBATION = "probation"
+PROTECTED = "protected"
+
+
+class FrequencySketch:
+    """Count-min sketch of recent access frequency (4-bit counters, halved periodically)."""
+
+    DEPTH = 4
+
+    def __init__(self, width: int):
+        self.width = 1 << max(4, (width - 1).bit_length())
+        self.mask = self.width - 1
+        self.rows = [bytearray(self.width) for _ in range(self.DEPTH)]
+        self.sample_size = self.width * 10
+        self.additions = 0
+
+    def _indexes(self, key: str):
+        h = hash(key)
+        for i in range(self.DEPTH):
+            # Derive independent row indexes from one hash
+            h = (h * 0x9E3779B1 + i) & 0xFFFFFFFFFFFF
+            yield i, (h ^ (h >> 17)) & self.mask
+
+    def increment(self, key: str) -> None:
+        added = False
+        for row, index in self._indexes(key):
+            if self.rows[row][index] < 15:
+                self.rows[row][index] += 1
+                added = True
+        if added:
+            self.additions += 1
+            if self.additions >= self.sample_size:
+                self._age()
+
+    def estimate(self, key: str) -> int:
+        return min(self.rows[row][index] for row, index in self._indexes(key))
+
+    def _age(self) -> None:
+        # Halving keeps the sketch about recent popularity rather than all-time counts
+        self.rows = [bytearray(count >> 1 for count in row) for row in self.rows]
+        self.additions //= 2
+
+
+class CachedFile:
+    __slots__ = ("key", "signature", "data", "text", "encoding", "cost", "segment")
+
+    def __init__(self, key: str, signature: Tuple, data: bytes, text: Optional[str], encoding: Optional[str]):
+        self.key = key
+        self.signature = signature
+        self.data = data
+        self.text = text
+        self.encoding = encoding
+        self.cost = len(data) + (sys.getsizeof(text) if text is not None else 0)
+        self.segment = WINDOW
+
+
+def _signature(stat: StorageStat) -> Tuple:
+    return stat.size, stat.modified, stat.inode, stat.version
+
+
+class HotFileCache:
+    """Byte-budgeted in-memory cache of small, frequently read files (W-TinyLFU).
+
+    New entries land in a small LRU window. When the window overflows, its
+    oldest entry only enters the main segmented LRU if the frequency sketch
+    says it is read more often than the entries it would evict. A file read
+    once by a directory scan therefore cannot push out the file open in the
+    editor. Entries keep the raw bytes and, for read_file, the decoded text.
+
+    Every lookup is checked against the caller's fresh stat (size, mtime,
+    inode, object ETag), so a changed file is never served stale. Explicit invalidation
+    only frees memory early.
+    """
+
+    def __init__(self, max_bytes: int, max_file_bytes: int, window_ratio: float, protected_ratio: float):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.window_bytes = min(max_bytes, max(int(max_bytes * window_ratio), max_file_bytes))
+        self.main_bytes = max_bytes - self.window_bytes
+        self.protected_bytes = int(self.main_bytes * protected_ratio)
+        self.sketch = FrequencySketch(max(1024, max_bytes // (16 * 1024)))
+        self._segments = {WINDOW: OrderedDict(), PROBATION: OrderedDict(), PROTECTED: OrderedDict()}
+        self._used = {WINDOW: 0, PROBATION: 0, PROTECTED: 0}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejections = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.max_file_bytes > 0
+
+    def cacheable(self, stat: StorageStat) -> bool:
+        return self.enabled and stat.is_file and stat.size <= self.max_file_bytes
+
+    def _find(self, key: str) -> Optional[CachedFile]:
+        for segment in self._segments.values():
+            entry = segment.get(key)
+            if entry is not None:
+                return entry
+        return None
+
+    def _insert(self, entry: CachedFile, segment: str) -> None:
+        entry.segment = segment
+        self._segments[segment][entry.key] = entry
+        self._used[segment] += entry.cost
+
+    def _remove(self, entry: CachedFile) -> None:
+        del self._segments[entry.segment][entry.key]
+        self._used[entry.segment] -= entry.cost
+
+    def get(self, key: str, stat: StorageStat) -> Optional[CachedFile]:
+        if not self.cacheable(stat):
+            return None
+        with self._lock:
+            self.sketch.increment(key)
+            entry = self._find(key)
+            if entry is not None and entry.signature != _signature(stat):
+                self._remove(entry)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if entry.segment == PROBATION:
+                self._remove(entry)
+                self._insert(entry, PROTECTED)
+                self._demote_protected()
+            else:
+                self._segments[entry.segment].move_to_end(key)
+            return entry
+
+    def put(
+        self,
+        key: str,
+        stat: StorageStat,
+        data: bytes,
+        text: Optional[str] = None,
+        encoding: Optional[str] = None
+    ) -> None:
+        if not self.cacheable(stat) or len(data) != stat.size:
+            return
+        entry = CachedFile(key, _signature(stat), data, text, encoding)
+        with self._lock:
+            existing = self._find(key)
+            if existing is not None:
+                # Re-adding (e.g. to attach decoded text) keeps the entry's place
+                segment = existing.segment
+                self._remove(existing)
+                self._insert(entry, segment)
+                if segment == PROTECTED:
+                    self._demote_protected()
+            else:
+                self._insert(entry, WINDOW)
+            self._drain_window()
+            self._shrink_main()
+
+    def _demote_protected(self) -> None:
+        protected = self._segments[PROTECTED]
+        while self._used[PROTECTED] > self.protected_bytes and protected:
+            _, entry = protected.popitem(last=False)
+            self._used[PROTECTED] -= entry.cost
+            self._insert(entry, PROBATION)
+
+    def _drain_window(self) -> None:
+        window = self._segments[WINDOW]
+        while self._used[WINDOW] > self.window_bytes and window:
+            _, candidate = window.popitem(last=False)
+            self._used[WINDOW] -= candidate.cost
+            self._admit(candidate)
+
+    def _admit(self, candidate: CachedFile) -> None:
+        needed = self._used[PROBATION] + self._used[PROTECTED] + candidate.cost - self.main_bytes
+        victims = []
+        if needed > 0:
+            for segment in (PROBATION, PROTECTED):
+                for entry in self._segments[segment].values():
+                    if needed <= 0:
+                        break
+                    victims.append(entry)
+                    needed -= entry.cost
+            frequency = self.sketch.estimate(candidate.key)
+            if needed > 0 or any(self.sketch.estimate(victim.key) >= frequency for victim in victims):
+                self.rejections += 1
+                return
+        for victim in victims:
+            self._remove(victim)
+            self.evictions += 1
+        self._insert(candidate, PROBATION)
+
+    def _shrink_main(self) -> None:
+        # Entries re-added with decoded text can grow the main segments past their budget
+        while self._used[PROBATION] + self._used[PROTECTED] > self.main_bytes:
+            segment = PROBATION if self._segments[PROBATION] else PROTECTED
+            _, entry = self._segments[segment].popitem(last=False)
+            self._used[segment] -= entry.cost
+            self.evictions += 1
+
+    def invalidate(self, *keys: str) -> None:
+        """Drop `keys` and everything below them (for changed files and directories)."""
+        prefixes = tuple(key.rstrip("/") + "/" for key in keys)
+        with self._lock:
+            for segment in self._segments.values():
+                for key in [k for k in segment if k in keys or k.startswith(prefixes)]:
+                    self._remove(segment[key])
+                    self.invalidations += 1
+
+    def discard(self, keys: Iterable[str]) -> None:
+        """Coordinator listener: drop exactly these keys.
+
+        Broadcasts also carry every changed file's parent directory, so prefix
+        matching here would flush whole chats on each write. Entries under a
+        directory removed on another node age out instead.
+        """
+        with self._lock:
+            for key in keys:
+                entry = self._find(key)
+                if entry is not None:
+                    self._remove(entry)
+                    self.invalidations += 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "max_bytes": self.max_bytes,
+                "max_file_bytes": self.max_file_bytes,
+                "used_bytes": sum(self._used.values()),
+                "entries": sum(len(segment) for segment in self._segments.values()),
+                "segments": {
+                    name: {"entries": len(segment), "bytes": self._used[name]}
+                    for name, segment in self._segments.items()
+                },
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "rejections": self.rejections,
+                "invalidations": self.invalidations
+            }
+
+
+file_cache = HotFileCache(
+    max_bytes=settings.FILE_CACHE_MAX_BYTES if settings.FILE_CACHE_ENABLED else 0,
+    max_file_bytes=settings.FILE_CACHE_MAX_FILE_BYTES,
+    window_ratio=settings.FILE_CACHE_WINDOW_RATIO,
+    protected_ratio=settings.FILE_CACHE_PROTECTED_RATIO
+)
+# Writes on other workers and nodes reach this cache through the coordinator
+coordinator.subscribe(file_cache.discard)
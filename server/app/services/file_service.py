@@ -1,8 +1,13 @@
 import os
-import shutil
 import asyncio
-from typing import Optional, List
+import difflib
+from email.utils import formatdate
+from urllib.parse import quote
+from typing import AsyncIterator, Callable, Iterator, List, Optional, Tuple, TypeVar, Union
 from fastapi import HTTPException, UploadFile
+from pydantic import BaseModel
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
 
 from app.schemas.file import (
     FileItem,
@@ -19,58 +24,173 @@ from app.schemas.file import (
     FileMoveRequest,
     FileMoveResponse,
     FileCopyRequest,
-    FileCopyResponse
+    FileCopyResponse,
+    FileEdit,
+    FileVersion,
+    FileVersionListResponse,
+    FileVersionDiffResponse,
+    FileVersionRestoreRequest,
+    SnapshotResponse,
+    SnapshotListResponse,
+    SnapshotRestoreResponse,
+    BulkFileRequest,
+    BulkReadRequest,
+    BulkFileError,
+    BulkInfoItem,
+    BulkInfoResponse,
+    BulkReadItem,
+    BulkReadResponse,
+    ChunkChecksum,
+    FileChecksumResponse,
+    ChecksumVerifyRequest,
+    ChecksumVerifyItem,
+    ChecksumVerifyResponse
 )
+from app.core.blocking import run_blocking
 from app.core.config import get_settings
 from app.core.security import resolve_path, is_allowed_file, get_mime_type
+from app.core.compression import negotiate_encoding, is_compressible
+from app.core.patching import apply_edits, apply_unified_diff, PatchError, PatchConflictError
+from app.services.coordination import coordinator, parent_key
+from app.services.storage import StorageBackend, StorageEntry, StorageStat, make_etag, storage
+from app.services.compression_cache import compression_cache
+from app.services.version_service import VersionRecord, version_service
+from app.services.file_cache import file_cache
+from app.services.checksum_service import ALGORITHM as CHECKSUM_ALGORITHM, FileChecksum, checksum_service
 
 settings = get_settings()
 
+T = TypeVar("T")
+R = TypeVar("R")
+
 
 class FileService:
-    def __init__(self):
-        os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    def __init__(self, backend: Optional[StorageBackend] = None):
+        self.storage = backend or storage
 
     def _get_chat_dir(self, chat_id: str) -> str:
         return os.path.join(settings.UPLOAD_DIR, chat_id)
 
-    async def list_files(self, chat_id: str, path: Optional[str] = None, recursive: bool = False) -> FileListResponse:
+    def _key(self, file_path: str) -> str:
+        # Storage and coordination keys are relative to UPLOAD_DIR so every node agrees on them
+        key = os.path.relpath(os.path.abspath(file_path), os.path.abspath(settings.UPLOAD_DIR)).replace("\\", "/")
+        return "" if key == "." else key
+
+    def _chat_path(self, chat_id: str, file_path: str) -> str:
+        chat_dir = os.path.abspath(self._get_chat_dir(chat_id))
+        return os.path.relpath(os.path.abspath(file_path), chat_dir).replace("\\", "/")
+
+    async def _record_baseline(self, chat_id: str, file_path: str, stat: Optional[StorageStat]) -> None:
+        # A file that predates versioning keeps its current content as the first version
+        if not settings.VERSIONING_ENABLED or stat is None or stat.is_dir or stat.size > settings.VERSION_MAX_FILE_SIZE:
+            return
+        rel_path = self._chat_path(chat_id, file_path)
+        if await run_blocking(version_service.has_versions, chat_id, rel_path):
+            return
+        data = await run_blocking(self.storage.read_bytes, self._key(file_path))
+        await run_blocking(version_service.record, chat_id, rel_path, data, make_etag(stat), "baseline")
+
+    async def _record_overwritten(self, chat_id: str, file_path: str) -> bool:
+        """Before a move or copy replaces `file_path`, keep its current content as a version; True if it is a file."""
+        stat = await run_blocking(self.storage.stat, self._key(file_path))
+        if stat is None or stat.is_dir:
+            return False
+        if settings.VERSIONING_ENABLED and stat.size <= settings.VERSION_MAX_FILE_SIZE:
+            rel_path = self._chat_path(chat_id, file_path)
+            latest = await run_blocking(version_service.latest, chat_id, rel_path)
+            # Also covers files changed outside the API since their last version
+            if latest is None or latest.etag != make_etag(stat):
+                data = await run_blocking(self.storage.read_bytes, self._key(file_path))
+                await run_blocking(version_service.record, chat_id, rel_path, data, make_etag(stat), "baseline")
+        return True
+
+    async def _record_version(
+        self,
+        chat_id: str,
+        file_path: str,
+        stat: StorageStat,
+        data: Optional[bytes] = None,
+        source: str = "write",
+        appended: Optional[bytes] = None,
+        base: Optional[StorageStat] = None
+    ) -> Optional[VersionRecord]:
+        if not settings.VERSIONING_ENABLED or stat.size > settings.VERSION_MAX_FILE_SIZE:
+            return None
+        rel_path = self._chat_path(chat_id, file_path)
+        if data is None and appended is not None and base is not None:
+            # An append extends the latest version; only its tail is chunked again
+            record = await run_blocking(
+                version_service.record_append, chat_id, rel_path, appended, make_etag(base), make_etag(stat), source
+            )
+            if record is not None:
+                return record
+        if data is None:
+            data = await run_blocking(self.storage.read_bytes, self._key(file_path))
+        return await run_blocking(version_service.record, chat_id, rel_path, data, make_etag(stat), source)
+
+    async def _replace_file(self, chat_id: str, file_path: str, data: bytes, source: str = "write") -> StorageStat:
+        key = self._key(file_path)
+        async with coordinator.lock(key):
+            await self._record_baseline(chat_id, file_path, await run_blocking(self.storage.stat, key))
+            await run_blocking(self.storage.write_bytes, key, data)
+            stat = await run_blocking(self.storage.stat, key)
+            await self._record_version(chat_id, file_path, stat, data, source)
+        await self._invalidate(file_path)
+        return stat
+
+    async def _invalidate(self, *file_paths: str) -> None:
+        keys = [self._key(file_path) for file_path in file_paths]
+        file_cache.invalidate(*keys)
+        # Publishing writes to the shared coordination store
+        await run_blocking(coordinator.invalidate, *keys, *[parent_key(key) for key in keys])
+
+    async def list_files(
+        self,
+        chat_id: str,
+        path: Optional[str] = None,
+        recursive: bool = False,
+        checksum: bool = False
+    ) -> FileListResponse:
         chat_dir = self._get_chat_dir(chat_id)
         
+        chat_key = self._key(chat_dir)
+        
         # Auto-create chat directory if it doesn't exist (e.g. new chat)
-        if not os.path.exists(chat_dir):
-            os.makedirs(chat_dir, exist_ok=True)
+        if not await run_blocking(self.storage.exists, chat_key):
+            await run_blocking(self.storage.makedirs, chat_key)
 
         base_dir = resolve_path(path, base_dir=chat_dir)
+        stat = await run_blocking(self.storage.stat, self._key(base_dir))
         
-        if not os.path.exists(base_dir):
+        if stat is None:
             raise HTTPException(status_code=404, detail="Path not found")
         
-        if not os.path.isdir(base_dir):
+        if not stat.is_dir:
             raise HTTPException(status_code=400, detail="Path is not a directory")
         
-        def scan_directory(directory: str) -> List[FileItem]:
+        file_stats: List[Tuple[FileItem, StorageStat]] = []
+
+        def scan_directory(key: str) -> List[FileItem]:
             items = []
             try:
-                with os.scandir(directory) as it:
-                    for entry in it:
-                        is_dir = entry.is_dir()
-                        item_path = entry.path
-                        # Use relative path for API consistency and security
-                        rel_path = os.path.relpath(item_path, chat_dir).replace("\\", "/")
-                        stat = entry.stat()
-                        
-                        file_item = FileItem(
-                            name=entry.name,
-                            path=rel_path,
-                            type="directory" if is_dir else "file",
-                            size=stat.st_size if not is_dir else 0,
-                            modified=stat.st_mtime,
-                            mime_type=get_mime_type(entry.name) if not is_dir else None,
-                            chat_id=chat_id,
-                            children=scan_directory(item_path) if is_dir and recursive else None
-                        )
-                        items.append(file_item)
+                for entry in self.storage.list_dir(key):
+                    is_dir = entry.stat.is_dir
+                    # Use relative path for API consistency and security
+                    rel_path = entry.key[len(chat_key):].lstrip("/")
+                    
+                    file_item = FileItem(
+                        name=entry.name,
+                        path=rel_path,
+                        type="directory" if is_dir else "file",
+                        size=entry.stat.size,
+                        modified=entry.stat.modified,
+                        mime_type=get_mime_type(entry.name) if not is_dir else None,
+                        chat_id=chat_id,
+                        children=scan_directory(entry.key) if is_dir and recursive else None
+                    )
+                    items.append(file_item)
+                    if checksum and not is_dir:
+                        file_stats.append((file_item, entry.stat))
                 
                 items.sort(key=lambda x: (x.type == "file", x.name.lower()))
                 return items
@@ -78,7 +198,11 @@ class FileService:
                 return []
 
         try:
-            files = scan_directory(base_dir)
+            files = await run_blocking(scan_directory, self._key(base_dir))
+            if file_stats:
+                async for index, result in self._bulk_map(file_stats, lambda pair: self._try_checksum(pair[1])):
+                    if result is not None:
+                        file_stats[index][0].checksum = result.digest
             return FileListResponse(files=files, path=base_dir, count=len(files), chat_id=chat_id)
         except PermissionError:
             raise HTTPException(status_code=403, detail="Permission denied")
@@ -91,7 +215,6 @@ class FileService:
     ) -> FileUploadResponse:
         chat_dir = self._get_chat_dir(chat_id)
         target_dir = resolve_path(path, base_dir=chat_dir)
-        os.makedirs(target_dir, exist_ok=True)
         
         filename = file.filename or "unnamed"
         file_path = os.path.join(target_dir, filename)
@@ -104,17 +227,18 @@ class FileService:
             if len(content) > settings.MAX_UPLOAD_SIZE:
                 raise HTTPException(status_code=413, detail="File too large")
             
-            with open(file_path, "wb") as buffer:
-                buffer.write(content)
+            await self._replace_file(chat_id, file_path, content)
             
             return FileUploadResponse(
                 success=True,
                 filename=filename,
                 path=file_path,
-                size=os.path.getsize(file_path),
+                size=len(content),
                 mime_type=get_mime_type(filename),
                 chat_id=chat_id
             )
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
@@ -126,7 +250,6 @@ class FileService:
     ) -> MultipleFileUploadResponse:
         chat_dir = self._get_chat_dir(chat_id)
         target_dir = resolve_path(path, base_dir=chat_dir)
-        os.makedirs(target_dir, exist_ok=True)
         
         results = []
         success_count = 0
@@ -187,14 +310,13 @@ class FileService:
                     chat_id=chat_id
                 )
             
-            with open(file_path, "wb") as buffer:
-                buffer.write(content)
+            await self._replace_file(chat_id, file_path, content)
             
             return FileUploadResponse(
                 success=True,
                 filename=filename,
                 path=file_path,
-                size=os.path.getsize(file_path),
+                size=len(content),
                 mime_type=get_mime_type(filename),
                 chat_id=chat_id
             )
@@ -212,75 +334,266 @@ class FileService:
         chat_dir = self._get_chat_dir(chat_id)
         target_dir = resolve_path(path, base_dir=chat_dir)
         file_path = os.path.join(target_dir, filename)
+        key = self._key(file_path)
+        stat = await run_blocking(self.storage.stat, key)
         
-        if not os.path.exists(file_path):
+        if stat is None:
             raise HTTPException(status_code=404, detail="File not found")
         
-        if os.path.isdir(file_path):
+        if stat.is_dir:
             raise HTTPException(status_code=400, detail="Cannot read directory as file")
         
-        try:
-            # Try reading as UTF-8 first
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
-        except UnicodeDecodeError:
-            try:
-                # Fallback to latin-1 (which can read any byte sequence)
-                with open(file_path, "r", encoding="latin-1") as f:
-                    content = f.read()
-            except Exception:
-                raise HTTPException(status_code=400, detail="File is not text-readable")
+        data, content = await run_blocking(self._read_cached, key, stat, True)
 
         return FileReadResponse(
             filename=filename,
             path=file_path,
             content=content,
             mime_type=get_mime_type(filename),
-            size=os.path.getsize(file_path),
-            chat_id=chat_id
+            size=len(data),
+            chat_id=chat_id,
+            etag=make_etag(stat)
+        )
+
+    @staticmethod
+    def _content_disposition(filename: str) -> str:
+        # Same form as FileResponse, so cached and uncached downloads look alike
+        quoted = quote(filename)
+        if quoted != filename:
+            return f"attachment; filename*=utf-8''{quoted}"
+        return f'attachment; filename="{filename}"'
+
+    def _read_cached(self, key: str, stat: StorageStat, decode: bool = False) -> Tuple[bytes, Optional[str]]:
+        """Read a whole file through the hot-file cache; with `decode`, also return its text."""
+        entry = file_cache.get(key, stat)
+        if entry is not None and (entry.text is not None or not decode):
+            return entry.data, entry.text
+        data = entry.data if entry is not None else self.storage.read_bytes(key)
+        content, encoding = self._decode(data) if decode else (None, None)
+        file_cache.put(key, stat, data, content, encoding)
+        return data, content
+
+    async def download_file(
+        self,
+        chat_id: str,
+        filename: str,
+        path: Optional[str] = None,
+        accept_encoding: Optional[str] = None,
+        range_header: Optional[str] = None
+    ) -> Response:
+        chat_dir = self._get_chat_dir(chat_id)
+        target_dir = resolve_path(path, base_dir=chat_dir)
+        file_path = resolve_path(filename, base_dir=target_dir)
+        key = self._key(file_path)
+        stat = await run_blocking(self.storage.stat, key)
+        
+        if stat is None:
+            raise HTTPException(status_code=404, detail="File not found")
+        
+        if stat.is_dir:
+            raise HTTPException(status_code=400, detail="Cannot download directory")
+        
+        mime_type = get_mime_type(filename)
+        encoding = negotiate_encoding(accept_encoding)
+        if encoding and is_compressible(mime_type) and stat.size >= settings.COMPRESSION_MIN_SIZE:
+            variant_path = await run_blocking(compression_cache.get_variant, self.storage, stat, encoding)
+            return FileResponse(
+                path=variant_path,
+                filename=filename,
+                media_type=mime_type,
+                headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"}
+            )
+        
+        if not range_header and file_cache.cacheable(stat):
+            data, _ = await run_blocking(self._read_cached, key, stat)
+            return Response(
+                content=data,
+                media_type=mime_type,
+                headers={
+                    "Content-Disposition": self._content_disposition(filename),
+                    "ETag": make_etag(stat),
+                    "Last-Modified": formatdate(stat.modified, usegmt=True)
+                }
+            )
+        
+        local_path = await run_blocking(self.storage.local_path, key)
+        if local_path:
+            return FileResponse(
+                path=local_path,
+                filename=filename,
+                media_type=get_mime_type(filename)
+            )
+        
+        # No local file (memory, S3 without cache, compressed at rest): stream from the backend
+        headers = {
+            "Content-Disposition": self._content_disposition(os.path.basename(filename)),
+            "Accept-Ranges": "bytes",
+            "ETag": make_etag(stat),
+            "Last-Modified": formatdate(stat.modified, usegmt=True)
+        }
+        byte_range = self._parse_range(range_header, stat.size)
+        if byte_range is None:
+            headers["Content-Length"] = str(stat.size)
+            return StreamingResponse(
+                iterate_in_threadpool(self.storage.iter_bytes(key)),
+                media_type=mime_type,
+                headers=headers
+            )
+        start, end = byte_range
+        headers["Content-Length"] = str(end - start)
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{stat.size}"
+        return StreamingResponse(
+            iterate_in_threadpool(self._iter_range(key, start, end)),
+            status_code=206,
+            media_type=mime_type,
+            headers=headers
         )
 
+    @staticmethod
+    def _parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+        """[start, end) of a single `bytes=` range; None to send the whole file (no or multiple ranges)."""
+        if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+            return None
+        first, _, last = range_header[6:].strip().partition("-")
+        try:
+            if first:
+                start = int(first)
+                end = min(int(last) + 1, size) if last else size
+            else:
+                start, end = max(0, size - int(last)), size
+        except ValueError:
+            return None
+        if start >= size or start >= end:
+            raise HTTPException(
+                status_code=416,
+                detail="Requested range not satisfiable",
+                headers={"Content-Range": f"bytes */{size}"}
+            )
+        return start, end
+
+    def _iter_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        # One pass over the stream: compressed-at-rest files can only be read from the start
+        offset = 0
+        for chunk in self.storage.iter_bytes(key):
+            if offset + len(chunk) > start:
+                yield chunk[max(0, start - offset):end - offset]
+            offset += len(chunk)
+            if offset >= end:
+                break
+
     async def write_file(
         self,
         chat_id: str,
         filename: str,
-        content: str,
-        path: Optional[str] = None
+        content: Optional[str] = None,
+        path: Optional[str] = None,
+        mode: str = "overwrite",
+        patch: Optional[str] = None,
+        edits: Optional[List[FileEdit]] = None,
+        base_etag: Optional[str] = None
     ) -> FileWriteResponse:
         chat_dir = self._get_chat_dir(chat_id)
         target_dir = resolve_path(path, base_dir=chat_dir)
         
         # Resolve full path to ensure it's safe and within allowed directory
         file_path = resolve_path(filename, base_dir=target_dir)
+        key = self._key(file_path)
         
-        # Ensure parent directory exists
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        if mode in ("overwrite", "append") and content is None:
+            raise HTTPException(status_code=400, detail=f"content is required in {mode} mode")
+        if mode == "patch" and (patch is None) == (edits is None):
+            raise HTTPException(status_code=400, detail="patch mode requires exactly one of patch or edits")
         
         try:
-            with open(file_path, "w", encoding="utf-8", newline="") as f:
-                f.write(content)
+            async with coordinator.lock(key):
+                stat = await run_blocking(self.storage.stat, key)
+                if stat is not None and stat.is_dir:
+                    raise HTTPException(status_code=400, detail="Cannot write to a directory")
+                if base_etag is not None:
+                    current_etag = make_etag(stat) if stat else None
+                    if current_etag is None or (base_etag != "*" and base_etag != current_etag):
+                        raise HTTPException(status_code=412, detail="File has changed since base_etag")
+                await self._record_baseline(chat_id, file_path, stat)
+                
+                data = None
+                appended = None
+                # Parent directories are created by the storage backend
+                if mode == "append":
+                    appended = content.encode("utf-8")
+                    await run_blocking(self.storage.append_bytes, key, appended)
+                    if stat is None:
+                        data = appended
+                elif mode == "patch":
+                    if stat is None:
+                        raise HTTPException(status_code=404, detail="File not found")
+                    text, encoding = self._decode(await run_blocking(self.storage.read_bytes, key))
+                    try:
+                        if patch is not None:
+                            text = apply_unified_diff(text, patch)
+                        else:
+                            text = apply_edits(text, [(e.start, e.end, e.content) for e in edits])
+                    except PatchConflictError as e:
+                        raise HTTPException(status_code=409, detail=f"Patch conflict: {str(e)}")
+                    except PatchError as e:
+                        raise HTTPException(status_code=400, detail=f"Invalid patch: {str(e)}")
+                    try:
+                        data = text.encode(encoding)
+                    except UnicodeEncodeError:
+                        data = text.encode("utf-8")
+                    await run_blocking(self.storage.write_bytes, key, data)
+                else:
+                    data = content.encode("utf-8")
+                    await run_blocking(self.storage.write_bytes, key, data)
+                
+                base, stat = stat, await run_blocking(self.storage.stat, key)
+                await self._record_version(chat_id, file_path, stat, data, appended=appended, base=base)
+            await self._invalidate(file_path)
             
             return FileWriteResponse(
                 success=True,
                 filename=filename,
                 path=file_path,
-                size=os.path.getsize(file_path),
-                chat_id=chat_id
+                size=stat.size,
+                chat_id=chat_id,
+                etag=make_etag(stat)
             )
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Write failed: {str(e)}")
 
+    @staticmethod
+    def _decode(data: bytes) -> Tuple[str, str]:
+        try:
+            # Try reading as UTF-8 first
+            return data.decode("utf-8"), "utf-8"
+        except UnicodeDecodeError:
+            # Fallback to latin-1 (which can read any byte sequence)
+            return data.decode("latin-1"), "latin-1"
+
+    @classmethod
+    def _decode_prefix(cls, data: bytes) -> str:
+        # A byte cap can split a multi-byte UTF-8 character at the end; drop the partial character
+        try:
+            return data.decode("utf-8")
+        except UnicodeDecodeError as e:
+            if e.reason == "unexpected end of data":
+                return data[:e.start].decode("utf-8")
+            return cls._decode(data)[0]
+
     async def create_directory(self, chat_id: str, name: str, path: Optional[str] = None) -> DirectoryCreateResponse:
         chat_dir = self._get_chat_dir(chat_id)
         base_dir = resolve_path(path, base_dir=chat_dir)
-        os.makedirs(base_dir, exist_ok=True)
         new_dir_path = os.path.join(base_dir, name)
         
-        if os.path.exists(new_dir_path):
+        if await run_blocking(self.storage.exists, self._key(new_dir_path)):
             raise HTTPException(status_code=400, detail="Directory already exists")
         
         try:
-            os.makedirs(new_dir_path)
+            # Holds the parent directories, so the directory is not created inside one being moved or deleted
+            async with coordinator.lock(self._key(new_dir_path)):
+                await run_blocking(self.storage.makedirs, self._key(new_dir_path))
+            await self._invalidate(new_dir_path)
             return DirectoryCreateResponse(
                 success=True,
                 path=new_dir_path,
@@ -295,14 +608,13 @@ class FileService:
         target_dir = resolve_path(path, base_dir=chat_dir)
         file_path = os.path.join(target_dir, filename)
         
-        if not os.path.exists(file_path):
+        if not await run_blocking(self.storage.exists, self._key(file_path)):
             raise HTTPException(status_code=404, detail="File not found")
         
         try:
-            if os.path.isdir(file_path):
-                shutil.rmtree(file_path)
-            else:
-                os.remove(file_path)
+            async with coordinator.lock(self._key(file_path)):
+                await run_blocking(self.storage.delete, self._key(file_path))
+            await self._invalidate(file_path)
             
             return FileDeleteResponse(
                 success=True,
@@ -310,6 +622,8 @@ class FileService:
                 path=file_path,
                 chat_id=chat_id
             )
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Delete failed: {str(e)}")
 
@@ -322,29 +636,34 @@ class FileService:
     ) -> FileSearchResponse:
         chat_dir = self._get_chat_dir(chat_id)
         search_dir = resolve_path(path, base_dir=chat_dir)
+        search_key = self._key(search_dir)
         
-        if not os.path.exists(search_dir):
+        if not await run_blocking(self.storage.exists, search_key):
             raise HTTPException(status_code=404, detail="Search path not found")
         
-        results = []
         allowed_extensions = extensions.split(',') if extensions else None
         
-        for root, dirs, files in os.walk(search_dir):
-            for file in files:
-                if query.lower() in file.lower():
-                    if allowed_extensions:
-                        file_ext = file.rsplit('.', 1)[1].lower() if '.' in file else ''
-                        if file_ext not in [e.strip() for e in allowed_extensions]:
-                            continue
-                    
-                    file_path = os.path.join(root, file)
-                    rel_path = os.path.relpath(file_path, search_dir)
-                    results.append(FileSearchResult(
-                        name=file,
-                        path=file_path,
-                        relative_path=rel_path,
-                        size=os.path.getsize(file_path)
-                    ))
+        def walk() -> List[FileSearchResult]:
+            results = []
+            for root, dirs, files in self.storage.walk(search_key):
+                for entry in files:
+                    file = entry.name
+                    if query.lower() in file.lower():
+                        if allowed_extensions:
+                            file_ext = file.rsplit('.', 1)[1].lower() if '.' in file else ''
+                            if file_ext not in [e.strip() for e in allowed_extensions]:
+                                continue
+                        
+                        rel_path = entry.key[len(search_key):].lstrip("/")
+                        results.append(FileSearchResult(
+                            name=file,
+                            path=os.path.join(search_dir, *rel_path.split("/")),
+                            relative_path=rel_path,
+                            size=entry.stat.size
+                        ))
+            return results
+        
+        results = await run_blocking(walk)
         
         return FileSearchResponse(
             results=results,
@@ -352,24 +671,286 @@ class FileService:
             count=len(results)
         )
 
-    async def get_file_info(self, chat_id: str, filename: str, path: Optional[str] = None) -> FileInfoResponse:
+    async def get_file_info(
+        self,
+        chat_id: str,
+        filename: str,
+        path: Optional[str] = None,
+        checksum: bool = False
+    ) -> FileInfoResponse:
         chat_dir = self._get_chat_dir(chat_id)
         target_dir = resolve_path(path, base_dir=chat_dir)
         file_path = os.path.join(target_dir, filename)
+        stat = await run_blocking(self.storage.stat, self._key(file_path))
         
-        if not os.path.exists(file_path):
+        if stat is None:
             raise HTTPException(status_code=404, detail="File not found")
         
-        stat = os.stat(file_path)
+        info = self._info_response(filename, file_path, stat)
+        if checksum and stat.is_file:
+            info.checksum = (await run_blocking(self._file_checksum, stat)).digest
+        return info
+
+    def _file_checksum(self, stat: StorageStat) -> FileChecksum:
+        return checksum_service.checksum(self.storage, stat)
+
+    def _try_checksum(self, stat: StorageStat) -> Optional[FileChecksum]:
+        # For listings: a file removed since it was listed simply gets no checksum
+        try:
+            return self._file_checksum(stat)
+        except FileNotFoundError:
+            return None
+
+    async def get_checksum(
+        self,
+        chat_id: str,
+        filename: str,
+        path: Optional[str] = None,
+        chunks: bool = True
+    ) -> FileChecksumResponse:
+        chat_dir = self._get_chat_dir(chat_id)
+        target_dir = resolve_path(path, base_dir=chat_dir)
+        file_path = resolve_path(filename, base_dir=target_dir)
+        stat = await run_blocking(self.storage.stat, self._key(file_path))
+
+        if stat is None:
+            raise HTTPException(status_code=404, detail="File not found")
+
+        if stat.is_dir:
+            raise HTTPException(status_code=400, detail="Cannot checksum directory")
+
+        result = await run_blocking(self._file_checksum, stat)
+        chunk_items = None
+        if chunks:
+            # Small files are a single chunk
+            digests = result.chunks or [result.digest]
+            chunk_items = [
+                ChunkChecksum(
+                    index=i,
+                    offset=i * result.chunk_size,
+                    size=min(result.chunk_size, result.size - i * result.chunk_size),
+                    checksum=digest
+                )
+                for i, digest in enumerate(digests)
+            ]
+        return FileChecksumResponse(
+            filename=filename,
+            path=file_path,
+            size=result.size,
+            algorithm=CHECKSUM_ALGORITHM,
+            checksum=result.digest,
+            chunk_size=result.chunk_size,
+            chunks=chunk_items,
+            etag=make_etag(stat),
+            chat_id=chat_id
+        )
+
+    async def verify_checksums(self, chat_id: str, request: ChecksumVerifyRequest) -> ChecksumVerifyResponse:
+        chat_dir = self._get_chat_dir(chat_id)
+        chat_key = self._key(chat_dir)
+        base_key = self._key(resolve_path(request.path, base_dir=chat_dir))
+        base_stat = await run_blocking(self.storage.stat, base_key)
+
+        if base_stat is None or not base_stat.is_dir:
+            raise HTTPException(status_code=404, detail="Directory not found")
+
+        def collect() -> List[StorageEntry]:
+            return [entry for _, _, files in self.storage.walk(base_key) for entry in files]
+
+        entries = await run_blocking(collect)
+        expected = request.expected or {}
+        results: List[Optional[ChecksumVerifyItem]] = [None] * len(entries)
+        async for index, result in self._bulk_map(entries, lambda entry: self._try_checksum(entry.stat)):
+            if result is None:
+                continue
+            rel_path = entries[index].key[len(chat_key):].lstrip("/")
+            want = expected.get(rel_path)
+            if request.expected is None:
+                status = "computed"
+            elif want is None:
+                status = "extra"
+            else:
+                status = "match" if want.lower() == result.digest else "mismatch"
+            results[index] = ChecksumVerifyItem(
+                path=rel_path, size=result.size, checksum=result.digest, expected=want, status=status
+            )
+
+        results = [item for item in results if item is not None]
+        found = {item.path for item in results}
+        base_rel = base_key[len(chat_key):].strip("/")
+        for rel_path, want in expected.items():
+            rel_path = rel_path.strip("/")
+            in_scope = not base_rel or rel_path.startswith(base_rel + "/")
+            if in_scope and rel_path not in found:
+                results.append(ChecksumVerifyItem(path=rel_path, expected=want, status="missing"))
+
+        results.sort(key=lambda item: item.path)
+        return ChecksumVerifyResponse(
+            results=results,
+            count=len(results),
+            mismatched=sum(1 for item in results if item.status == "mismatch"),
+            missing=sum(1 for item in results if item.status == "missing"),
+            algorithm=CHECKSUM_ALGORITHM,
+            chat_id=chat_id
+        )
+
+    @staticmethod
+    def _info_response(filename: str, file_path: str, stat: StorageStat) -> FileInfoResponse:
         return FileInfoResponse(
             filename=filename,
             path=file_path,
-            size=stat.st_size,
-            modified=stat.st_mtime,
-            created=stat.st_ctime,
-            is_directory=os.path.isdir(file_path),
-            is_file=os.path.isfile(file_path),
-            mime_type=get_mime_type(filename) if os.path.isfile(file_path) else None
+            size=stat.size,
+            modified=stat.modified,
+            created=stat.created,
+            is_directory=stat.is_dir,
+            is_file=stat.is_file,
+            mime_type=get_mime_type(filename) if stat.is_file else None,
+            etag=make_etag(stat) if stat.is_file else None
+        )
+
+    def _bulk_targets(self, chat_id: str, paths: List[str], path: Optional[str]) -> List[Tuple[str, Optional[str], Optional[BulkFileError]]]:
+        """Resolve each requested path once; returns (requested path, file path, error)."""
+        target_dir = resolve_path(path, base_dir=self._get_chat_dir(chat_id))
+        targets = []
+        for requested in paths:
+            try:
+                targets.append((requested, resolve_path(requested, base_dir=target_dir), None))
+            except HTTPException as e:
+                targets.append((requested, None, BulkFileError(status_code=e.status_code, detail=e.detail)))
+        return targets
+
+    async def _bulk_map(self, items: List[T], fn: Callable[[T], R]) -> AsyncIterator[Tuple[int, R]]:
+        """Run blocking `fn` over items in worker threads, yielding (index, result) as each completes."""
+        semaphore = asyncio.Semaphore(settings.BULK_CONCURRENCY)
+
+        async def run(index: int, item: T) -> Tuple[int, R]:
+            async with semaphore:
+                return index, await run_blocking(fn, item)
+
+        tasks = [asyncio.ensure_future(run(i, item)) for i, item in enumerate(items)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    def _ndjson(results: AsyncIterator[Tuple[int, BaseModel]]) -> StreamingResponse:
+        async def lines():
+            async for _, item in results:
+                yield item.model_dump_json() + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    def _check_bulk_size(self, paths: List[str]) -> None:
+        if len(paths) > settings.BULK_MAX_PATHS:
+            raise HTTPException(status_code=400, detail=f"At most {settings.BULK_MAX_PATHS} paths per request")
+
+    async def _iter_bulk_info(self, chat_id: str, request: BulkFileRequest) -> AsyncIterator[Tuple[int, BulkInfoItem]]:
+        targets = self._bulk_targets(chat_id, request.paths, request.path)
+
+        def info(target: Tuple[str, Optional[str], Optional[BulkFileError]]) -> BulkInfoItem:
+            requested, file_path, error = target
+            if error is not None:
+                return BulkInfoItem(path=requested, error=error)
+            stat = self.storage.stat(self._key(file_path))
+            if stat is None:
+                return BulkInfoItem(path=requested, error=BulkFileError(status_code=404, detail="File not found"))
+            return BulkInfoItem(path=requested, info=self._info_response(os.path.basename(file_path), file_path, stat))
+
+        async for result in self._bulk_map(targets, info):
+            yield result
+
+    async def get_files_info(self, chat_id: str, request: BulkFileRequest) -> Union[BulkInfoResponse, StreamingResponse]:
+        self._check_bulk_size(request.paths)
+        results = self._iter_bulk_info(chat_id, request)
+        if request.stream:
+            return self._ndjson(results)
+        items = sorted([r async for r in results], key=lambda r: r[0])
+        return BulkInfoResponse(results=[item for _, item in items], count=len(items), chat_id=chat_id)
+
+    async def _iter_bulk_read(self, chat_id: str, request: BulkReadRequest) -> AsyncIterator[Tuple[int, BulkReadItem]]:
+        targets = self._bulk_targets(chat_id, request.paths, request.path)
+        per_file = min(request.max_file_bytes if request.max_file_bytes is not None else settings.BULK_READ_MAX_FILE_BYTES, settings.BULK_READ_MAX_FILE_BYTES)
+        remaining = min(request.max_total_bytes if request.max_total_bytes is not None else settings.BULK_READ_MAX_TOTAL_BYTES, settings.BULK_READ_MAX_TOTAL_BYTES)
+
+        def stat(target: Tuple[str, Optional[str], Optional[BulkFileError]]) -> Tuple[Optional[StorageStat], Optional[BulkFileError]]:
+            _, file_path, error = target
+            if error is not None:
+                return None, error
+            file_stat = self.storage.stat(self._key(file_path))
+            if file_stat is None:
+                return None, BulkFileError(status_code=404, detail="File not found")
+            if file_stat.is_dir:
+                return None, BulkFileError(status_code=400, detail="Cannot read directory as file")
+            return file_stat, None
+
+        # One stat per path up front, so the total budget is shared out in request order
+        stats: List[Tuple[Optional[StorageStat], Optional[BulkFileError]]] = [(None, None)] * len(targets)
+        async for index, result in self._bulk_map(targets, stat):
+            stats[index] = result
+
+        reads = []
+        for index, ((requested, file_path, _), (file_stat, error)) in enumerate(zip(targets, stats)):
+            if error is not None:
+                yield index, BulkReadItem(path=requested, error=error)
+                continue
+            grant = min(file_stat.size, per_file, remaining)
+            # The per-file cap is named when it alone would have limited the file
+            limit = "file" if per_file <= remaining else "total"
+            if grant == 0 and file_stat.size > 0:
+                detail = "Per-file byte limit reached" if limit == "file" else "Total byte limit reached"
+                yield index, BulkReadItem(path=requested, error=BulkFileError(status_code=413, detail=detail))
+                continue
+            remaining -= grant
+            reads.append((index, requested, file_path, file_stat, grant, limit))
+
+        def read(job: Tuple[int, str, str, StorageStat, int, str]) -> BulkReadItem:
+            _, requested, file_path, file_stat, grant, limit = job
+            key = self._key(file_path)
+            try:
+                if grant < file_stat.size:
+                    data, content = self.storage.read_range(key, 0, grant), None
+                else:
+                    data, content = self._read_cached(key, file_stat, True)
+            except FileNotFoundError:
+                return BulkReadItem(path=requested, error=BulkFileError(status_code=404, detail="File not found"))
+            # The file may have grown since it was stat'ed
+            truncated = grant < file_stat.size or len(data) > grant
+            if truncated:
+                data = data[:grant]
+                content = self._decode_prefix(data)
+            filename = os.path.basename(file_path)
+            return BulkReadItem(
+                path=requested,
+                truncated=truncated,
+                truncated_by=limit if truncated else None,
+                file=FileReadResponse(
+                    filename=filename,
+                    path=file_path,
+                    content=content,
+                    mime_type=get_mime_type(filename),
+                    size=len(data),
+                    chat_id=chat_id,
+                    etag=make_etag(file_stat)
+                )
+            )
+
+        async for read_index, item in self._bulk_map(reads, read):
+            yield reads[read_index][0], item
+
+    async def read_files(self, chat_id: str, request: BulkReadRequest) -> Union[BulkReadResponse, StreamingResponse]:
+        self._check_bulk_size(request.paths)
+        results = self._iter_bulk_read(chat_id, request)
+        if request.stream:
+            return self._ndjson(results)
+        items = [item for _, item in sorted([r async for r in results], key=lambda r: r[0])]
+        return BulkReadResponse(
+            results=items,
+            count=len(items),
+            total_bytes=sum(item.file.size for item in items if item.file),
+            chat_id=chat_id
         )
 
     async def move_file(self, chat_id: str, request: FileMoveRequest) -> FileMoveResponse:
@@ -380,17 +961,32 @@ class FileService:
         src_file = os.path.join(src_dir, request.source)
         dst_file = os.path.join(dst_dir, request.destination)
         
-        if not os.path.exists(src_file):
+        if not await run_blocking(self.storage.exists, self._key(src_file)):
             raise HTTPException(status_code=404, detail="Source file not found")
         
         try:
-            os.makedirs(dst_dir, exist_ok=True)
-            shutil.move(src_file, dst_file)
+            async with coordinator.lock(self._key(src_file), self._key(dst_file)):
+                replaced = await self._record_overwritten(chat_id, dst_file)
+                await run_blocking(self.storage.move, self._key(src_file), self._key(dst_file))
+                if settings.VERSIONING_ENABLED:
+                    await run_blocking(
+                        version_service.rename,
+                        chat_id,
+                        self._chat_path(chat_id, src_file),
+                        self._chat_path(chat_id, dst_file)
+                    )
+                if replaced:
+                    await self._record_version(
+                        chat_id, dst_file, await run_blocking(self.storage.stat, self._key(dst_file)), source="move"
+                    )
+            await self._invalidate(src_file, dst_file)
             return FileMoveResponse(
                 success=True,
                 source=src_file,
                 destination=dst_file
             )
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Move failed: {str(e)}")
 
@@ -402,27 +998,195 @@ class FileService:
         src_file = os.path.join(src_dir, request.source)
         dst_file = os.path.join(dst_dir, request.destination)
         
-        if not os.path.exists(src_file):
+        if not await run_blocking(self.storage.exists, self._key(src_file)):
             raise HTTPException(status_code=404, detail="Source file not found")
         
         try:
-            os.makedirs(dst_dir, exist_ok=True)
-            if os.path.isdir(src_file):
-                shutil.copytree(src_file, dst_file)
-            else:
-                shutil.copy2(src_file, dst_file)
+            async with coordinator.lock(self._key(src_file), self._key(dst_file)):
+                await self._record_overwritten(chat_id, dst_file)
+                await run_blocking(self.storage.copy, self._key(src_file), self._key(dst_file))
+                stat = await run_blocking(self.storage.stat, self._key(dst_file))
+                if stat is not None and stat.is_file:
+                    await self._record_version(chat_id, dst_file, stat, source="copy")
+            await self._invalidate(dst_file)
             return FileCopyResponse(
                 success=True,
                 source=src_file,
                 destination=dst_file
             )
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Copy failed: {str(e)}")
 
+    def _require_versioning(self) -> None:
+        if not settings.VERSIONING_ENABLED:
+            raise HTTPException(status_code=404, detail="Versioning is disabled")
+
+    async def list_versions(self, chat_id: str, filename: str, path: Optional[str] = None) -> FileVersionListResponse:
+        self._require_versioning()
+        chat_dir = self._get_chat_dir(chat_id)
+        file_path = resolve_path(filename, base_dir=resolve_path(path, base_dir=chat_dir))
+        rel_path = self._chat_path(chat_id, file_path)
+        
+        records = await run_blocking(version_service.list_versions, chat_id, rel_path)
+        versions = [
+            FileVersion(id=r.id, size=r.size, created=r.created, manifest_hash=r.manifest_hash, source=r.source)
+            for r in records
+        ]
+        return FileVersionListResponse(
+            versions=versions,
+            filename=filename,
+            path=rel_path,
+            count=len(versions),
+            chat_id=chat_id
+        )
+
+    async def _version_content(self, chat_id: str, rel_path: str, version_id: int) -> bytes:
+        record = await run_blocking(version_service.get, chat_id, version_id)
+        if record is None or record.path != rel_path:
+            raise HTTPException(status_code=404, detail="Version not found")
+        return await run_blocking(version_service.content, chat_id, version_id)
+
+    async def diff_versions(
+        self,
+        chat_id: str,
+        filename: str,
+        from_version: int,
+        to_version: Optional[int] = None,
+        path: Optional[str] = None
+    ) -> FileVersionDiffResponse:
+        self._require_versioning()
+        chat_dir = self._get_chat_dir(chat_id)
+        file_path = resolve_path(filename, base_dir=resolve_path(path, base_dir=chat_dir))
+        rel_path = self._chat_path(chat_id, file_path)
+        
+        old = await self._version_content(chat_id, rel_path, from_version)
+        if to_version is not None:
+            new = await self._version_content(chat_id, rel_path, to_version)
+            to_label = f"{rel_path}@{to_version}"
+        else:
+            try:
+                new = await run_blocking(self.storage.read_bytes, self._key(file_path))
+            except FileNotFoundError:
+                new = b""
+            to_label = rel_path
+        
+        try:
+            old_text, new_text = old.decode("utf-8"), new.decode("utf-8")
+            diff = "".join(difflib.unified_diff(
+                old_text.splitlines(keepends=True),
+                new_text.splitlines(keepends=True),
+                fromfile=f"{rel_path}@{from_version}",
+                tofile=to_label
+            ))
+        except UnicodeDecodeError:
+            diff = "" if old == new else f"Binary files {rel_path}@{from_version} and {to_label} differ\n"
+        
+        return FileVersionDiffResponse(
+            filename=filename,
+            from_version=from_version,
+            to_version=to_version,
+            diff=diff,
+            chat_id=chat_id
+        )
+
+    async def restore_version(self, chat_id: str, filename: str, request: FileVersionRestoreRequest) -> FileWriteResponse:
+        self._require_versioning()
+        chat_dir = self._get_chat_dir(chat_id)
+        file_path = resolve_path(filename, base_dir=resolve_path(request.path, base_dir=chat_dir))
+        data = await self._version_content(chat_id, self._chat_path(chat_id, file_path), request.version_id)
+        
+        try:
+            stat = await self._replace_file(chat_id, file_path, data, source="restore")
+            return FileWriteResponse(
+                success=True,
+                filename=filename,
+                path=file_path,
+                size=stat.size,
+                chat_id=chat_id,
+                etag=make_etag(stat)
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Restore failed: {str(e)}")
+
+    async def create_snapshot(self, chat_id: str, name: Optional[str] = None) -> SnapshotResponse:
+        self._require_versioning()
+        chat_dir = self._get_chat_dir(chat_id)
+        chat_key = self._key(chat_dir)
+        
+        if not await run_blocking(self.storage.exists, chat_key):
+            raise HTTPException(status_code=404, detail="Chat folder not found")
+        
+        def collect() -> List[StorageEntry]:
+            return [entry for _, _, files in self.storage.walk(chat_key) for entry in files]
+        
+        files = []
+        for entry in await run_blocking(collect):
+            if entry.stat.size > settings.VERSION_MAX_FILE_SIZE:
+                continue
+            file_path = os.path.join(chat_dir, *entry.key[len(chat_key):].strip("/").split("/"))
+            rel_path = self._chat_path(chat_id, file_path)
+            # Unchanged files reuse their latest version, so a snapshot only stores what changed
+            latest = await run_blocking(version_service.latest, chat_id, rel_path)
+            if latest and latest.etag == make_etag(entry.stat):
+                files.append((rel_path, latest.id))
+                continue
+            async with coordinator.lock(entry.key):
+                record = await self._record_version(chat_id, file_path, entry.stat, source="snapshot")
+            files.append((rel_path, record.id))
+        
+        snapshot_id, created = await run_blocking(version_service.create_snapshot, chat_id, name, files)
+        return SnapshotResponse(id=snapshot_id, name=name, created=created, file_count=len(files), chat_id=chat_id)
+
+    async def list_snapshots(self, chat_id: str) -> SnapshotListResponse:
+        self._require_versioning()
+        rows = await run_blocking(version_service.list_snapshots, chat_id)
+        snapshots = [
+            SnapshotResponse(id=row[0], name=row[1], created=row[2], file_count=row[3], chat_id=chat_id)
+            for row in rows
+        ]
+        return SnapshotListResponse(snapshots=snapshots, count=len(snapshots), chat_id=chat_id)
+
+    async def restore_snapshot(self, chat_id: str, snapshot_id: int) -> SnapshotRestoreResponse:
+        self._require_versioning()
+        files = await run_blocking(version_service.snapshot_files, chat_id, snapshot_id)
+        if files is None:
+            raise HTTPException(status_code=404, detail="Snapshot not found")
+        
+        # Files created after the snapshot are left in place
+        chat_dir = self._get_chat_dir(chat_id)
+        restored = 0
+        for rel_path, version_id in files:
+            file_path = resolve_path(rel_path, base_dir=chat_dir)
+            record = await run_blocking(version_service.get, chat_id, version_id)
+            latest = await run_blocking(version_service.latest, chat_id, rel_path)
+            stat = await run_blocking(self.storage.stat, self._key(file_path))
+            if stat and latest and record and latest.manifest_hash == record.manifest_hash and latest.etag == make_etag(stat):
+                continue
+            data = await run_blocking(version_service.content, chat_id, version_id)
+            await self._replace_file(chat_id, file_path, data, source="restore")
+            restored += 1
+        
+        return SnapshotRestoreResponse(success=True, snapshot_id=snapshot_id, restored=restored, chat_id=chat_id)
+
+    async def delete_snapshot(self, chat_id: str, snapshot_id: int) -> FileDeleteResponse:
+        self._require_versioning()
+        if not await run_blocking(version_service.delete_snapshot, chat_id, snapshot_id):
+            raise HTTPException(status_code=404, detail="Snapshot not found")
+        return FileDeleteResponse(
+            success=True,
+            message=f"Deleted snapshot {snapshot_id}",
+            path="",
+            chat_id=chat_id
+        )
+
     async def delete_chat_folder(self, chat_id: str) -> FileDeleteResponse:
         chat_dir = self._get_chat_dir(chat_id)
         
-        if not os.path.exists(chat_dir):
+        if not await run_blocking(self.storage.exists, self._key(chat_dir)):
             return FileDeleteResponse(
                 success=True,
                 message=f"Chat folder not found (already deleted or never existed)",
@@ -431,13 +1195,19 @@ class FileService:
             )
         
         try:
-            shutil.rmtree(chat_dir)
+            async with coordinator.lock(self._key(chat_dir)):
+                await run_blocking(self.storage.delete, self._key(chat_dir))
+                if settings.VERSIONING_ENABLED:
+                    await run_blocking(version_service.purge_chat, chat_id)
+            await self._invalidate(chat_dir)
             return FileDeleteResponse(
                 success=True,
                 message=f"Deleted all files for chat {chat_id}",
                 path=chat_dir,
                 chat_id=chat_id
             )
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Delete chat folder failed: {str(e)}")
 
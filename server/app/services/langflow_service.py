@@ -0,0 +1,407 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException
+
+from app.core.blocking import ThreadLocalConnection, run_blocking
+from app.core.config import get_settings
+from app.schemas.langflow import (
+    LangflowMessage,
+    LangflowSession,
+    LangflowSessionListResponse,
+    LangflowMessageListResponse,
+    LangflowSyncResponse,
+    LangflowSessionActionResponse
+)
+
+settings = get_settings()
+
+
+def parse_timestamp(value: Any) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not value:
+        return 0.0
+    text = str(value).strip().replace(" UTC", "+00:00").replace("Z", "+00:00")
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        return 0.0
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def message_session_id(message: Dict[str, Any]) -> Optional[str]:
+    return message.get("session_id") or message.get("sessionId") or message.get("sessionID")
+
+
+class LangflowClient:
+    """Pooled keep-alive HTTP client for the Langflow API."""
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: Optional[str] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            headers = {"x-api-key": self.api_key} if self.api_key else {}
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=headers,
+                transport=self._transport,
+                timeout=httpx.Timeout(settings.LANGFLOW_TIMEOUT, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=settings.LANGFLOW_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LANGFLOW_MAX_KEEPALIVE,
+                    keepalive_expiry=60.0
+                )
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get_messages(self, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        params = {"order_by": "timestamp"}
+        if session_id:
+            params["session_id"] = session_id
+        response = await self.client.get("/api/v1/monitor/messages", params=params)
+        response.raise_for_status()
+        data = response.json()
+        return data if isinstance(data, list) else data.get("data", [])
+
+    async def get_session_ids(self) -> Optional[List[str]]:
+        """Session IDs known to Langflow, or None if this Langflow has no sessions endpoint."""
+        response = await self.client.get("/api/v1/monitor/messages/sessions")
+        if response.status_code in (404, 405):
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    async def delete_session(self, session_id: str) -> None:
+        response = await self.client.delete(f"/api/v1/monitor/messages/session/{session_id}")
+        if response.status_code != 404:
+            response.raise_for_status()
+
+
+class LangflowIndex:
+    """Local SQLite copy of Langflow messages, keyed by session."""
+
+    def __init__(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        self._connect = ThreadLocalConnection(self.db_path)
+        self._connect().executescript(
+            """
+            CREATE TABLE IF NOT EXISTS messages (
+                id TEXT PRIMARY KEY, session_id TEXT NOT NULL, flow_id TEXT, sender TEXT,
+                text TEXT, timestamp REAL NOT NULL, data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS messages_by_session ON messages (session_id, timestamp);
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY, flow_id TEXT, title TEXT,
+                first_timestamp REAL, last_timestamp REAL, message_count INTEGER NOT NULL DEFAULT 0,
+                dirty INTEGER NOT NULL DEFAULT 0, synced REAL
+            );
+            CREATE INDEX IF NOT EXISTS sessions_by_recency ON sessions (last_timestamp DESC);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            """
+        )
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        self._connect().execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
+
+    def session_state(self) -> Dict[str, Tuple[float, bool]]:
+        rows = self._connect().execute("SELECT session_id, last_timestamp, dirty FROM sessions").fetchall()
+        return {row[0]: (row[1] or 0.0, bool(row[2])) for row in rows}
+
+    def upsert_messages(self, messages: Iterable[Dict[str, Any]], watermarks: Dict[str, float]) -> int:
+        """Store messages newer than their session's watermark (or not yet indexed) and refresh session summaries."""
+        conn = self._connect()
+        touched = set()
+        count = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for message in messages:
+                session_id = message_session_id(message)
+                if not session_id or not message.get("id"):
+                    continue
+                timestamp = parse_timestamp(message.get("timestamp"))
+                # Messages at the watermark itself are re-applied: several can share one timestamp
+                if timestamp < watermarks.get(session_id, 0.0):
+                    exists = conn.execute("SELECT 1 FROM messages WHERE id = ?", (message["id"],)).fetchone()
+                    if exists:
+                        continue
+                # Langflow can return several records for one id; the latest one wins
+                conn.execute(
+                    "INSERT INTO messages (id, session_id, flow_id, sender, text, timestamp, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET "
+                    "session_id = excluded.session_id, flow_id = excluded.flow_id, sender = excluded.sender, "
+                    "text = excluded.text, timestamp = excluded.timestamp, data = excluded.data",
+                    (
+                        message["id"], session_id, message.get("flow_id"), message.get("sender"),
+                        message.get("text") or "", timestamp, json.dumps(message)
+                    )
+                )
+                touched.add(session_id)
+                count += 1
+            for session_id in touched:
+                self._refresh_session(conn, session_id)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return count
+
+    def _refresh_session(self, conn: sqlite3.Connection, session_id: str) -> None:
+        first, last, count = conn.execute(
+            "SELECT MIN(timestamp), MAX(timestamp), COUNT(*) FROM messages WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        first_user = conn.execute(
+            "SELECT text FROM messages WHERE session_id = ? AND sender = 'User' ORDER BY timestamp LIMIT 1",
+            (session_id,)
+        ).fetchone()
+        # Lock the agent per chat: flow of the first assistant message, else of any message
+        flow = conn.execute(
+            "SELECT flow_id FROM messages WHERE session_id = ? AND flow_id IS NOT NULL "
+            "ORDER BY sender = 'User', timestamp LIMIT 1",
+            (session_id,)
+        ).fetchone()
+        title = first_user[0][:30] if first_user else f"Chat {session_id[:6]}"
+        conn.execute(
+            "INSERT INTO sessions (session_id, flow_id, title, first_timestamp, last_timestamp, message_count, dirty, synced) "
+            "VALUES (?, ?, ?, ?, ?, ?, 0, ?) ON CONFLICT(session_id) DO UPDATE SET "
+            "flow_id = excluded.flow_id, title = excluded.title, first_timestamp = excluded.first_timestamp, "
+            "last_timestamp = excluded.last_timestamp, message_count = excluded.message_count, "
+            "dirty = 0, synced = excluded.synced",
+            (session_id, flow[0] if flow else None, title, first, last, count, time.time())
+        )
+
+    def mark_synced(self, session_ids: Iterable[str]) -> None:
+        self._connect().executemany(
+            "UPDATE sessions SET dirty = 0, synced = ? WHERE session_id = ?",
+            [(time.time(), session_id) for session_id in session_ids]
+        )
+
+    def mark_dirty(self, session_id: str) -> None:
+        self._connect().execute(
+            "INSERT INTO sessions (session_id, message_count, dirty) VALUES (?, 0, 1) "
+            "ON CONFLICT(session_id) DO UPDATE SET dirty = 1",
+            (session_id,)
+        )
+
+    def is_dirty(self, session_id: str) -> bool:
+        row = self._connect().execute("SELECT dirty FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row is None or bool(row[0])
+
+    def remove_sessions(self, session_ids: Iterable[str]) -> None:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for session_id in session_ids:
+                conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def list_sessions(
+        self,
+        limit: int,
+        offset: int,
+        flow_id: Optional[str] = None,
+        exclude: Optional[str] = None
+    ) -> Tuple[List[Tuple], int]:
+        where = ["message_count > 0"]
+        params: List[Any] = []
+        if flow_id:
+            where.append("flow_id = ?")
+            params.append(flow_id)
+        if exclude:
+            where.append("session_id != ?")
+            params.append(exclude)
+        clause = " AND ".join(where)
+        conn = self._connect()
+        total = conn.execute(f"SELECT COUNT(*) FROM sessions WHERE {clause}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT session_id, flow_id, title, first_timestamp, last_timestamp, message_count "
+            f"FROM sessions WHERE {clause} ORDER BY last_timestamp DESC LIMIT ? OFFSET ?",
+            [*params, limit, offset]
+        ).fetchall()
+        return rows, total
+
+    def session_messages(self, session_id: str, limit: int, offset: int) -> Tuple[List[Dict[str, Any]], int]:
+        conn = self._connect()
+        total = conn.execute("SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,)).fetchone()[0]
+        rows = conn.execute(
+            "SELECT data FROM messages WHERE session_id = ? ORDER BY timestamp, rowid LIMIT ? OFFSET ?",
+            (session_id, limit, offset)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows], total
+
+
+class LangflowService:
+    """Serves Langflow sessions and history from a local index that is synced incrementally.
+
+    A sync asks Langflow for its session IDs, then fetches messages only for
+    sessions that are new, marked dirty, or active within LANGFLOW_ACTIVE_WINDOW,
+    and stores only messages past each session's timestamp watermark. Langflow
+    does not report when a session last changed, so every
+    LANGFLOW_FULL_SYNC_INTERVAL a sync refetches all sessions to pick up
+    messages added to older ones. Langflow versions without the sessions
+    endpoint fall back to one full fetch.
+    """
+
+    def __init__(self, client: LangflowClient, index: LangflowIndex):
+        self.client = client
+        self.index = index
+        self._sync_lock = asyncio.Lock()
+
+    def _require_configured(self) -> None:
+        if not self.client.base_url:
+            raise HTTPException(status_code=503, detail="LANGFLOW_URL is not configured")
+
+    async def sync(self, force: bool = False, if_stale: bool = False) -> LangflowSyncResponse:
+        """Sync the index; `force` refetches every session, `if_stale` skips when synced within LANGFLOW_SYNC_INTERVAL."""
+        self._require_configured()
+        async with self._sync_lock:
+            started = time.time()
+            # Checked under the lock so concurrent readers share a single sync
+            if if_stale:
+                last = await run_blocking(self.index.get_meta, "last_sync")
+                if last and started - float(last) < settings.LANGFLOW_SYNC_INTERVAL:
+                    return LangflowSyncResponse(sessions_synced=0, messages_upserted=0, removed=0, duration=0.0, skipped=True)
+
+            state = await run_blocking(self.index.session_state)
+            watermarks = {session_id: last_ts for session_id, (last_ts, _) in state.items()}
+            last_full = await run_blocking(self.index.get_meta, "last_full_sync")
+            full = force or not last_full or started - float(last_full) >= settings.LANGFLOW_FULL_SYNC_INTERVAL
+            try:
+                remote_ids = await self.client.get_session_ids()
+                if remote_ids is None or full and not state:
+                    messages = await self.client.get_messages()
+                    synced = {message_session_id(m) for m in messages} - {None}
+                    remote = synced if remote_ids is None else set(remote_ids)
+                else:
+                    remote = set(remote_ids)
+                    active_since = started - settings.LANGFLOW_ACTIVE_WINDOW
+                    to_fetch = [
+                        session_id for session_id in remote
+                        if full or session_id not in state or state[session_id][1] or state[session_id][0] >= active_since
+                    ]
+                    messages = await self._fetch_sessions(to_fetch)
+                    synced = set(to_fetch)
+            except httpx.HTTPError as e:
+                raise HTTPException(status_code=502, detail=f"Langflow sync failed: {str(e)}")
+
+            upserted = await run_blocking(self.index.upsert_messages, messages, watermarks)
+            await run_blocking(self.index.mark_synced, synced)
+            removed = [session_id for session_id in state if session_id not in remote]
+            if removed:
+                await run_blocking(self.index.remove_sessions, removed)
+            await run_blocking(self.index.set_meta, "last_sync", str(started))
+            if full:
+                await run_blocking(self.index.set_meta, "last_full_sync", str(started))
+            return LangflowSyncResponse(
+                sessions_synced=len(synced),
+                messages_upserted=upserted,
+                removed=len(removed),
+                duration=time.time() - started
+            )
+
+    async def _fetch_sessions(self, session_ids: List[str]) -> List[Dict[str, Any]]:
+        semaphore = asyncio.Semaphore(settings.LANGFLOW_SYNC_CONCURRENCY)
+
+        async def fetch(session_id: str) -> List[Dict[str, Any]]:
+            async with semaphore:
+                return await self.client.get_messages(session_id)
+
+        results = await asyncio.gather(*[fetch(session_id) for session_id in session_ids])
+        return [message for batch in results for message in batch]
+
+    async def sync_session(self, session_id: str) -> None:
+        self._require_configured()
+        state = await run_blocking(self.index.session_state)
+        try:
+            messages = await self.client.get_messages(session_id)
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=f"Langflow sync failed: {str(e)}")
+        watermark = {session_id: state[session_id][0]} if session_id in state else {}
+        await run_blocking(self.index.upsert_messages, messages, watermark)
+        await run_blocking(self.index.mark_synced, [session_id])
+
+    async def list_sessions(self, limit: int, offset: int, flow_id: Optional[str] = None) -> LangflowSessionListResponse:
+        await self.sync(if_stale=True)
+        rows, total = await run_blocking(
+            self.index.list_sessions, limit, offset, flow_id, settings.LANGFLOW_SUGGESTION_SESSION_ID
+        )
+        sessions = [
+            LangflowSession(
+                session_id=session_id,
+                flow_id=session_flow,
+                title=title,
+                created_at=first,
+                updated_at=last,
+                message_count=count
+            )
+            for session_id, session_flow, title, first, last, count in rows
+        ]
+        return LangflowSessionListResponse(sessions=sessions, total=total, limit=limit, offset=offset)
+
+    async def session_messages(self, session_id: str, limit: int, offset: int) -> LangflowMessageListResponse:
+        if await run_blocking(self.index.is_dirty, session_id):
+            await self.sync_session(session_id)
+        messages, total = await run_blocking(self.index.session_messages, session_id, limit, offset)
+        return LangflowMessageListResponse(
+            session_id=session_id,
+            messages=[LangflowMessage(**{**m, "session_id": session_id}) for m in messages],
+            total=total,
+            limit=limit,
+            offset=offset
+        )
+
+    async def invalidate(self, session_id: str) -> LangflowSessionActionResponse:
+        await run_blocking(self.index.mark_dirty, session_id)
+        return LangflowSessionActionResponse(
+            success=True, session_id=session_id, message="Session will be refetched on next read"
+        )
+
+    async def delete_session(self, session_id: str) -> LangflowSessionActionResponse:
+        self._require_configured()
+        try:
+            await self.client.delete_session(session_id)
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=f"Langflow delete failed: {str(e)}")
+        await run_blocking(self.index.remove_sessions, [session_id])
+        return LangflowSessionActionResponse(success=True, session_id=session_id, message="Session deleted")
+
+
+langflow_client = LangflowClient(settings.LANGFLOW_URL, settings.LANGFLOW_API_KEY)
+langflow_service = LangflowService(langflow_client, LangflowIndex(settings.LANGFLOW_INDEX_DB))
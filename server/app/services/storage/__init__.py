@@ -0,0 +1,47 @@
+from app.core.config import get_settings
+from app.services.coordination import coordinator
+from app.services.storage.base import StorageBackend, StorageEntry, StorageStat, join_key, make_etag
+from app.services.storage.compressed import CompressedStorage
+from app.services.storage.local import LocalStorage
+from app.services.storage.memory import MemoryStorage
+
+settings = get_settings()
+
+
+def create_storage(name: str = None) -> StorageBackend:
+    backend = _create_backend(name or settings.STORAGE_BACKEND)
+    if settings.COMPRESSED_STORAGE:
+        backend = CompressedStorage(backend, settings.COMPRESSED_STORAGE_EXTENSIONS)
+    return backend
+
+
+def _create_backend(name: str) -> StorageBackend:
+    if name == "local":
+        return LocalStorage(settings.UPLOAD_DIR, fsync=settings.WRITE_FSYNC)
+    if name == "memory":
+        return MemoryStorage()
+    if name == "s3":
+        from app.services.storage.s3 import S3Storage
+
+        backend = S3Storage(
+            bucket=settings.S3_BUCKET,
+            prefix=settings.S3_PREFIX,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region=settings.S3_REGION,
+            access_key_id=settings.S3_ACCESS_KEY_ID,
+            secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+            max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+            multipart_threshold=settings.S3_MULTIPART_THRESHOLD,
+            part_size=settings.S3_PART_SIZE,
+            max_concurrency=settings.S3_MAX_CONCURRENCY,
+            cache_dir=settings.S3_CACHE_DIR,
+            cache_max_bytes=settings.S3_CACHE_MAX_BYTES
+        )
+        if backend.cache:
+            # Writes from other nodes reach this node's read-through cache via the coordinator
+            coordinator.subscribe(backend.cache.invalidate)
+        return backend
+    raise ValueError(f"Unknown storage backend: {name}")
+
+
+storage = create_storage()
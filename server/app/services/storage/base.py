@@ -0,0 +1,120 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+
+@dataclass
+class StorageStat:
+    key: str
+    size: int
+    modified: float
+    created: float
+    is_dir: bool
+    inode: int = 0
+    # Content identity reported by the backend (the S3 ETag), when it has one
+    version: str = ""
+
+    @property
+    def is_file(self) -> bool:
+        return not self.is_dir
+
+
+@dataclass
+class StorageEntry:
+    name: str
+    key: str
+    stat: StorageStat
+
+
+def make_etag(stat: StorageStat) -> str:
+    if stat.version:
+        # Object stores have no inode and only second-resolution timestamps, but they do
+        # identify the stored bytes
+        version = stat.version.strip('"')
+        return f'"{version}-{stat.size:x}"'
+    # Derived from metadata only so conditional writes never have to hash the file. Writes
+    # replace the file by rename, so the inode also tells apart same-size rewrites that
+    # land within one mtime tick (coarse filesystem timestamps)
+    return f'"{stat.inode:x}-{stat.size:x}-{int(stat.modified * 1_000_000):x}"'
+
+
+def join_key(*parts: str) -> str:
+    # Empty parts (including the root key "") are skipped, so joining only empties gives the root
+    stripped = (p.replace("\\", "/").strip("/") for p in parts)
+    return "/".join(p for p in stripped if p)
+
+
+class StorageBackend(ABC):
+    """Blob storage used by FileService.
+
+    Keys are '/'-separated paths relative to the storage root; the empty key is
+    the root itself. Directories are real on local disk and implied by key
+    prefixes on object stores.
+    """
+
+    @abstractmethod
+    def stat(self, key: str) -> Optional[StorageStat]:
+        """Return metadata for `key`, or None when nothing exists there."""
+
+    @abstractmethod
+    def list_dir(self, key: str) -> List[StorageEntry]:
+        ...
+
+    @abstractmethod
+    def read_bytes(self, key: str) -> bytes:
+        ...
+
+    @abstractmethod
+    def read_range(self, key: str, start: int, end: int) -> bytes:
+        """Read bytes [start, end) of a file."""
+
+    @abstractmethod
+    def iter_bytes(self, key: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        ...
+
+    @abstractmethod
+    def write_bytes(self, key: str, data: bytes) -> None:
+        """Replace the file at `key`, creating parent directories as needed."""
+
+    def append_bytes(self, key: str, data: bytes) -> None:
+        """Append to the file at `key`, creating it if missing."""
+        try:
+            existing = self.read_bytes(key)
+        except FileNotFoundError:
+            existing = b""
+        self.write_bytes(key, existing + data)
+
+    @abstractmethod
+    def makedirs(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Delete a file, or a directory with everything below it."""
+
+    @abstractmethod
+    def move(self, src: str, dst: str) -> None:
+        ...
+
+    @abstractmethod
+    def copy(self, src: str, dst: str) -> None:
+        ...
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Path of a local file holding the content of `key`, when one is cheaply available."""
+        return None
+
+    def encoded_local_path(self, key: str, encoding: str) -> Optional[str]:
+        """Path of a local file holding `key` already compressed with `encoding`, if the backend stores one."""
+        return None
+
+    def exists(self, key: str) -> bool:
+        return self.stat(key) is not None
+
+    def walk(self, key: str) -> Iterator[Tuple[str, List[StorageEntry], List[StorageEntry]]]:
+        entries = self.list_dir(key)
+        dirs = [e for e in entries if e.stat.is_dir]
+        files = [e for e in entries if e.stat.is_file]
+        yield key, dirs, files
+        for d in dirs:
+            yield from self.walk(d.key)
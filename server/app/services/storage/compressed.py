@@ -0,0 +1,191 @@
+import zlib
+import struct
+import threading
+from itertools import chain
+from collections import OrderedDict
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from app.services.storage.base import StorageBackend, StorageEntry, StorageStat
+
+# Gzip member header with FLG.FEXTRA carrying one "AU" subfield: the uncompressed
+# size as a 64-bit integer. Only files written by CompressedStorage have it, so
+# plain .gz uploads and files stored before compression was enabled are left alone.
+HEADER = struct.Struct("<4s4sBBH2sHQ")
+HEADER_SIZE = HEADER.size
+MARKER_ID = b"AU"
+
+
+def _header(size: int) -> bytes:
+    return HEADER.pack(b"\x1f\x8b\x08\x04", b"\x00" * 4, 0, 255, 12, MARKER_ID, 8, size)
+
+
+def _parse_header(data: bytes) -> Optional[int]:
+    """Return the logical size from a CompressedStorage header, or None for any other content."""
+    if len(data) < HEADER_SIZE:
+        return None
+    magic, _, _, _, xlen, subfield, length, size = HEADER.unpack_from(data)
+    if magic != b"\x1f\x8b\x08\x04" or xlen != 12 or subfield != MARKER_ID or length != 8:
+        return None
+    return size
+
+
+class CompressedStorage(StorageBackend):
+    """Stores text files gzip-compressed on top of another backend.
+
+    Only keys with one of `extensions` are compressed. Compressed files carry
+    a marker with their uncompressed size in the gzip header; anything without
+    it (files written before compression was enabled, uploaded .gz files) is
+    read as-is, so the setting can be switched on for an existing UPLOAD_DIR.
+    The marker is read once per file version and cached, so stat and list_dir
+    normally cost no extra reads.
+    """
+
+    def __init__(self, inner: StorageBackend, extensions: Iterable[str], level: int = 6, info_entries: int = 10000):
+        self.inner = inner
+        self.extensions = {e.lower().lstrip(".") for e in extensions}
+        self.level = level
+        self.info_entries = info_entries
+        # key -> (size, mtime, inode, version) of the stored file, logical size or None when not compressed
+        self._info: "OrderedDict[str, Tuple[Tuple, Optional[int]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _compressible(self, key: str) -> bool:
+        name = key.rsplit("/", 1)[-1]
+        return "." in name and name.rsplit(".", 1)[1].lower() in self.extensions
+
+    def _compressed_size(self, key: str, stat: Optional[StorageStat] = None) -> Optional[int]:
+        """Logical size of `key` if it is stored compressed, else None."""
+        if not self._compressible(key):
+            return None
+        stat = stat or self.inner.stat(key)
+        if stat is None or stat.is_dir or stat.size < HEADER_SIZE:
+            return None
+        signature = (stat.size, stat.modified, stat.inode, stat.version)
+        with self._lock:
+            cached = self._info.get(key)
+            if cached is not None and cached[0] == signature:
+                self._info.move_to_end(key)
+                return cached[1]
+        size = _parse_header(self.inner.read_range(key, 0, HEADER_SIZE))
+        with self._lock:
+            self._info[key] = (signature, size)
+            self._info.move_to_end(key)
+            while len(self._info) > self.info_entries:
+                self._info.popitem(last=False)
+        return size
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            self._info.pop(key, None)
+
+    def _logical(self, stat: StorageStat) -> StorageStat:
+        if stat.is_dir:
+            return stat
+        size = self._compressed_size(stat.key, stat)
+        if size is None:
+            return stat
+        return StorageStat(
+            key=stat.key,
+            size=size,
+            modified=stat.modified,
+            created=stat.created,
+            is_dir=False,
+            inode=stat.inode,
+            version=stat.version
+        )
+
+    def stat(self, key: str) -> Optional[StorageStat]:
+        stat = self.inner.stat(key)
+        return self._logical(stat) if stat else None
+
+    def list_dir(self, key: str) -> List[StorageEntry]:
+        return [
+            StorageEntry(name=e.name, key=e.key, stat=self._logical(e.stat))
+            for e in self.inner.list_dir(key)
+        ]
+
+    def read_bytes(self, key: str) -> bytes:
+        data = self.inner.read_bytes(key)
+        if self._compressible(key) and _parse_header(data) is not None:
+            return zlib.decompress(data, 31)
+        return data
+
+    def read_range(self, key: str, start: int, end: int) -> bytes:
+        if self._compressed_size(key) is None:
+            return self.inner.read_range(key, start, end)
+        out = bytearray()
+        offset = 0
+        for chunk in self.iter_bytes(key):
+            if offset + len(chunk) > start:
+                out += chunk[max(0, start - offset):end - offset]
+            offset += len(chunk)
+            if offset >= end:
+                break
+        return bytes(out)
+
+    def iter_bytes(self, key: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        chunks = self.inner.iter_bytes(key, chunk_size)
+        if not self._compressible(key):
+            yield from chunks
+            return
+        # Collect enough of the start of the file to check for the header
+        head = b""
+        for chunk in chunks:
+            head += chunk
+            if len(head) >= HEADER_SIZE:
+                break
+        if _parse_header(head) is None:
+            if head:
+                yield head
+            yield from chunks
+            return
+        decompressor = zlib.decompressobj(31)
+        for chunk in chain([head], chunks):
+            data = decompressor.decompress(chunk)
+            if data:
+                yield data
+        tail = decompressor.flush()
+        if tail:
+            yield tail
+
+    def write_bytes(self, key: str, data: bytes) -> None:
+        if self._compressible(key):
+            obj = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+            trailer = struct.pack("<II", zlib.crc32(data), len(data) & 0xFFFFFFFF)
+            data = _header(len(data)) + obj.compress(data) + obj.flush() + trailer
+        self._forget(key)
+        self.inner.write_bytes(key, data)
+
+    def makedirs(self, key: str) -> None:
+        self.inner.makedirs(key)
+
+    def delete(self, key: str) -> None:
+        self._forget(key)
+        self.inner.delete(key)
+
+    def move(self, src: str, dst: str) -> None:
+        self._forget(src)
+        self._forget(dst)
+        if self._compressible(src) != self._compressible(dst) and self.inner.stat(src).is_file:
+            # Renamed across the text/binary boundary: re-encode for the new name
+            self.write_bytes(dst, self.read_bytes(src))
+            self.inner.delete(src)
+        else:
+            self.inner.move(src, dst)
+
+    def copy(self, src: str, dst: str) -> None:
+        self._forget(dst)
+        if self._compressible(src) != self._compressible(dst) and self.inner.stat(src).is_file:
+            self.write_bytes(dst, self.read_bytes(src))
+        else:
+            self.inner.copy(src, dst)
+
+    def local_path(self, key: str) -> Optional[str]:
+        if self._compressed_size(key) is not None:
+            return None
+        return self.inner.local_path(key)
+
+    def encoded_local_path(self, key: str, encoding: str) -> Optional[str]:
+        if encoding == "gzip" and self._compressed_size(key) is not None:
+            return self.inner.local_path(key)
+        return None
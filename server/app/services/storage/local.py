@@ -0,0 +1,147 @@
+import os
+import shutil
+import tempfile
+from stat import S_ISDIR
+from typing import Iterator, List, Optional
+
+from app.services.storage.base import StorageBackend, StorageEntry, StorageStat, join_key
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root: str, fsync: str = "data"):
+        # fsync: "none", "data" (file contents before rename) or "full" (also the directory entry)
+        if fsync not in ("none", "data", "full"):
+            raise ValueError(f"Invalid fsync policy: {fsync}")
+        self.root = os.path.abspath(root)
+        self.fsync = fsync
+        self._file_mode = 0o666 & ~_umask()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *[p for p in key.split("/") if p])
+
+    @staticmethod
+    def _to_stat(key: str, st: os.stat_result, is_dir: bool) -> StorageStat:
+        return StorageStat(
+            key=key,
+            size=st.st_size if not is_dir else 0,
+            modified=st.st_mtime,
+            created=st.st_ctime,
+            is_dir=is_dir,
+            inode=st.st_ino
+        )
+
+    def stat(self, key: str) -> Optional[StorageStat]:
+        try:
+            st = os.stat(self._path(key))
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return self._to_stat(key, st, S_ISDIR(st.st_mode))
+
+    def list_dir(self, key: str) -> List[StorageEntry]:
+        entries = []
+        with os.scandir(self._path(key)) as it:
+            for entry in it:
+                is_dir = entry.is_dir()
+                entry_key = join_key(key, entry.name)
+                entries.append(StorageEntry(
+                    name=entry.name,
+                    key=entry_key,
+                    stat=self._to_stat(entry_key, entry.stat(), is_dir)
+                ))
+        return entries
+
+    def read_bytes(self, key: str) -> bytes:
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    def read_range(self, key: str, start: int, end: int) -> bytes:
+        with open(self._path(key), "rb") as f:
+            f.seek(start)
+            return f.read(max(0, end - start))
+
+    def iter_bytes(self, key: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        with open(self._path(key), "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def write_bytes(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write next to the target and rename over it so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                if self.fsync != "none":
+                    f.flush()
+                    os.fsync(f.fileno())
+            if os.path.exists(path):
+                shutil.copymode(path, tmp_path)
+            else:
+                os.chmod(tmp_path, self._file_mode)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        if self.fsync == "full":
+            self._fsync_dir(directory)
+
+    def append_bytes(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "ab") as f:
+            f.write(data)
+            if self.fsync != "none":
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _fsync_dir(self, directory: str) -> None:
+        if os.name == "nt":
+            return
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def makedirs(self, key: str) -> None:
+        os.makedirs(self._path(key), exist_ok=True)
+
+    def delete(self, key: str) -> None:
+        path = self._path(key)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+    def move(self, src: str, dst: str) -> None:
+        dst_path = self._path(dst)
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+        shutil.move(self._path(src), dst_path)
+
+    def copy(self, src: str, dst: str) -> None:
+        src_path = self._path(src)
+        dst_path = self._path(dst)
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+        if os.path.isdir(src_path):
+            shutil.copytree(src_path, dst_path)
+        else:
+            shutil.copy2(src_path, dst_path)
+
+    def local_path(self, key: str) -> Optional[str]:
+        return self._path(key)
+
+
+
+def _umask() -> int:
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
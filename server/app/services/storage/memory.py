@@ -0,0 +1,130 @@
+import time
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.services.storage.base import StorageBackend, StorageEntry, StorageStat, join_key
+
+
+class MemoryStorage(StorageBackend):
+    """Process-local storage for tests and benchmarks."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # key -> (data, created, modified)
+        self._files: Dict[str, Tuple[bytes, float, float]] = {}
+        self._dirs: Dict[str, float] = {"": time.time()}
+
+    def _parents(self, key: str) -> List[str]:
+        parts = key.split("/")[:-1]
+        return ["/".join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+    def _ensure_parents(self, key: str) -> None:
+        now = time.time()
+        for parent in self._parents(key):
+            if parent in self._files:
+                raise NotADirectoryError(parent)
+            self._dirs.setdefault(parent, now)
+
+    def stat(self, key: str) -> Optional[StorageStat]:
+        key = join_key(key)
+        with self._lock:
+            if key in self._files:
+                data, created, modified = self._files[key]
+                return StorageStat(key=key, size=len(data), modified=modified, created=created, is_dir=False)
+            if key in self._dirs:
+                created = self._dirs[key]
+                return StorageStat(key=key, size=0, modified=created, created=created, is_dir=True)
+        return None
+
+    def list_dir(self, key: str) -> List[StorageEntry]:
+        key = join_key(key)
+        prefix = f"{key}/" if key else ""
+        with self._lock:
+            if key in self._files:
+                raise NotADirectoryError(key)
+            if key not in self._dirs:
+                raise FileNotFoundError(key)
+            children = [
+                k for k in [*self._dirs, *self._files]
+                if k and k.startswith(prefix) and "/" not in k[len(prefix):]
+            ]
+            return [StorageEntry(name=k[len(prefix):], key=k, stat=self.stat(k)) for k in children]
+
+    def read_bytes(self, key: str) -> bytes:
+        key = join_key(key)
+        with self._lock:
+            if key in self._dirs:
+                raise IsADirectoryError(key)
+            if key not in self._files:
+                raise FileNotFoundError(key)
+            return self._files[key][0]
+
+    def read_range(self, key: str, start: int, end: int) -> bytes:
+        return self.read_bytes(key)[start:end]
+
+    def iter_bytes(self, key: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        data = self.read_bytes(key)
+        for offset in range(0, len(data), chunk_size):
+            yield data[offset:offset + chunk_size]
+
+    def write_bytes(self, key: str, data: bytes) -> None:
+        key = join_key(key)
+        now = time.time()
+        with self._lock:
+            if key in self._dirs:
+                raise IsADirectoryError(key)
+            self._ensure_parents(key)
+            created = self._files[key][1] if key in self._files else now
+            self._files[key] = (bytes(data), created, now)
+
+    def makedirs(self, key: str) -> None:
+        key = join_key(key)
+        with self._lock:
+            if key in self._files:
+                raise FileExistsError(key)
+            self._ensure_parents(key)
+            self._dirs.setdefault(key, time.time())
+
+    def _subtree(self, key: str) -> Tuple[List[str], List[str]]:
+        prefix = f"{key}/" if key else ""
+        files = [k for k in self._files if k == key or k.startswith(prefix)]
+        dirs = [k for k in self._dirs if k and (k == key or k.startswith(prefix))]
+        return files, dirs
+
+    def delete(self, key: str) -> None:
+        key = join_key(key)
+        with self._lock:
+            if not self.exists(key):
+                raise FileNotFoundError(key)
+            files, dirs = self._subtree(key)
+            for k in files:
+                del self._files[k]
+            for k in dirs:
+                del self._dirs[k]
+
+    def _copy_tree(self, src: str, dst: str) -> None:
+        files, dirs = self._subtree(src)
+        self._ensure_parents(dst)
+        for k in dirs:
+            self._dirs[dst + k[len(src):]] = time.time()
+        for k in files:
+            self._files[dst + k[len(src):]] = self._files[k]
+
+    def move(self, src: str, dst: str) -> None:
+        src, dst = join_key(src), join_key(dst)
+        with self._lock:
+            if not self.exists(src):
+                raise FileNotFoundError(src)
+            self._copy_tree(src, dst)
+            files, dirs = self._subtree(src)
+            for k in files:
+                del self._files[k]
+            for k in dirs:
+                del self._dirs[k]
+
+    def copy(self, src: str, dst: str) -> None:
+        src, dst = join_key(src), join_key(dst)
+        with self._lock:
+            if not self.exists(src):
+                raise FileNotFoundError(src)
+            self._copy_tree(src, dst)
@@ -0,0 +1,424 @@
+import os
+import shutil
+import socket
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+from app.services.storage.base import StorageBackend, StorageEntry, StorageStat, join_key
+
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.config import Config
+    from botocore.exceptions import ClientError
+except ImportError:  # optional dependency, only needed for STORAGE_BACKEND=s3
+    boto3 = None
+
+
+class ReadThroughCache:
+    """Local disk copy of recently read objects, bounded by total bytes (LRU).
+
+    Each entry remembers the ETag of the object it was read from and the file
+    name includes it, so a copy is never mistaken for a newer version of the
+    object. Callers check the ETag against S3 before serving an entry.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        # One directory per worker process; the entry index lives in this process only. PIDs
+        # repeat across nodes (and containers) sharing the volume, so the name also carries the
+        # host and a random boot ID
+        self.host = socket.gethostname()
+        self.directory = os.path.join(directory, f"{self.host}-{os.getpid()}-{uuid.uuid4().hex[:12]}")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> (size, etag)
+        self._entries: "OrderedDict[str, Tuple[int, str]]" = OrderedDict()
+        self._size = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._remove_stale(directory)
+
+    def _remove_stale(self, parent: str) -> None:
+        """Delete directories left by exited workers on this host; other hosts clean up their own."""
+        if os.name != "posix":
+            return
+        for name in os.listdir(parent):
+            parts = name.rsplit("-", 2)
+            if len(parts) != 3 or parts[0] != self.host or not parts[1].isdigit():
+                continue
+            if os.path.join(parent, name) == self.directory or _process_alive(int(parts[1])):
+                continue
+            shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+
+    def path(self, key: str, etag: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(f"{key}\0{etag}".encode("utf-8")).hexdigest())
+
+    def get(self, key: str) -> Optional[Tuple[str, str]]:
+        """Return (path, etag) of the cached copy of `key`, if any."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return self.path(key, entry[1]), entry[1]
+
+    def put(self, key: str, etag: str, data: bytes) -> Optional[str]:
+        if len(data) > self.max_bytes:
+            return None
+        path = self.path(key, etag)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._pop(key, keep_etag=etag)
+            self._entries[key] = (len(data), etag)
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+        return path
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._pop(key)
+
+    def invalidate(self, keys: List[str]) -> None:
+        with self._lock:
+            for key in keys:
+                prefix = f"{key}/"
+                for cached in [k for k in self._entries if k == key or k.startswith(prefix)]:
+                    self._pop(cached)
+
+    def _pop(self, key: str, keep_etag: Optional[str] = None) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        size, etag = entry
+        self._size -= size
+        if etag != keep_etag:
+            try:
+                os.remove(self.path(key, etag))
+            except FileNotFoundError:
+                pass
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running under another user
+        pass
+    return True
+
+
+class S3Storage(StorageBackend):
+    """S3-compatible object store (AWS S3, MinIO, ...).
+
+    One pooled client is shared by all threads. Large objects are written with
+    parallel multipart uploads and read with parallel range requests. Reads go
+    through a local disk cache; a cached copy is only served after a HEAD
+    request confirms its ETag, so writes from other nodes are always seen.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        max_pool_connections: int = 32,
+        multipart_threshold: int = 8 * 1024 * 1024,
+        part_size: int = 8 * 1024 * 1024,
+        max_concurrency: int = 8,
+        cache_dir: Optional[str] = None,
+        cache_max_bytes: int = 1024 * 1024 * 1024
+    ):
+        if boto3 is None:
+            raise RuntimeError("S3 storage requires boto3: pip install boto3")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.multipart_threshold = multipart_threshold
+        self.part_size = part_size
+        self.client = boto3.session.Session().client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            config=Config(max_pool_connections=max_pool_connections, retries={"max_attempts": 5, "mode": "standard"})
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=part_size,
+            max_concurrency=max_concurrency
+        )
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="s3")
+        self.cache = ReadThroughCache(cache_dir, cache_max_bytes) if cache_dir else None
+
+    def _object_key(self, key: str) -> str:
+        return join_key(self.prefix, key)
+
+    def _dir_prefix(self, key: str) -> str:
+        object_key = self._object_key(key)
+        return f"{object_key}/" if object_key else ""
+
+    def _invalidate(self, *keys: str) -> None:
+        if self.cache:
+            self.cache.invalidate(list(keys))
+
+    def stat(self, key: str) -> Optional[StorageStat]:
+        key = join_key(key)
+        if key:
+            try:
+                head = self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+                modified = head["LastModified"].timestamp()
+                return StorageStat(
+                    key=key, size=head["ContentLength"], modified=modified, created=modified, is_dir=False,
+                    version=head["ETag"]
+                )
+            except ClientError as e:
+                if e.response["Error"]["Code"] not in ("404", "NoSuchKey", "NotFound"):
+                    raise
+        listing = self.client.list_objects_v2(Bucket=self.bucket, Prefix=self._dir_prefix(key), MaxKeys=1)
+        if key and not listing.get("KeyCount"):
+            return None
+        modified = listing["Contents"][0]["LastModified"].timestamp() if listing.get("Contents") else 0.0
+        return StorageStat(key=key, size=0, modified=modified, created=modified, is_dir=True)
+
+    def list_dir(self, key: str) -> List[StorageEntry]:
+        key = join_key(key)
+        prefix = self._dir_prefix(key)
+        entries = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix, Delimiter="/"):
+            for common in page.get("CommonPrefixes", []):
+                name = common["Prefix"][len(prefix):].strip("/")
+                entry_key = join_key(key, name)
+                entries.append(StorageEntry(
+                    name=name,
+                    key=entry_key,
+                    stat=StorageStat(key=entry_key, size=0, modified=0.0, created=0.0, is_dir=True)
+                ))
+            for obj in page.get("Contents", []):
+                name = obj["Key"][len(prefix):]
+                # Directory marker written by makedirs
+                if not name or name.endswith("/"):
+                    continue
+                entry_key = join_key(key, name)
+                modified = obj["LastModified"].timestamp()
+                entries.append(StorageEntry(
+                    name=name,
+                    key=entry_key,
+                    stat=StorageStat(
+                        key=entry_key, size=obj["Size"], modified=modified, created=modified, is_dir=False,
+                        version=obj["ETag"]
+                    )
+                ))
+        if not entries and key and self.stat(key) is None:
+            raise FileNotFoundError(key)
+        return entries
+
+    def _head(self, key: str) -> dict:
+        return self._translate_missing(key, lambda k: self.client.head_object(
+            Bucket=self.bucket, Key=self._object_key(k)
+        ))
+
+    def _cached(self, key: str) -> Tuple[Optional[str], Optional[dict]]:
+        """Return the path of a current cached copy of `key`, and the HEAD response used to check it."""
+        cached = self.cache.get(key) if self.cache else None
+        if cached is None:
+            return None, None
+        path, etag = cached
+        try:
+            head = self._head(key)
+        except FileNotFoundError:
+            self.cache.discard(key)
+            raise
+        if head["ETag"] == etag:
+            return path, head
+        self.cache.discard(key)
+        return None, head
+
+    def _fetch(self, key: str, head: Optional[dict] = None) -> Tuple[bytes, str]:
+        object_key = self._object_key(key)
+        head = head or self.client.head_object(Bucket=self.bucket, Key=object_key)
+        size = head["ContentLength"]
+        # Pin the version we saw so parts of a concurrently replaced object are never mixed
+        etag = head["ETag"]
+        if size <= self.multipart_threshold:
+            return self.client.get_object(Bucket=self.bucket, Key=object_key, IfMatch=etag)["Body"].read(), etag
+
+        def fetch_part(start: int) -> bytes:
+            end = min(start + self.part_size, size) - 1
+            return self.client.get_object(
+                Bucket=self.bucket, Key=object_key, Range=f"bytes={start}-{end}", IfMatch=etag
+            )["Body"].read()
+
+        return b"".join(self._executor.map(fetch_part, range(0, size, self.part_size))), etag
+
+    def read_bytes(self, key: str) -> bytes:
+        key = join_key(key)
+        path, head = self._cached(key)
+        if path:
+            try:
+                with open(path, "rb") as f:
+                    return f.read()
+            except FileNotFoundError:
+                pass
+        data, etag = self._translate_missing(key, lambda k: self._fetch(k, head))
+        if self.cache:
+            self.cache.put(key, etag, data)
+        return data
+
+    def read_range(self, key: str, start: int, end: int) -> bytes:
+        key = join_key(key)
+        if end <= start:
+            return b""
+        path, _ = self._cached(key)
+        if path:
+            try:
+                with open(path, "rb") as f:
+                    f.seek(start)
+                    return f.read(end - start)
+            except FileNotFoundError:
+                pass
+        return self._translate_missing(key, lambda k: self.client.get_object(
+            Bucket=self.bucket, Key=self._object_key(k), Range=f"bytes={start}-{end - 1}"
+        )["Body"].read())
+
+    def iter_bytes(self, key: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        key = join_key(key)
+        path, _ = self._cached(key)
+        if path:
+            try:
+                f = open(path, "rb")
+            except FileNotFoundError:
+                pass
+            else:
+                with f:
+                    while True:
+                        chunk = f.read(chunk_size)
+                        if not chunk:
+                            return
+                        yield chunk
+        body = self._translate_missing(key, lambda k: self.client.get_object(
+            Bucket=self.bucket, Key=self._object_key(k)
+        )["Body"])
+        yield from body.iter_chunks(chunk_size)
+
+    def _translate_missing(self, key: str, fn):
+        try:
+            return fn(key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                raise FileNotFoundError(key)
+            raise
+
+    def write_bytes(self, key: str, data: bytes) -> None:
+        key = join_key(key)
+        object_key = self._object_key(key)
+        if len(data) <= self.multipart_threshold:
+            self.client.put_object(Bucket=self.bucket, Key=object_key, Body=data)
+        else:
+            self._multipart_upload(object_key, data)
+        self._invalidate(key)
+
+    def _multipart_upload(self, object_key: str, data: bytes) -> None:
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=object_key)["UploadId"]
+        view = memoryview(data)
+
+        def upload_part(args):
+            number, start = args
+            part = self.client.upload_part(
+                Bucket=self.bucket, Key=object_key, UploadId=upload_id,
+                PartNumber=number, Body=bytes(view[start:start + self.part_size])
+            )
+            return {"PartNumber": number, "ETag": part["ETag"]}
+
+        try:
+            parts = list(self._executor.map(upload_part, enumerate(range(0, len(data), self.part_size), start=1)))
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=object_key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+            )
+        except Exception:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=object_key, UploadId=upload_id)
+            raise
+
+    def makedirs(self, key: str) -> None:
+        key = join_key(key)
+        if key:
+            self.client.put_object(Bucket=self.bucket, Key=self._dir_prefix(key), Body=b"")
+
+    def _keys_below(self, key: str) -> List[str]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        return [
+            obj["Key"]
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=self._dir_prefix(key))
+            for obj in page.get("Contents", [])
+        ]
+
+    def delete(self, key: str) -> None:
+        key = join_key(key)
+        stat = self.stat(key)
+        if stat is None:
+            raise FileNotFoundError(key)
+        object_keys = self._keys_below(key) if stat.is_dir else [self._object_key(key)]
+        for start in range(0, len(object_keys), 1000):
+            self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": k} for k in object_keys[start:start + 1000]], "Quiet": True}
+            )
+        self._invalidate(key)
+
+    def _copy_objects(self, src: str, dst: str) -> List[str]:
+        stat = self.stat(src)
+        if stat is None:
+            raise FileNotFoundError(src)
+        if stat.is_dir:
+            src_prefix = self._dir_prefix(src)
+            pairs = [(k, self._dir_prefix(dst) + k[len(src_prefix):]) for k in self._keys_below(src)]
+        else:
+            pairs = [(self._object_key(src), self._object_key(dst))]
+
+        def copy_one(pair):
+            source, target = pair
+            # Managed copy switches to multipart copy for objects above the threshold
+            self.client.copy({"Bucket": self.bucket, "Key": source}, self.bucket, target, Config=self.transfer_config)
+
+        list(self._executor.map(copy_one, pairs))
+        self._invalidate(dst)
+        return [source for source, _ in pairs]
+
+    def move(self, src: str, dst: str) -> None:
+        src, dst = join_key(src), join_key(dst)
+        sources = self._copy_objects(src, dst)
+        for start in range(0, len(sources), 1000):
+            self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": k} for k in sources[start:start + 1000]], "Quiet": True}
+            )
+        self._invalidate(src)
+
+    def copy(self, src: str, dst: str) -> None:
+        self._copy_objects(join_key(src), join_key(dst))
+
+    def local_path(self, key: str) -> Optional[str]:
+        if not self.cache:
+            return None
+        key = join_key(key)
+        try:
+            path, _ = self._cached(key)
+            if path is None:
+                self.read_bytes(key)
+                cached = self.cache.get(key)
+                path = cached[0] if cached else None
+        except FileNotFoundError:
+            return None
+        return path
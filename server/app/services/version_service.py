@@ -0,0 +1,426 @@
+import os
+import time
+import zlib
+import sqlite3
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.core.blocking import ThreadLocalConnection
+from app.core.config import get_settings
+
+settings = get_settings()
+
+DIGEST_SIZE = 32
+
+
+@dataclass
+class VersionRecord:
+    id: int
+    chat_id: str
+    path: str
+    created: float
+    size: int
+    # SHA-256 of the chunk manifest: equal for equal content, but not the SHA-256 of the content
+    manifest_hash: str
+    etag: Optional[str]
+    source: str
+
+
+def iter_chunks(data: bytes, target: int, minimum: int, maximum: int) -> Iterator[bytes]:
+    """Content-defined chunking on line boundaries.
+
+    A cut is made after a line whose CRC falls under a threshold proportional
+    to the line length, so on average one cut happens every `target` bytes and
+    an edit only changes the chunks around it instead of shifting every later
+    boundary. Long runs without newlines (binary data) are cut at `maximum`.
+    """
+    start = 0
+    position = 0
+    length = len(data)
+    while position < length:
+        newline = data.find(b"\n", position)
+        line_end = length if newline == -1 else newline + 1
+        if line_end - start > maximum:
+            cut = start + maximum
+            yield data[start:cut]
+            start = position = cut
+            continue
+        line = data[position:line_end]
+        position = line_end
+        size = position - start
+        if size >= minimum and (zlib.crc32(line) & 0xFFFF) * target < len(line) * 0x10000:
+            yield data[start:position]
+            start = position
+    if start < length:
+        yield data[start:]
+
+
+class VersionService:
+    """Per-file version history backed by a deduplicated, compressed chunk store.
+
+    Every version is a list of chunk digests; chunks are shared between all
+    versions and files, so an edit costs roughly the changed chunks plus
+    DIGEST_SIZE bytes per chunk of the file.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.db_path = os.path.join(directory, "versions.db")
+        self._connect = ThreadLocalConnection(self.db_path)
+        conn = self._connect()
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                hash BLOB PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL,
+                stored_size INTEGER NOT NULL, refs INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS versions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id TEXT NOT NULL, path TEXT NOT NULL,
+                created REAL NOT NULL, size INTEGER NOT NULL, manifest_hash TEXT NOT NULL,
+                etag TEXT, source TEXT NOT NULL, chunks BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS versions_by_path ON versions (chat_id, path, id);
+            CREATE TABLE IF NOT EXISTS snapshots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id TEXT NOT NULL,
+                name TEXT, created REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS snapshot_files (
+                snapshot_id INTEGER NOT NULL, path TEXT NOT NULL, version_id INTEGER NOT NULL,
+                PRIMARY KEY (snapshot_id, path)
+            );
+            CREATE INDEX IF NOT EXISTS snapshot_files_by_version ON snapshot_files (version_id);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            """
+        )
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(versions)")]
+        if "content_hash" in columns:
+            # Stores written before the column was renamed to what it holds
+            conn.execute("ALTER TABLE versions RENAME COLUMN content_hash TO manifest_hash")
+        # Running total for retention, kept in step with every chunk and version
+        # insert or delete; computed once for stores created before it existed
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'stored_bytes'").fetchone() is None:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR IGNORE INTO meta (key, value) SELECT 'stored_bytes', "
+                    "(SELECT COALESCE(SUM(stored_size), 0) FROM chunks) + "
+                    "(SELECT COALESCE(SUM(LENGTH(chunks)), 0) FROM versions)"
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _row(row) -> VersionRecord:
+        return VersionRecord(*row)
+
+    _COLUMNS = "id, chat_id, path, created, size, manifest_hash, etag, source"
+
+    def has_versions(self, chat_id: str, path: str) -> bool:
+        row = self._connect().execute(
+            "SELECT 1 FROM versions WHERE chat_id = ? AND path = ? LIMIT 1", (chat_id, path)
+        ).fetchone()
+        return row is not None
+
+    def latest(self, chat_id: str, path: str) -> Optional[VersionRecord]:
+        row = self._connect().execute(
+            f"SELECT {self._COLUMNS} FROM versions WHERE chat_id = ? AND path = ? ORDER BY id DESC LIMIT 1",
+            (chat_id, path)
+        ).fetchone()
+        return self._row(row) if row else None
+
+    def get(self, chat_id: str, version_id: int) -> Optional[VersionRecord]:
+        row = self._connect().execute(
+            f"SELECT {self._COLUMNS} FROM versions WHERE id = ? AND chat_id = ?", (version_id, chat_id)
+        ).fetchone()
+        return self._row(row) if row else None
+
+    def list_versions(self, chat_id: str, path: str) -> List[VersionRecord]:
+        rows = self._connect().execute(
+            f"SELECT {self._COLUMNS} FROM versions WHERE chat_id = ? AND path = ? ORDER BY id DESC",
+            (chat_id, path)
+        ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def record(
+        self,
+        chat_id: str,
+        path: str,
+        data: bytes,
+        etag: Optional[str] = None,
+        source: str = "write"
+    ) -> VersionRecord:
+        return self._store(chat_id, path, [], data, len(data), etag, source, self.latest(chat_id, path))
+
+    def record_append(
+        self,
+        chat_id: str,
+        path: str,
+        appended: bytes,
+        base_etag: str,
+        etag: Optional[str] = None,
+        source: str = "write"
+    ) -> Optional[VersionRecord]:
+        """Record the latest version with `appended` added to its end, without reading the whole file.
+
+        Chunk boundaries before the last chunk only depend on the content
+        before them, so the new version reuses those digests and only the last
+        chunk plus the appended bytes are chunked again. Returns None when the
+        latest version is not the file `base_etag` describes (it was changed
+        outside FileService); the caller then records the full content.
+        """
+        latest = self.latest(chat_id, path)
+        if latest is None or latest.etag != base_etag:
+            return None
+        conn = self._connect()
+        manifest = conn.execute("SELECT chunks FROM versions WHERE id = ?", (latest.id,)).fetchone()[0]
+        digests = _split_manifest(manifest)
+        tail = b""
+        if digests:
+            row = conn.execute("SELECT data FROM chunks WHERE hash = ?", (digests.pop(),)).fetchone()
+            if row is None:
+                return None
+            tail = zlib.decompress(row[0])
+        return self._store(chat_id, path, digests, tail + appended, latest.size + len(appended), etag, source, latest)
+
+    def _store(
+        self,
+        chat_id: str,
+        path: str,
+        prefix: List[bytes],
+        data: bytes,
+        size: int,
+        etag: Optional[str],
+        source: str,
+        latest: Optional[VersionRecord]
+    ) -> VersionRecord:
+        # `prefix` holds digests of unchanged leading chunks; `data` is the rest of the file
+        chunks: Dict[bytes, bytes] = {}
+        digests = list(prefix)
+        for chunk in iter_chunks(data, settings.VERSION_CHUNK_SIZE, settings.VERSION_CHUNK_SIZE // 4, settings.VERSION_CHUNK_SIZE * 4):
+            digest = hashlib.sha256(chunk).digest()
+            digests.append(digest)
+            chunks[digest] = chunk
+        manifest = b"".join(digests)
+        # Chunking is deterministic, so the manifest identifies the content without hashing all of it
+        manifest_hash = hashlib.sha256(manifest).hexdigest()
+        if latest and latest.manifest_hash == manifest_hash:
+            if etag and etag != latest.etag:
+                self._connect().execute("UPDATE versions SET etag = ? WHERE id = ?", (etag, latest.id))
+                latest.etag = etag
+            return latest
+
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            added = len(manifest)
+            for digest in set(digests):
+                updated = conn.execute("UPDATE chunks SET refs = refs + 1 WHERE hash = ?", (digest,)).rowcount
+                if not updated:
+                    stored = zlib.compress(chunks[digest], 6)
+                    conn.execute(
+                        "INSERT INTO chunks (hash, data, size, stored_size, refs) VALUES (?, ?, ?, ?, 1)",
+                        (digest, stored, len(chunks[digest]), len(stored))
+                    )
+                    added += len(stored)
+            cursor = conn.execute(
+                "INSERT INTO versions (chat_id, path, created, size, manifest_hash, etag, source, chunks) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (chat_id, path, now, size, manifest_hash, etag, source, manifest)
+            )
+            version_id = cursor.lastrowid
+            _add_stored_bytes(conn, added)
+            self._apply_retention(conn, chat_id, path)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return VersionRecord(version_id, chat_id, path, now, size, manifest_hash, etag, source)
+
+    def content(self, chat_id: str, version_id: int) -> Optional[bytes]:
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT chunks FROM versions WHERE id = ? AND chat_id = ?", (version_id, chat_id)
+        ).fetchone()
+        if row is None:
+            return None
+        digests = _split_manifest(row[0])
+        stored = {}
+        unique = list(set(digests))
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            for digest, data in conn.execute(f"SELECT hash, data FROM chunks WHERE hash IN ({placeholders})", batch):
+                stored[bytes(digest)] = zlib.decompress(data)
+        return b"".join(stored[d] for d in digests)
+
+    def rename(self, chat_id: str, old_path: str, new_path: str) -> None:
+        """History follows moved files; moving a directory moves the history of everything below it.
+
+        A file moved onto a path that already has a history keeps its own
+        history under the old path, so the two are never interleaved; the
+        caller records the moved content as a new version of the destination.
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            paths = [row[0] for row in conn.execute(
+                "SELECT DISTINCT path FROM versions WHERE chat_id = ? AND (path = ? OR path LIKE ? ESCAPE '\\')",
+                (chat_id, old_path, _like_prefix(old_path))
+            )]
+            for path in paths:
+                target = new_path + path[len(old_path):]
+                taken = conn.execute(
+                    "SELECT 1 FROM versions WHERE chat_id = ? AND path = ? LIMIT 1", (chat_id, target)
+                ).fetchone()
+                if not taken:
+                    conn.execute("UPDATE versions SET path = ? WHERE chat_id = ? AND path = ?", (target, chat_id, path))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def purge_chat(self, chat_id: str) -> None:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "DELETE FROM snapshot_files WHERE snapshot_id IN (SELECT id FROM snapshots WHERE chat_id = ?)",
+                (chat_id,)
+            )
+            conn.execute("DELETE FROM snapshots WHERE chat_id = ?", (chat_id,))
+            ids = [row[0] for row in conn.execute("SELECT id FROM versions WHERE chat_id = ?", (chat_id,))]
+            self._delete_versions(conn, ids)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def create_snapshot(self, chat_id: str, name: Optional[str], files: List[Tuple[str, int]]) -> Tuple[int, float]:
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            snapshot_id = conn.execute(
+                "INSERT INTO snapshots (chat_id, name, created) VALUES (?, ?, ?)", (chat_id, name, now)
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO snapshot_files (snapshot_id, path, version_id) VALUES (?, ?, ?)",
+                [(snapshot_id, path, version_id) for path, version_id in files]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return snapshot_id, now
+
+    def list_snapshots(self, chat_id: str) -> List[Tuple[int, Optional[str], float, int]]:
+        return self._connect().execute(
+            "SELECT s.id, s.name, s.created, COUNT(f.path) FROM snapshots s "
+            "LEFT JOIN snapshot_files f ON f.snapshot_id = s.id "
+            "WHERE s.chat_id = ? GROUP BY s.id ORDER BY s.id DESC",
+            (chat_id,)
+        ).fetchall()
+
+    def snapshot_files(self, chat_id: str, snapshot_id: int) -> Optional[List[Tuple[str, int]]]:
+        conn = self._connect()
+        if conn.execute("SELECT 1 FROM snapshots WHERE id = ? AND chat_id = ?", (snapshot_id, chat_id)).fetchone() is None:
+            return None
+        return conn.execute(
+            "SELECT path, version_id FROM snapshot_files WHERE snapshot_id = ? ORDER BY path", (snapshot_id,)
+        ).fetchall()
+
+    def delete_snapshot(self, chat_id: str, snapshot_id: int) -> bool:
+        # Versions only kept alive by this snapshot are pruned by the next retention pass
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            deleted = conn.execute(
+                "DELETE FROM snapshots WHERE id = ? AND chat_id = ?", (snapshot_id, chat_id)
+            ).rowcount
+            conn.execute("DELETE FROM snapshot_files WHERE snapshot_id = ?", (snapshot_id,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return bool(deleted)
+
+    def stored_bytes(self) -> int:
+        return _stored_bytes(self._connect())
+
+    def _apply_retention(self, conn: sqlite3.Connection, chat_id: str, path: str) -> None:
+        # Never prune the newest version of a file or anything a snapshot still points at
+        protected = "id NOT IN (SELECT version_id FROM snapshot_files)"
+        rows = conn.execute(
+            f"SELECT id, created FROM versions WHERE chat_id = ? AND path = ? AND {protected} ORDER BY id DESC",
+            (chat_id, path)
+        ).fetchall()
+        latest_id = conn.execute(
+            "SELECT MAX(id) FROM versions WHERE chat_id = ? AND path = ?", (chat_id, path)
+        ).fetchone()[0]
+        cutoff = time.time() - settings.VERSION_MAX_AGE_DAYS * 86400
+        doomed = [
+            version_id for index, (version_id, created) in enumerate(rows)
+            if version_id != latest_id and (index >= settings.VERSION_MAX_COUNT or created < cutoff)
+        ]
+        self._delete_versions(conn, doomed)
+
+        if settings.VERSION_MAX_BYTES <= 0:
+            return
+        total = _stored_bytes(conn)
+        if total <= settings.VERSION_MAX_BYTES:
+            return
+        # Over the global budget: drop the oldest prunable versions store-wide
+        candidates = conn.execute(
+            f"SELECT id FROM versions v WHERE {protected} AND id != "
+            "(SELECT MAX(id) FROM versions w WHERE w.chat_id = v.chat_id AND w.path = v.path) ORDER BY id"
+        ).fetchall()
+        for (version_id,) in candidates:
+            total -= self._delete_versions(conn, [version_id])
+            if total <= settings.VERSION_MAX_BYTES:
+                break
+
+    def _delete_versions(self, conn: sqlite3.Connection, version_ids: List[int]) -> int:
+        freed = 0
+        for version_id in version_ids:
+            row = conn.execute("SELECT chunks FROM versions WHERE id = ?", (version_id,)).fetchone()
+            if row is None:
+                continue
+            manifest = row[0]
+            freed += len(manifest)
+            for digest in set(_split_manifest(manifest)):
+                conn.execute("UPDATE chunks SET refs = refs - 1 WHERE hash = ?", (digest,))
+                gone = conn.execute(
+                    "SELECT stored_size FROM chunks WHERE hash = ? AND refs <= 0", (digest,)
+                ).fetchone()
+                if gone:
+                    freed += gone[0]
+                    conn.execute("DELETE FROM chunks WHERE hash = ?", (digest,))
+            conn.execute("DELETE FROM versions WHERE id = ?", (version_id,))
+        if freed:
+            _add_stored_bytes(conn, -freed)
+        return freed
+
+
+def _split_manifest(manifest: bytes) -> List[bytes]:
+    return [bytes(manifest[i:i + DIGEST_SIZE]) for i in range(0, len(manifest), DIGEST_SIZE)]
+
+
+def _stored_bytes(conn: sqlite3.Connection) -> int:
+    # Compressed chunks plus every version's manifest (DIGEST_SIZE bytes per chunk)
+    return conn.execute("SELECT value FROM meta WHERE key = 'stored_bytes'").fetchone()[0]
+
+
+def _add_stored_bytes(conn: sqlite3.Connection, delta: int) -> None:
+    conn.execute("UPDATE meta SET value = value + ? WHERE key = 'stored_bytes'", (delta,))
+
+
+def _like_prefix(path: str) -> str:
+    escaped = path.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}/%"
+
+
+version_service = VersionService(settings.VERSION_STORE_DIR)
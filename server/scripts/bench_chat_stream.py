@@ -0,0 +1,184 @@
+"""Benchmark the streaming chat proxy against direct streaming from a stand-in Langflow.
+
+    python scripts/bench_chat_stream.py --clients 20 --requests 5 --tokens 300 --token-delay 0.002
+
+Starts scripts/mock_langflow.py and the API server on local ports, then has
+the same set of clients stream replies directly from the mock (one new
+connection per request, one event per token, as the UI does) and through
+/api/langflow/chat/stream. It also checks that a stream interrupted mid-reply
+resumes from Last-Event-ID without losing or repeating text.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import uvicorn
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def stream_direct(mock_url: str, flow_id: str, session_id: str) -> dict:
+    started = time.perf_counter()
+    first = None
+    events = 0
+    size = 0
+    text = ""
+    # A fresh client per request, like a browser tab opening its own stream
+    async with httpx.AsyncClient(base_url=mock_url, timeout=60) as client:
+        body = {"input_request": {"input_value": "hi", "session_id": session_id}}
+        async with client.stream("POST", f"/api/v1/run/{flow_id}?stream=true", json=body) as response:
+            async for line in response.aiter_lines():
+                size += len(line) + 1
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                events += 1
+                if event.get("event") == "token":
+                    if first is None:
+                        first = time.perf_counter() - started
+                    text += event["data"]["chunk"]
+    return {"ttfb": first, "total": time.perf_counter() - started, "events": events, "bytes": size, "text": text}
+
+
+async def read_sse(response: httpx.Response):
+    """Yield (id, event, data) from an SSE response."""
+    frame = {}
+    async for line in response.aiter_lines():
+        if not line:
+            if "event" in frame:
+                yield int(frame["id"]), frame["event"], json.loads(frame["data"])
+            frame = {}
+            continue
+        if line.startswith(":"):
+            continue
+        key, _, value = line.partition(": ")
+        frame[key] = value
+
+
+async def stream_proxy(client: httpx.AsyncClient, flow_id: str, session_id: str) -> dict:
+    started = time.perf_counter()
+    first = None
+    events = 0
+    size = 0
+    text = ""
+    body = {"flow_id": flow_id, "input_value": "hi", "session_id": session_id}
+    async with client.stream("POST", "/api/langflow/chat/stream", json=body) as response:
+        response.raise_for_status()
+        async for _, event, data in read_sse(response):
+            events += 1
+            if event == "delta":
+                if first is None:
+                    first = time.perf_counter() - started
+                text += data["content"]
+        size = response.num_bytes_downloaded
+    return {"ttfb": first, "total": time.perf_counter() - started, "events": events, "bytes": size, "text": text}
+
+
+async def check_resume(client: httpx.AsyncClient, flow_id: str, expected: str) -> bool:
+    text = ""
+    last_id = None
+    stream_id = None
+    async with client.stream("POST", "/api/langflow/chat/stream", json={"flow_id": flow_id, "input_value": "hi"}) as response:
+        stream_id = response.headers["x-stream-id"]
+        async for frame_id, event, data in read_sse(response):
+            last_id = frame_id
+            if event == "delta":
+                text += data["content"]
+                break
+    # Reconnect after dropping the first connection mid-reply
+    headers = {"Last-Event-ID": str(last_id)}
+    async with client.stream("GET", f"/api/langflow/chat/streams/{stream_id}", headers=headers) as response:
+        async for _, event, data in read_sse(response):
+            if event == "delta":
+                text += data["content"]
+    return text == expected
+
+
+async def run_scenario(name: str, clients: int, requests: int, call) -> list:
+    async def one_client(c: int):
+        return [await call(f"bench-{name}-{c}-{r}") for r in range(requests)]
+
+    started = time.perf_counter()
+    results = [r for batch in await asyncio.gather(*[one_client(c) for c in range(clients)]) for r in batch]
+    wall = time.perf_counter() - started
+    ttfb = [r["ttfb"] for r in results if r["ttfb"] is not None]
+    totals = [r["total"] for r in results]
+    print(
+        f"{name:<8} streams={len(results):<5} wall={wall:7.2f}s "
+        f"ttfb p50={statistics.median(ttfb) * 1000:7.1f}ms "
+        f"total p50={statistics.median(totals) * 1000:7.1f}ms "
+        f"p95={sorted(totals)[int(len(totals) * 0.95) - 1] * 1000:7.1f}ms "
+        f"events/stream={statistics.mean(r['events'] for r in results):6.1f} "
+        f"bytes/stream={statistics.mean(r['bytes'] for r in results):8.0f}"
+    )
+    return results
+
+
+async def main(args) -> None:
+    from scripts.mock_langflow import MockStore, create_app, reply_tokens
+    from app.api.v1.router import api_router
+    from fastapi import FastAPI
+
+    mock_port = int(os.environ["BENCH_MOCK_PORT"])
+    serve(create_app(MockStore(), tokens=args.tokens, token_delay=args.token_delay), mock_port)
+    mock_url = f"http://127.0.0.1:{mock_port}"
+
+    proxy = FastAPI()
+    proxy.include_router(api_router, prefix="/api")
+    proxy_port = free_port()
+    serve(proxy, proxy_port)
+    expected = "".join(reply_tokens(args.tokens))
+
+    print(f"{args.clients} clients x {args.requests} streams, {args.tokens} tokens, {args.token_delay * 1000:.1f}ms/token")
+    direct = await run_scenario(
+        "direct", args.clients, args.requests, lambda sid: stream_direct(mock_url, "bench-flow", sid)
+    )
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{proxy_port}", timeout=60, limits=limits) as client:
+        proxied = await run_scenario(
+            "proxy", args.clients, args.requests, lambda sid: stream_proxy(client, "bench-flow", sid)
+        )
+        resumed = await check_resume(client, "bench-flow", expected)
+
+    complete = all(r["text"] == expected for r in direct + proxied)
+    print(f"replies complete: {complete}  resume after disconnect: {'ok' if resumed else 'FAILED'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=5, help="Sequential streams per client")
+    parser.add_argument("--tokens", type=int, default=300)
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    parser.add_argument("--coalesce-ms", type=float, default=None)
+    cli_args = parser.parse_args()
+
+    # Settings are read at import time, so point the proxy at the mock first
+    os.environ["BENCH_MOCK_PORT"] = str(free_port())
+    os.environ["LANGFLOW_URL"] = f"http://127.0.0.1:{os.environ['BENCH_MOCK_PORT']}"
+    os.environ["LANGFLOW_INDEX_DB"] = os.path.join(tempfile.mkdtemp(prefix="bench-langflow-"), "index.db")
+    if cli_args.coalesce_ms is not None:
+        os.environ["LANGFLOW_STREAM_COALESCE_MS"] = str(cli_args.coalesce_ms)
+    asyncio.run(main(cli_args))
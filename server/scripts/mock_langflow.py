@@ -0,0 +1,171 @@
+"""Minimal stand-in for the Langflow API, for local development and tests.
+
+Run with `python scripts/mock_langflow.py --port 7860 --sessions 50 --messages 40 --tokens 300`
+and point LANGFLOW_URL at it. `create_app()` returns the app for in-process use,
+e.g. through `httpx.ASGITransport`.
+"""
+import argparse
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from fastapi import Body, FastAPI, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+
+class MockStore:
+    def __init__(self):
+        self.messages: List[Dict] = []
+        self.requests: List[str] = []
+
+    def add_message(
+        self,
+        session_id: str,
+        text: str,
+        sender: str = "User",
+        flow_id: str = "mock-flow",
+        timestamp: Optional[datetime] = None
+    ) -> Dict:
+        timestamp = timestamp or datetime.now(timezone.utc)
+        message = {
+            "id": str(uuid.uuid4()),
+            "flow_id": flow_id,
+            "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S.%f UTC"),
+            "sender": sender,
+            "sender_name": "User" if sender == "User" else "AI",
+            "session_id": session_id,
+            "text": text,
+            "files": [],
+            "content_blocks": [],
+            "properties": {},
+        }
+        self.messages.append(message)
+        return message
+
+    def seed(self, sessions: int, messages_per_session: int) -> None:
+        start = datetime.now(timezone.utc) - timedelta(days=30)
+        for s in range(sessions):
+            session_id = f"session-{s:05d}"
+            for m in range(messages_per_session):
+                sender = "User" if m % 2 == 0 else "Machine"
+                self.add_message(
+                    session_id,
+                    f"{sender} message {m} in {session_id}",
+                    sender=sender,
+                    timestamp=start + timedelta(minutes=s * messages_per_session + m)
+                )
+
+
+def reply_tokens(count: int) -> List[str]:
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit"]
+    return [("" if i == 0 else " ") + words[i % len(words)] for i in range(count)]
+
+
+def create_app(
+    store: Optional[MockStore] = None,
+    sessions_endpoint: bool = True,
+    tokens: int = 200,
+    token_delay: float = 0.0,
+    reply: Optional[List[str]] = None
+) -> FastAPI:
+    """`tokens` and `token_delay` shape the streamed replies of /run and /responses; `reply` replaces the generated tokens."""
+    store = store or MockStore()
+    app = FastAPI(title="Mock Langflow")
+    app.state.store = store
+
+    async def token_stream(frame):
+        for token in reply_tokens(tokens) if reply is None else reply:
+            if token_delay:
+                await asyncio.sleep(token_delay)
+            yield frame(token)
+
+    @app.post("/api/v1/run/{flow_id}")
+    async def run_flow(flow_id: str, stream: bool = False, body: Dict = Body(...)):
+        request = body.get("input_request", body)
+        session_id = request.get("session_id") or flow_id
+        store.requests.append(f"run:{session_id}")
+        user = store.add_message(session_id, request.get("input_value", ""), flow_id=flow_id)
+        text = "".join(reply_tokens(tokens) if reply is None else reply)
+        result = {"outputs": [{"outputs": [{"results": {"message": {"data": {"text": text, "content_blocks": []}}}}]}]}
+        if not stream:
+            store.add_message(session_id, text, sender="Machine", flow_id=flow_id)
+            return {"session_id": session_id, **result}
+
+        def line(event: str, data: Dict) -> str:
+            return json.dumps({"event": event, "data": data}) + "\n\n"
+
+        async def events():
+            yield line("add_message", user)
+            message_id = str(uuid.uuid4())
+            async for chunk in token_stream(lambda t: line("token", {"chunk": t, "id": message_id})):
+                yield chunk
+            yield line("add_message", store.add_message(session_id, text, sender="Machine", flow_id=flow_id))
+            yield line("end", {"result": result})
+
+        return StreamingResponse(events(), media_type="application/x-ndjson")
+
+    @app.post("/api/v1/responses")
+    async def responses(body: Dict = Body(...)):
+        store.requests.append(f"responses:{body.get('model')}")
+
+        async def events():
+            async for chunk in token_stream(lambda t: f"data: {json.dumps({'delta': {'content': t}})}\n\n"):
+                yield chunk
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/api/v1/monitor/messages")
+    async def get_messages(
+        session_id: Optional[str] = None,
+        flow_id: Optional[str] = None,
+        order_by: Optional[str] = "timestamp",
+        limit: Optional[int] = Query(None)
+    ):
+        store.requests.append(f"messages:{session_id or '*'}")
+        result = [
+            m for m in store.messages
+            if (session_id is None or m["session_id"] == session_id) and (flow_id is None or m["flow_id"] == flow_id)
+        ]
+        if order_by == "timestamp":
+            result.sort(key=lambda m: m["timestamp"])
+        return result[:limit] if limit else result
+
+    if sessions_endpoint:
+        @app.get("/api/v1/monitor/messages/sessions")
+        async def get_sessions():
+            store.requests.append("sessions")
+            return sorted({m["session_id"] for m in store.messages})
+
+    @app.delete("/api/v1/monitor/messages/session/{session_id}", status_code=204)
+    async def delete_session(session_id: str):
+        store.requests.append(f"delete:{session_id}")
+        before = len(store.messages)
+        store.messages = [m for m in store.messages if m["session_id"] != session_id]
+        if len(store.messages) == before:
+            raise HTTPException(status_code=404, detail="Session not found")
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a mock Langflow server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7860)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=10, help="Messages per session")
+    parser.add_argument("--tokens", type=int, default=200, help="Tokens per streamed reply")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="Seconds between streamed tokens")
+    args = parser.parse_args()
+
+    mock_store = MockStore()
+    mock_store.seed(args.sessions, args.messages)
+    uvicorn.run(
+        create_app(mock_store, tokens=args.tokens, token_delay=args.token_delay),
+        host=args.host,
+        port=args.port
+    )
@@ -0,0 +1,60 @@
+import os
+import sys
+import tempfile
+
+# Settings are read once at import time, so isolate all server state before importing the app
+_data_dir = tempfile.mkdtemp(prefix="agent-ui-tests-")
+os.environ["DATA_DIR"] = _data_dir
+os.environ["UPLOAD_DIR"] = os.path.join(_data_dir, "files")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio  # noqa: E402
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+from app.api.v1.router import api_router  # noqa: E402
+from app.core.config import get_settings  # noqa: E402
+
+
+@pytest.fixture
+def app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(api_router, prefix="/api")
+    return app
+
+
+@pytest.fixture
+def api(app):
+    """Run `scenario(client)` against the API and return its result.
+
+    `scenario` is an async function (or a lambda returning an awaitable) that
+    gets an httpx client bound to the app, e.g.
+    `api(lambda client: client.get("/api/files/list", params={"chat_id": "a"}))`.
+    """
+    def run(scenario):
+        async def main():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                return await scenario(client)
+
+        return asyncio.run(main())
+
+    return run
+
+
+@pytest.fixture
+def chat_files():
+    """Write `{relative path: bytes}` into a chat's upload directory; returns the chat ID."""
+    def write(chat_id, files):
+        chat_dir = os.path.join(get_settings().UPLOAD_DIR, chat_id)
+        os.makedirs(chat_dir, exist_ok=True)
+        for name, data in files.items():
+            path = os.path.join(chat_dir, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+        return chat_id
+
+    return write
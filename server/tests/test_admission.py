@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+from fastapi import Depends, FastAPI, Form
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from app.core import admission
+from app.core.admission import IO, AdmissionController, OperationLimits, admit
+
+
+class Body(BaseModel):
+    chat_id: str
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/read", dependencies=[Depends(admit(IO))])
+    async def read(chat_id: str):
+        return {"chat_id": chat_id}
+
+    @app.post("/json", dependencies=[Depends(admit(IO))])
+    async def json_body(body: Body):
+        return {"chat_id": body.chat_id}
+
+    @app.post("/form", dependencies=[Depends(admit(IO))])
+    async def form_body(chat_id: str = Form(...)):
+        return {"chat_id": chat_id}
+
+    return app
+
+
+@pytest.fixture
+def client(monkeypatch):
+    controller = AdmissionController()
+    controller.limits[IO] = OperationLimits(rate=0.5, burst=2, concurrency=4, global_concurrency=32)
+    monkeypatch.setattr(admission, "admission_controller", controller)
+    return TestClient(make_app())
+
+
+def assert_limited(response):
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_rate_limit_returns_429_with_retry_after(client):
+    for _ in range(2):
+        assert client.get("/read", params={"chat_id": "a"}).status_code == 200
+    assert_limited(client.get("/read", params={"chat_id": "a"}))
+    # Buckets are per chat
+    assert client.get("/read", params={"chat_id": "b"}).status_code == 200
+
+
+def test_chat_id_from_json_body(client):
+    for _ in range(2):
+        assert client.post("/json", json={"chat_id": "json-chat"}).status_code == 200
+    assert_limited(client.post("/json", json={"chat_id": "json-chat"}))
+    assert client.post("/json", json={"chat_id": "other"}).status_code == 200
+
+
+def test_chat_id_from_form_body(client):
+    for _ in range(2):
+        assert client.post("/form", data={"chat_id": "form-chat"}).status_code == 200
+    assert_limited(client.post("/form", data={"chat_id": "form-chat"}))
+    assert client.post("/form", data={"chat_id": "other"}).status_code == 200
+
+
+def test_default_limits_allow_opening_a_chat(api, chat_files):
+    # The UI reads every file of a chat at once when it is opened
+    names = [f"file-{i}.txt" for i in range(150)]
+    chat_files("fan-out", {name: name.encode() for name in names})
+
+    responses = api(lambda client: asyncio.gather(*[
+        client.get(f"/api/files/read/{name}", params={"chat_id": "fan-out"}) for name in names
+    ]))
+    assert [r.status_code for r in responses] == [200] * len(names)
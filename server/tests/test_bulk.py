@@ -0,0 +1,125 @@
+import json
+
+import pytest
+
+from app.core.config import get_settings
+
+
+@pytest.fixture
+def post(api):
+    return lambda url, body: api(lambda client: client.post(url, json=body))
+
+
+@pytest.fixture
+def chat(chat_files):
+    return chat_files("bulk", {
+        "a.txt": b"alpha",
+        "b.txt": b"bravo" * 10,
+        "docs/c.md": b"# charlie",
+    })
+
+
+def test_info_reports_errors_per_path(post, chat):
+    response = post("/api/files/bulk/info", {
+        "chat_id": chat,
+        "paths": ["a.txt", "missing.txt", "../../etc/passwd", "docs/c.md"],
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert body["count"] == 4
+    a, missing, outside, c = body["results"]
+    assert a["path"] == "a.txt" and a["info"]["size"] == 5 and a["error"] is None
+    assert missing["info"] is None and missing["error"]["status_code"] == 404
+    assert outside["info"] is None and outside["error"]["status_code"] == 403
+    assert c["info"]["size"] == 9
+
+
+def test_info_relative_to_base_path(post, chat):
+    body = post("/api/files/bulk/info", {"chat_id": chat, "path": "docs", "paths": ["c.md", "a.txt"]}).json()
+    assert body["results"][0]["info"]["filename"] == "c.md"
+    assert body["results"][1]["error"]["status_code"] == 404
+
+
+def test_too_many_paths(post, chat, monkeypatch):
+    monkeypatch.setattr(get_settings(), "BULK_MAX_PATHS", 2)
+    response = post("/api/files/bulk/info", {"chat_id": chat, "paths": ["a.txt", "b.txt", "docs/c.md"]})
+    assert response.status_code == 400
+
+
+def test_read_reports_errors_per_path(post, chat):
+    body = post("/api/files/bulk/read", {
+        "chat_id": chat,
+        "paths": ["a.txt", "missing.txt", "../outside.txt", "docs"],
+    }).json()
+    a, missing, outside, directory = body["results"]
+    assert a["file"]["content"] == "alpha" and not a["truncated"]
+    assert missing["error"]["status_code"] == 404
+    assert outside["error"]["status_code"] == 403
+    assert directory["error"]["status_code"] == 400
+    assert body["total_bytes"] == 5
+
+
+def test_read_total_cap_in_request_order(post, chat):
+    body = post("/api/files/bulk/read", {
+        "chat_id": chat,
+        "paths": ["a.txt", "b.txt", "docs/c.md"],
+        "max_total_bytes": 20,
+    }).json()
+    a, b, c = body["results"]
+    assert a["file"]["content"] == "alpha" and not a["truncated"]
+    # b.txt gets what is left of the budget, c.md nothing
+    assert b["truncated"] and b["file"]["content"] == "bravo" * 3 and b["file"]["size"] == 15
+    assert b["truncated_by"] == "total" and a["truncated_by"] is None
+    assert c["file"] is None and c["error"] == {"status_code": 413, "detail": "Total byte limit reached"}
+    assert body["total_bytes"] == 20
+
+
+def test_read_total_cap_clamped_to_setting(post, chat, monkeypatch):
+    monkeypatch.setattr(get_settings(), "BULK_READ_MAX_TOTAL_BYTES", 5)
+    body = post("/api/files/bulk/read", {
+        "chat_id": chat,
+        "paths": ["a.txt", "b.txt"],
+        "max_total_bytes": 1000,
+    }).json()
+    assert body["results"][0]["file"]["content"] == "alpha"
+    assert body["results"][1]["error"]["status_code"] == 413
+
+
+def test_read_per_file_cap(post, chat):
+    body = post("/api/files/bulk/read", {
+        "chat_id": chat,
+        "paths": ["a.txt", "b.txt"],
+        "max_file_bytes": 3,
+    }).json()
+    assert [r["file"]["content"] for r in body["results"]] == ["alp", "bra"]
+    assert all(r["truncated"] and r["truncated_by"] == "file" for r in body["results"])
+
+
+def test_read_per_file_cap_distinguished_from_total(post, chat):
+    body = post("/api/files/bulk/read", {"chat_id": chat, "paths": ["a.txt", "b.txt"], "max_file_bytes": 0}).json()
+    assert [r["error"] for r in body["results"]] == [{"status_code": 413, "detail": "Per-file byte limit reached"}] * 2
+
+    # b.txt alone exceeds the per-file cap while the total budget still has room
+    body = post("/api/files/bulk/read", {
+        "chat_id": chat,
+        "paths": ["b.txt", "a.txt", "docs/c.md"],
+        "max_file_bytes": 8,
+        "max_total_bytes": 15,
+    }).json()
+    b, a, c = body["results"]
+    assert b["file"]["content"] == "bravobra" and b["truncated_by"] == "file"
+    assert a["file"]["content"] == "alpha" and not a["truncated"] and a["truncated_by"] is None
+    assert c["file"]["content"] == "# " and c["truncated_by"] == "total"
+
+
+def test_stream_ndjson(post, chat):
+    paths = ["a.txt", "missing.txt", "b.txt", "docs/c.md"]
+    for url in ("/api/files/bulk/info", "/api/files/bulk/read"):
+        response = post(url, {"chat_id": chat, "paths": paths, "stream": True})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        # One line per path, in completion order
+        assert sorted(item["path"] for item in lines) == sorted(paths)
+        errors = {item["path"]: item["error"] for item in lines if item["error"]}
+        assert list(errors) == ["missing.txt"] and errors["missing.txt"]["status_code"] == 404
@@ -0,0 +1,218 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import get_settings
+from app.services.chat_stream_service import (
+    ChatStreamService,
+    StreamNormalizer,
+    StoredStreamRun,
+    StreamRun,
+    StreamStore,
+    chat_stream_service,
+    parse_stream_line
+)
+from app.services.langflow_service import LangflowClient
+from scripts.mock_langflow import MockStore, create_app, reply_tokens
+
+settings = get_settings()
+
+TOKENS = 200
+
+
+def parse_frames(payload: bytes):
+    """(id, event, data) for every SSE frame in `payload`."""
+    frames = []
+    for block in payload.decode("utf-8").split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if line and not line.startswith(":"))
+        if "event" in fields:
+            frames.append((int(fields["id"]), fields["event"], json.loads(fields["data"])))
+    return frames
+
+
+def delta_text(frames) -> str:
+    return "".join(data["content"] for _, event, data in frames if event == "delta")
+
+
+def langflow(**options):
+    return LangflowClient("http://langflow.test", transport=httpx.ASGITransport(app=create_app(MockStore(), **options)))
+
+
+@pytest.fixture
+def client():
+    return langflow(tokens=TOKENS)
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "streams.db")
+
+
+async def collect(run, offset=0):
+    frames = []
+    async for payload in run.frames_from(offset):
+        frames.extend(parse_frames(payload))
+    return frames
+
+
+def test_parse_stream_line():
+    assert parse_stream_line('_19{"event": "token", "data": {"chunk": "a"}}') == {"event": "token", "data": {"chunk": "a"}}
+    assert parse_stream_line('data: {"delta": {"content": "b"}}') == {"delta": {"content": "b"}}
+    for line in ("", "data: [DONE]", "event: message", "id: 3", ": keep-alive", "[1, 2]", "{not json"):
+        assert parse_stream_line(line) is None
+
+
+def test_normalizer_drops_repeated_chunks():
+    normalizer = StreamNormalizer()
+    events = [
+        {"event": "token", "data": {"chunk": "Hel"}},
+        {"event": "token", "data": {"chunk": "lo"}},
+        # Langflow repeats the last chunk in its message event
+        {"event": "message", "data": {"chunk": "lo"}},
+        {"event": "token", "data": {"chunk": "!"}},
+    ]
+    out = [item for event in events for item in normalizer.feed(event)]
+    assert out == [("delta", "Hel"), ("delta", "lo"), ("delta", "!")]
+    assert normalizer.end() == {"text": "Hello!", "full_text": False}
+
+
+def test_normalizer_keeps_repeated_openai_tokens():
+    tokens = ["a", "\n", "\n", "b", "  ", "  ", "c"]
+    for frame in (lambda t: {"delta": {"content": t}}, lambda t: {"choices": [{"delta": {"content": t}}]}):
+        normalizer = StreamNormalizer()
+        out = [item for token in tokens for item in normalizer.feed(frame(token))]
+        assert out == [("delta", token) for token in tokens]
+        assert normalizer.end()["text"] == "a\n\nb    c"
+
+
+def test_repeated_tokens_stream_through_responses_api(store_path):
+    tokens = ["a", "\n", "\n", "b", "  ", "  ", "c"]
+    service = ChatStreamService(langflow(reply=tokens), StreamStore(store_path))
+
+    async def scenario():
+        run = await service.start("flow", "hi", api="responses")
+        frames = await collect(run)
+        await run.writer
+        return frames
+
+    frames = asyncio.run(scenario())
+    assert delta_text(frames) == "".join(tokens)
+    assert frames[-1][1] == "end" and frames[-1][2]["text"] == "".join(tokens)
+
+
+def test_normalizer_end_text_and_errors():
+    normalizer = StreamNormalizer()
+    normalizer.feed({"event": "token", "data": {"chunk": "partial"}})
+    end = {"result": {"outputs": [{"outputs": [{"results": {"message": {"data": {"text": "final answer"}}}}]}]}}
+    assert normalizer.feed({"event": "end", "data": end}) == []
+    assert normalizer.end() == {"text": "final answer", "full_text": True}
+    assert normalizer.feed({"event": "error", "data": {"error": "boom"}}) == [("error", {"detail": "boom"})]
+    assert StreamNormalizer().feed({"choices": [{"delta": {"content": "x"}}]}) == [("delta", "x")]
+
+
+def test_deltas_are_coalesced(monkeypatch):
+    monkeypatch.setattr(settings, "LANGFLOW_STREAM_COALESCE_CHARS", 10)
+    monkeypatch.setattr(settings, "LANGFLOW_STREAM_COALESCE_MS", 20.0)
+
+    async def scenario():
+        run = StreamRun("run", "session")
+        for token in ("ab", "cd", "ef"):
+            run.add_delta(token)
+        assert run.frames == []
+        await asyncio.sleep(0.05)
+        # Flushed by the timer
+        assert parse_frames(b"".join(run.frames)) == [(0, "delta", {"content": "abcdef"})]
+
+        run.add_delta("0123456789")
+        assert len(run.frames) == 2
+        run.add_delta("x")
+        run.emit("end", {"text": "done"})
+        return parse_frames(b"".join(run.frames))
+
+    frames = asyncio.run(scenario())
+    assert [event for _, event, _ in frames] == ["delta", "delta", "delta", "end"]
+    assert delta_text(frames) == "abcdef0123456789x"
+
+
+def test_stream_through_mock_and_resume(client, store_path):
+    expected = "".join(reply_tokens(TOKENS))
+
+    async def scenario():
+        service = ChatStreamService(client, StreamStore(store_path))
+        run = await service.start("flow", "hi", session_id="stream-session")
+        frames = await collect(run)
+        # A client that saw the first delta reconnects and gets everything after it
+        first_delta = next(frame_id for frame_id, event, _ in frames if event == "delta")
+        resumed = await collect(await service.get(run.id), first_delta + 1)
+        await run.writer
+        return frames, first_delta, resumed
+
+    frames, first_delta, resumed = asyncio.run(scenario())
+    events = [event for _, event, _ in frames]
+    assert events[0] == "start" and events[-1] == "end"
+    assert [frame_id for frame_id, _, _ in frames] == list(range(len(frames)))
+    assert delta_text(frames) == expected
+    # Hundreds of upstream tokens arrive as a handful of frames
+    assert 1 <= events.count("delta") < TOKENS // 10
+    assert frames[-1][2]["text"] == expected
+    assert resumed == frames[first_delta + 1:]
+    assert delta_text(frames[:first_delta + 1]) + delta_text(resumed) == expected
+
+
+def test_resume_endpoint_uses_last_event_id(api, client, monkeypatch):
+    monkeypatch.setattr(chat_stream_service, "client", client)
+
+    async def scenario(http):
+        response = await http.post("/api/langflow/chat/stream", json={"flow_id": "flow", "input_value": "hi"})
+        stream_id = response.headers["x-stream-id"]
+        frames = parse_frames(response.content)
+        resumed = await http.get(f"/api/langflow/chat/streams/{stream_id}", headers={"Last-Event-ID": "1"})
+        missing = await http.get("/api/langflow/chat/streams/unknown")
+        return frames, parse_frames(resumed.content), missing.status_code
+
+    frames, resumed, missing = api(scenario)
+    assert resumed == frames[2:]
+    assert missing == 404
+
+
+def test_resume_and_cancel_on_another_worker(store_path, monkeypatch):
+    monkeypatch.setattr(settings, "LANGFLOW_STREAM_POLL_INTERVAL", 0.01)
+    # Two workers: separate services and connections, one shared store
+    owner = ChatStreamService(langflow(tokens=TOKENS, token_delay=0.002), StreamStore(store_path))
+    other = ChatStreamService(langflow(), StreamStore(store_path))
+
+    async def resume():
+        run = await owner.start("flow", "hi", session_id="resume-session")
+        followed = await other.get(run.id)
+        assert isinstance(followed, StoredStreamRun)
+        resumed = await collect(followed, 1)
+        return await collect(run), resumed
+
+    frames, resumed = asyncio.run(resume())
+    assert frames[-1][1] == "end"
+    assert resumed == frames[1:]
+
+    async def cancel():
+        run = await owner.start("flow", "hi", session_id="cancel-session")
+        await asyncio.sleep(0.05)
+        await other.cancel(run.id)
+        try:
+            await asyncio.wait_for(run.task, 5)
+        except asyncio.CancelledError:
+            pass
+        frames = await collect(await other.get(run.id))
+        return run, frames
+
+    run, frames = asyncio.run(cancel())
+    assert frames[-1][1:] == ("error", {"detail": "Stream cancelled"})
+    assert delta_text(frames) != "".join(reply_tokens(TOKENS))
+
+    async def missing():
+        with pytest.raises(HTTPException) as error:
+            await other.get("unknown")
+        return error.value.status_code
+
+    assert asyncio.run(missing()) == 404
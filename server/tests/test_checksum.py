@@ -0,0 +1,101 @@
+import hashlib
+import os
+
+import pytest
+
+from app.services.checksum_service import ChecksumService
+from app.services.storage import LocalStorage, MemoryStorage
+
+CHUNK = 1000
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+@pytest.fixture(params=["local", "memory"])
+def storage(request, tmp_path):
+    # Local files are memory-mapped; the memory backend has no local path and is streamed
+    if request.param == "local":
+        return LocalStorage(str(tmp_path / "files"))
+    return MemoryStorage()
+
+
+@pytest.mark.parametrize("size", [0, 1, CHUNK, CHUNK + 1, 3 * CHUNK, 4 * CHUNK + 500])
+def test_digests_match_hashlib(storage, size):
+    service = ChecksumService(workers=3, chunk_size=CHUNK, cache_entries=16)
+    data = os.urandom(size)
+    storage.write_bytes("chat/blob.bin", data)
+
+    result = service.checksum(storage, storage.stat("chat/blob.bin"))
+
+    assert result.digest == sha256(data)
+    assert result.size == size
+    if size <= CHUNK:
+        assert result.chunks == []
+    else:
+        assert result.chunks == [sha256(data[i:i + CHUNK]) for i in range(0, size, CHUNK)]
+
+
+def test_rewritten_file_is_rehashed(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    service = ChecksumService(workers=2, chunk_size=CHUNK, cache_entries=16)
+    storage.write_bytes("a.txt", b"first")
+    first = service.checksum(storage, storage.stat("a.txt"))
+    assert service.checksum(storage, storage.stat("a.txt")) is first
+
+    storage.write_bytes("a.txt", b"second version")
+    assert service.checksum(storage, storage.stat("a.txt")).digest == sha256(b"second version")
+
+
+@pytest.fixture
+def verify(api):
+    return lambda body: api(lambda client: client.post("/api/files/checksum/verify", json=body))
+
+
+@pytest.fixture
+def chat(chat_files):
+    return chat_files("verify", {"a.txt": b"alpha", "b.txt": b"bravo", "docs/c.md": b"charlie"})
+
+
+def test_verify_statuses(verify, chat):
+    response = verify({
+        "chat_id": chat,
+        "expected": {
+            "a.txt": sha256(b"alpha").upper(),
+            "b.txt": sha256(b"stale"),
+            "gone.txt": sha256(b"gone"),
+        },
+    })
+    assert response.status_code == 200
+    body = response.json()
+    statuses = {item["path"]: item["status"] for item in body["results"]}
+    assert statuses == {"a.txt": "match", "b.txt": "mismatch", "docs/c.md": "extra", "gone.txt": "missing"}
+    assert body["mismatched"] == 1 and body["missing"] == 1
+    assert body["algorithm"] == "sha256"
+    gone = next(item for item in body["results"] if item["path"] == "gone.txt")
+    assert gone["checksum"] is None and gone["size"] is None
+
+
+def test_verify_scoped_to_directory(verify, chat):
+    body = verify({
+        "chat_id": chat,
+        "path": "docs",
+        "expected": {"docs/c.md": sha256(b"charlie"), "a.txt": sha256(b"other"), "docs/d.md": "00"},
+    }).json()
+    # Expected paths outside `path` are not reported missing
+    statuses = {item["path"]: item["status"] for item in body["results"]}
+    assert statuses == {"docs/c.md": "match", "docs/d.md": "missing"}
+
+
+def test_verify_without_expected_computes(verify, chat):
+    body = verify({"chat_id": chat}).json()
+    assert {item["path"]: (item["status"], item["checksum"]) for item in body["results"]} == {
+        "a.txt": ("computed", sha256(b"alpha")),
+        "b.txt": ("computed", sha256(b"bravo")),
+        "docs/c.md": ("computed", sha256(b"charlie")),
+    }
+
+
+def test_verify_unknown_directory(verify, chat):
+    assert verify({"chat_id": chat, "path": "nope"}).status_code == 404
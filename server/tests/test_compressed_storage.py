@@ -0,0 +1,103 @@
+import gzip
+
+import pytest
+
+from app.services.storage import CompressedStorage, LocalStorage, MemoryStorage
+from app.services.storage.compressed import HEADER_SIZE, _header
+
+
+class CountingStorage(MemoryStorage):
+    def __init__(self):
+        super().__init__()
+        self.range_reads = 0
+
+    def read_range(self, key, start, end):
+        self.range_reads += 1
+        return super().read_range(key, start, end)
+
+
+@pytest.fixture
+def inner():
+    return CountingStorage()
+
+
+@pytest.fixture
+def storage(inner):
+    return CompressedStorage(inner, ["txt", "md"])
+
+
+def test_text_files_are_stored_compressed(storage, inner):
+    text = b"hello world\n" * 1000
+    storage.write_bytes("chat/a.txt", text)
+    stored = inner.read_bytes("chat/a.txt")
+    assert len(stored) < len(text)
+    # Still a valid gzip member, so it can be served as Content-Encoding: gzip
+    assert gzip.decompress(stored) == text
+    assert storage.read_bytes("chat/a.txt") == text
+    assert storage.stat("chat/a.txt").size == len(text)
+    assert storage.read_range("chat/a.txt", 5, 30) == text[5:30]
+    assert b"".join(storage.iter_bytes("chat/a.txt", chunk_size=7)) == text
+
+
+def test_other_files_are_stored_as_is(storage, inner):
+    storage.write_bytes("chat/image.png", b"\x89PNG" + b"\x00" * 100)
+    assert inner.read_bytes("chat/image.png") == b"\x89PNG" + b"\x00" * 100
+    assert storage.stat("chat/image.png").size == 104
+
+
+def test_uploaded_gzip_content_is_not_decompressed(storage, inner):
+    # A gzip stream under a compressible name, stored before compression was enabled
+    payload = gzip.compress(b"x" * 5000)
+    inner.write_bytes("chat/archive.txt", payload)
+    assert storage.stat("chat/archive.txt").size == len(payload)
+    assert storage.read_bytes("chat/archive.txt") == payload
+    assert b"".join(storage.iter_bytes("chat/archive.txt")) == payload
+    assert storage.read_range("chat/archive.txt", 0, 2) == b"\x1f\x8b"
+    assert storage.encoded_local_path("chat/archive.txt", "gzip") is None
+
+
+def test_sizes_above_4_gib(storage, inner):
+    # Only the header is read for stat, so a fake body is enough
+    size = 5 * 1024 ** 3 + 7
+    inner.write_bytes("chat/huge.txt", _header(size) + b"\x00" * 16)
+    assert storage.stat("chat/huge.txt").size == size
+
+
+def test_compression_state_is_cached(storage, inner):
+    for name in ("a.txt", "b.md", "c.txt"):
+        storage.write_bytes(f"chat/{name}", b"content " * 100)
+    storage.list_dir("chat")
+    storage.stat("chat/a.txt")
+    assert inner.range_reads == 3
+
+    # A rewrite changes the stored file, so its state is read again
+    storage.write_bytes("chat/a.txt", b"other " * 300)
+    assert storage.stat("chat/a.txt").size == 1800
+    assert [e.stat.size for e in sorted(storage.list_dir("chat"), key=lambda e: e.name)] == [1800, 800, 800]
+    assert inner.range_reads == 4
+
+
+def test_short_files_skip_the_header_read(storage, inner):
+    inner.write_bytes("chat/short.txt", b"\x1f\x8b" + b"\x00" * (HEADER_SIZE - 3))
+    assert storage.stat("chat/short.txt").size == HEADER_SIZE - 1
+    assert inner.range_reads == 0
+
+
+def test_rename_across_compressible_boundary(storage, inner):
+    storage.write_bytes("chat/a.txt", b"abc" * 100)
+    storage.move("chat/a.txt", "chat/a.bin")
+    assert inner.read_bytes("chat/a.bin") == b"abc" * 100
+    storage.copy("chat/a.bin", "chat/b.md")
+    assert storage.read_bytes("chat/b.md") == b"abc" * 100
+    assert inner.read_bytes("chat/b.md") != b"abc" * 100
+
+
+def test_local_paths(tmp_path):
+    storage = CompressedStorage(LocalStorage(str(tmp_path)), ["txt"])
+    storage.write_bytes("chat/a.txt", b"text " * 100)
+    storage.write_bytes("chat/b.bin", b"binary")
+    assert storage.local_path("chat/a.txt") is None
+    with open(storage.encoded_local_path("chat/a.txt", "gzip"), "rb") as f:
+        assert gzip.decompress(f.read()) == b"text " * 100
+    assert storage.encoded_local_path("chat/a.txt", "br") is None
+    assert storage.local_path("chat/b.bin") == str(tmp_path / "chat" / "b.bin")
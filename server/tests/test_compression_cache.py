@@ -0,0 +1,59 @@
+import gzip
+import os
+
+from app.services.compression_cache import CompressionCache
+from app.services.storage import LocalStorage, MemoryStorage
+
+
+def variant(cache, storage, key):
+    return cache.get_variant(storage, storage.stat(key), "gzip")
+
+
+def test_eviction_follows_last_use_not_atime(tmp_path):
+    storage = MemoryStorage()
+    for name in ("a", "b", "c"):
+        storage.write_bytes(f"chat/{name}.txt", os.urandom(4000))
+    size = os.path.getsize(variant(CompressionCache(str(tmp_path / "probe"), 1 << 20), storage, "chat/a.txt"))
+    # Room for two variants, trimmed to 90% when a third arrives
+    cache = CompressionCache(str(tmp_path / "cache"), int(size * 2.5))
+
+    a = variant(cache, storage, "chat/a.txt")
+    b = variant(cache, storage, "chat/b.txt")
+    # noatime mount: serving "a" again leaves its atime (and mtime) older than "b"
+    os.utime(a, (1, 1))
+    os.utime(b, (2, 2))
+    assert variant(cache, storage, "chat/a.txt") == a
+
+    c = variant(cache, storage, "chat/c.txt")
+    assert os.path.exists(a)
+    assert not os.path.exists(b)
+    assert os.path.exists(c)
+
+
+def test_rewritten_file_gets_a_new_variant(tmp_path):
+    storage = MemoryStorage()
+    storage.write_bytes("chat/a.txt", b"one " * 1000)
+    cache = CompressionCache(str(tmp_path), 1024 * 1024)
+    old = variant(cache, storage, "chat/a.txt")
+    storage.write_bytes("chat/a.txt", b"two " * 1000)
+    assert variant(cache, storage, "chat/a.txt") != old
+
+
+def test_same_size_rewrite_within_one_mtime_tick(tmp_path):
+    storage = LocalStorage(str(tmp_path / "files"))
+    cache = CompressionCache(str(tmp_path / "cache"), 1024 * 1024)
+    storage.write_bytes("chat/a.txt", b"one " * 1000)
+    first = storage.stat("chat/a.txt")
+    old = variant(cache, storage, "chat/a.txt")
+
+    # Same size, and a coarse filesystem timestamp gives the same mtime
+    storage.write_bytes("chat/a.txt", b"two " * 1000)
+    path = os.path.join(str(tmp_path / "files"), "chat", "a.txt")
+    os.utime(path, ns=(os.stat(path).st_atime_ns, int(first.modified * 1_000_000_000)))
+    second = storage.stat("chat/a.txt")
+    assert (second.size, second.modified) == (first.size, first.modified)
+
+    new = variant(cache, storage, "chat/a.txt")
+    assert new != old
+    with open(new, "rb") as f:
+        assert gzip.decompress(f.read()) == b"two " * 1000
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.coordination import MemoryCoordinationBackend, SQLiteCoordinationBackend
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        backend = MemoryCoordinationBackend()
+    else:
+        backend = SQLiteCoordinationBackend(str(tmp_path / "coordination"))
+    yield backend
+    backend.close()
+
+
+def test_lock_times_out_with_409(backend):
+    handle = backend.acquire_lock("chat/a.txt", 1)
+
+    async def write():
+        async with backend.lock("chat/a.txt", timeout=0.05):
+            pass
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(write())
+    assert error.value.status_code == 409
+    backend.release_lock(handle)
+
+
+def test_cancelled_acquisition_does_not_leak_lock(backend):
+    held = backend.acquire_lock("chat/a.txt", 1)
+    entered = threading.Event()
+
+    async def cancelled_writer():
+        async def write():
+            async with backend.lock("chat/a.txt", timeout=5):
+                entered.set()
+
+        task = asyncio.create_task(write())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The worker thread only gets the lock now, after the caller has gone away
+        backend.release_lock(held)
+        await asyncio.sleep(0.2)
+
+    asyncio.run(cancelled_writer())
+    assert not entered.is_set()
+    backend.release_lock(backend.acquire_lock("chat/a.txt", 0.5))
+
+
+def test_multi_key_lock_releases_all_keys(backend):
+    async def write():
+        async with backend.lock("chat/b.txt", "chat/a.txt"):
+            pass
+
+    asyncio.run(write())
+    for key in ("chat/a.txt", "chat/b.txt"):
+        backend.release_lock(backend.acquire_lock(key, 0.1))
+
+
+def test_invalidations_reach_other_workers(tmp_path):
+    writer = SQLiteCoordinationBackend(str(tmp_path))
+    reader = SQLiteCoordinationBackend(str(tmp_path))
+    received = []
+    reader.subscribe(received.extend)
+
+    writer.invalidate("chat/a.txt", "/chat/")
+    assert reader.poll_invalidations() == ["chat", "chat/a.txt"]
+    assert received == ["chat", "chat/a.txt"]
+    # A worker never receives its own invalidations back
+    assert writer.poll_invalidations() == []
+    assert reader.poll_invalidations() == []
+
+
+def test_directory_lock_waits_for_writes_below_it(backend):
+    async def scenario():
+        async with backend.lock("chat/docs/a.txt"):
+            # Writes to other paths in the same directory do not wait for each other
+            async with backend.lock("chat/docs/b.txt", timeout=0.05):
+                pass
+            # Moving or deleting the directory, or the whole chat, does
+            for directory in ("chat/docs", "chat"):
+                with pytest.raises(HTTPException) as error:
+                    async with backend.lock(directory, timeout=0.05):
+                        pass
+                assert error.value.status_code == 409
+        async with backend.lock("chat"):
+            with pytest.raises(HTTPException):
+                async with backend.lock("chat/docs/a.txt", timeout=0.05):
+                    pass
+
+    asyncio.run(scenario())
+    backend.release_lock(backend.acquire_lock("chat", 0.1))
@@ -0,0 +1,70 @@
+import asyncio
+from urllib.parse import quote
+
+import pytest
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.services import file_service as file_service_module
+from app.services.file_service import FileService
+from app.services.storage import CompressedStorage, LocalStorage, MemoryStorage
+
+NAME = "รายงาน ผลการทดสอบ.txt"
+DATA = bytes(range(256)) * 40
+
+
+@pytest.fixture(params=["memory", "compressed"])
+def service(request, tmp_path, monkeypatch):
+    # Neither backend has a local file to hand to FileResponse
+    if request.param == "memory":
+        backend = MemoryStorage()
+    else:
+        backend = CompressedStorage(LocalStorage(str(tmp_path)), ["txt"])
+    # Keep the download off the hot-file cache so it reaches the streaming path
+    monkeypatch.setattr(file_service_module.file_cache, "max_file_bytes", 0)
+    backend.write_bytes(f"chat/{NAME}", DATA)
+    return FileService(backend)
+
+
+def download(service, range_header=None):
+    async def run():
+        response = await service.download_file("chat", NAME, range_header=range_header)
+        assert isinstance(response, StreamingResponse)
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        return response, body
+
+    return asyncio.run(run())
+
+
+def test_non_ascii_filename(service):
+    response, body = download(service)
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == f"attachment; filename*=utf-8''{quote(NAME)}"
+    assert response.headers["content-length"] == str(len(DATA))
+    assert body == DATA
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=100-199", 100, 200),
+    ("bytes=10000-", 10000, len(DATA)),
+    ("bytes=-50", len(DATA) - 50, len(DATA)),
+    ("bytes=9000-999999", 9000, len(DATA)),
+])
+def test_range(service, header, start, end):
+    response, body = download(service, header)
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes {start}-{end - 1}/{len(DATA)}"
+    assert response.headers["content-length"] == str(end - start)
+    assert body == DATA[start:end]
+
+
+def test_unsatisfiable_and_ignored_ranges(service):
+    with pytest.raises(HTTPException) as error:
+        download(service, f"bytes={len(DATA)}-")
+    assert error.value.status_code == 416
+    assert error.value.headers["Content-Range"] == f"bytes */{len(DATA)}"
+
+    # Multiple or malformed ranges get the whole file
+    for header in ("bytes=0-1,5-6", "bytes=a-b", "items=0-1"):
+        response, body = download(service, header)
+        assert response.status_code == 200 and body == DATA
@@ -0,0 +1,112 @@
+from app.services.file_cache import HotFileCache
+from app.services.storage import StorageStat
+
+SIZE = 100
+
+
+def stat(key, size=SIZE, modified=1.0, inode=1):
+    return StorageStat(key=key, size=size, modified=modified, created=modified, is_dir=False, inode=inode)
+
+
+def make_cache(max_bytes=1000):
+    # A window of one file and a main segment of nine
+    return HotFileCache(max_bytes=max_bytes, max_file_bytes=SIZE, window_ratio=0.01, protected_ratio=0.8)
+
+
+def read(cache, key):
+    """What FileService does: look up, and fill the cache on a miss."""
+    s = stat(key)
+    entry = cache.get(key, s)
+    if entry is None:
+        cache.put(key, s, key.encode().ljust(SIZE, b"."))
+    return entry
+
+
+def cached(cache, key):
+    return cache._find(key) is not None
+
+
+def test_scan_does_not_evict_hot_files():
+    cache = make_cache()
+    hot = [f"chat/hot-{i}.txt" for i in range(9)]
+    for _ in range(5):
+        for key in hot:
+            read(cache, key)
+    assert cache.metrics()["hits"] == 9 * 4
+
+    # A directory scan reads many files exactly once
+    cold = [f"chat/cold-{i}.txt" for i in range(50)]
+    for key in cold:
+        read(cache, key)
+
+    assert all(cached(cache, key) for key in hot)
+    # Only the newest scanned file is left, in the window
+    assert [key for key in cold if cached(cache, key)] == cold[-1:]
+    metrics = cache.metrics()
+    assert metrics["rejections"] == 49
+    assert metrics["evictions"] == 0
+    assert metrics["used_bytes"] <= cache.max_bytes
+
+
+def test_frequent_newcomer_replaces_cold_entry():
+    cache = make_cache()
+    filler = [f"chat/f-{i}.txt" for i in range(9)]
+    for key in filler:
+        read(cache, key)
+    for _ in range(5):
+        read(cache, "chat/new.txt")
+    # The next file pushes new.txt out of the window into the full main segment
+    read(cache, "chat/next.txt")
+
+    assert cached(cache, "chat/new.txt")
+    assert not cached(cache, filler[0])
+    assert cache.metrics()["evictions"] == 1
+
+
+def test_stale_signature_is_never_served():
+    cache = make_cache()
+    cache.put("chat/a.txt", stat("chat/a.txt", size=5, modified=1.0), b"hello", text="hello", encoding="utf-8")
+    entry = cache.get("chat/a.txt", stat("chat/a.txt", size=5, modified=1.0))
+    assert entry.data == b"hello" and entry.text == "hello"
+
+    # Same size, new mtime; then same mtime, new inode (replaced by rename)
+    assert cache.get("chat/a.txt", stat("chat/a.txt", size=5, modified=2.0)) is None
+    assert not cached(cache, "chat/a.txt")
+    cache.put("chat/a.txt", stat("chat/a.txt", size=5, modified=2.0), b"howdy")
+    assert cache.get("chat/a.txt", stat("chat/a.txt", size=5, modified=2.0, inode=2)) is None
+    assert cache.metrics()["entries"] == 0
+
+
+def test_put_rejects_mismatched_or_oversized_data():
+    cache = make_cache()
+    # Data read after the stat no longer matches it
+    cache.put("chat/a.txt", stat("chat/a.txt", size=5), b"longer now")
+    cache.put("chat/big.bin", stat("chat/big.bin", size=SIZE + 1), b"x" * (SIZE + 1))
+    assert cache.metrics()["entries"] == 0
+    assert not cache.cacheable(StorageStat(key="chat", size=0, modified=1.0, created=1.0, is_dir=True))
+
+
+def test_invalidate_drops_prefix_and_discard_is_exact():
+    cache = make_cache(max_bytes=100 * SIZE)
+    keys = ["chat/a.txt", "chat/docs/b.txt", "chat/docs/sub/c.txt", "chat/docsx.txt", "other/a.txt"]
+    for key in keys:
+        read(cache, key)
+    assert all(cached(cache, key) for key in keys)
+
+    cache.invalidate("chat/docs")
+    assert [key for key in keys if cached(cache, key)] == ["chat/a.txt", "chat/docsx.txt", "other/a.txt"]
+
+    # Coordinator broadcasts carry parent directories too; they must not flush the chat
+    cache.discard(["chat", "chat/a.txt"])
+    assert [key for key in keys if cached(cache, key)] == ["chat/docsx.txt", "other/a.txt"]
+    assert cache.metrics()["invalidations"] == 3
+
+    cache.invalidate("chat/docsx.txt", "other")
+    assert cache.metrics()["entries"] == 0
+
+
+def test_disabled_cache():
+    cache = HotFileCache(max_bytes=0, max_file_bytes=SIZE, window_ratio=0.01, protected_ratio=0.8)
+    cache.put("chat/a.txt", stat("chat/a.txt", size=5), b"hello")
+    assert cache.get("chat/a.txt", stat("chat/a.txt", size=5)) is None
+    assert cache.metrics()["enabled"] is False
@@ -0,0 +1,122 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.config import get_settings
+from app.services.langflow_service import LangflowClient, LangflowIndex, LangflowService
+from scripts.mock_langflow import MockStore, create_app
+
+settings = get_settings()
+
+
+@pytest.fixture
+def store():
+    store = MockStore()
+    store.seed(sessions=5, messages_per_session=4)
+    return store
+
+
+def make_service(store, tmp_path, sessions_endpoint=True) -> LangflowService:
+    transport = httpx.ASGITransport(app=create_app(store, sessions_endpoint=sessions_endpoint))
+    client = LangflowClient("http://langflow.test", transport=transport)
+    return LangflowService(client, LangflowIndex(str(tmp_path / "index.db")))
+
+
+@pytest.fixture
+def service(store, tmp_path):
+    return make_service(store, tmp_path)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def message_count(service, session_id: str) -> int:
+    return service.index.session_messages(session_id, 1, 0)[1]
+
+
+def requests_during(store, coro):
+    store.requests.clear()
+    result = run(coro)
+    return result, list(store.requests)
+
+
+def test_first_sync_fetches_everything_at_once(service, store):
+    result, requests = requests_during(store, service.sync())
+    assert requests == ["sessions", "messages:*"]
+    assert result.sessions_synced == 5
+    assert result.messages_upserted == 20
+
+
+def test_incremental_sync_only_fetches_active_sessions(service, store):
+    run(service.sync())
+    store.add_message("session-00002", "new question")
+    store.add_message("brand-new", "hello")
+
+    result, requests = requests_during(store, service.sync())
+    # session-00002 is idle in the index; only the new session is fetched
+    assert requests == ["sessions", "messages:brand-new"]
+    assert message_count(service, "brand-new") == 1
+    assert message_count(service, "session-00002") == 4
+
+    run(service.invalidate("session-00002"))
+    result, requests = requests_during(store, service.sync())
+    assert sorted(requests) == ["messages:brand-new", "messages:session-00002", "sessions"]
+    assert message_count(service, "session-00002") == 5
+
+
+def test_periodic_full_sync_picks_up_older_sessions(service, store, monkeypatch):
+    run(service.sync())
+    store.add_message("session-00001", "late reply in an old chat")
+    run(service.sync())
+    assert message_count(service, "session-00001") == 4
+
+    monkeypatch.setattr(settings, "LANGFLOW_FULL_SYNC_INTERVAL", 0.0)
+    assert run(service.sync()).sessions_synced == 5
+    assert message_count(service, "session-00001") == 5
+    sessions = run(service.list_sessions(10, 0)).sessions
+    # The old session moves to the top of the recency order
+    assert sessions[0].session_id == "session-00001"
+    assert sessions[0].message_count == 5
+
+
+def test_removed_sessions_leave_the_index(service, store):
+    run(service.sync())
+    store.messages = [m for m in store.messages if m["session_id"] != "session-00003"]
+    assert run(service.sync()).removed == 1
+    assert "session-00003" not in [s.session_id for s in run(service.list_sessions(10, 0)).sessions]
+
+
+def test_if_stale_skips_recent_syncs(service, store, monkeypatch):
+    run(service.sync())
+    result, requests = requests_during(store, service.sync(if_stale=True))
+    assert result.skipped and requests == []
+
+    monkeypatch.setattr(settings, "LANGFLOW_SYNC_INTERVAL", 0.0)
+    result, requests = requests_during(store, service.sync(if_stale=True))
+    assert not result.skipped and requests[0] == "sessions"
+
+
+def test_pagination(service, store):
+    sessions = run(service.list_sessions(2, 1))
+    assert sessions.total == 5
+    # Most recently active first
+    assert [s.session_id for s in sessions.sessions] == ["session-00003", "session-00002"]
+    assert sessions.sessions[0].title == "User message 0 in session-0000"
+
+    page = run(service.session_messages("session-00003", 2, 1))
+    assert page.total == 4
+    assert [m.text for m in page.messages] == [
+        "Machine message 1 in session-00003", "User message 2 in session-00003"
+    ]
+
+
+def test_langflow_without_sessions_endpoint(store, tmp_path):
+    service = make_service(store, tmp_path, sessions_endpoint=False)
+    result, requests = requests_during(store, service.sync())
+    assert requests == ["messages:*"]
+    assert result.sessions_synced == 5
+    store.add_message("session-00000", "more")
+    run(service.sync())
+    assert message_count(service, "session-00000") == 5
@@ -0,0 +1,167 @@
+import dataclasses
+import hashlib
+import os
+
+import pytest
+
+moto = pytest.importorskip("moto")
+
+from app.services.checksum_service import ChecksumService
+from app.services.file_cache import HotFileCache
+from app.services.storage import make_etag
+from app.services.storage.s3 import ReadThroughCache, S3Storage
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def s3():
+    with moto.mock_aws():
+        yield
+
+
+def make_storage(tmp_path, name: str, cache: bool = True) -> S3Storage:
+    storage = S3Storage(
+        bucket="files",
+        prefix="uploads",
+        region="us-east-1",
+        access_key_id="test",
+        secret_access_key="test",
+        # S3 rejects multipart parts below 5 MiB
+        multipart_threshold=5 * MB,
+        part_size=5 * MB,
+        max_concurrency=4,
+        cache_dir=str(tmp_path / name) if cache else None
+    )
+    if "files" not in [b["Name"] for b in storage.client.list_buckets()["Buckets"]]:
+        storage.client.create_bucket(Bucket="files")
+    return storage
+
+
+def test_multipart_upload_and_parallel_read(s3, tmp_path):
+    storage = make_storage(tmp_path, "node", cache=False)
+    data = os.urandom(11 * MB + 123)
+    storage.write_bytes("chat/big.bin", data)
+
+    head = storage.client.head_object(Bucket="files", Key="uploads/chat/big.bin")
+    # Multipart ETags end in -<part count>
+    assert head["ETag"].strip('"').endswith("-3")
+    assert storage.stat("chat/big.bin").size == len(data)
+    assert storage.read_bytes("chat/big.bin") == data
+    assert b"".join(storage.iter_bytes("chat/big.bin")) == data
+
+
+def test_range_reads(s3, tmp_path):
+    storage = make_storage(tmp_path, "node")
+    data = bytes(range(256)) * 64
+    storage.write_bytes("chat/a.bin", data)
+
+    # Uncached ranges go to S3, cached ones are served from the local copy
+    assert storage.read_range("chat/a.bin", 10, 300) == data[10:300]
+    assert storage.read_range("chat/a.bin", 5, 5) == b""
+    storage.read_bytes("chat/a.bin")
+    assert storage.cache.get("chat/a.bin") is not None
+    assert storage.read_range("chat/a.bin", 1000, 5000) == data[1000:5000]
+    assert storage.read_range("chat/a.bin", len(data) - 3, len(data) + 10) == data[-3:]
+    with pytest.raises(FileNotFoundError):
+        storage.read_range("chat/missing.bin", 0, 10)
+
+
+def test_cache_sees_writes_from_other_nodes(s3, tmp_path):
+    node_a = make_storage(tmp_path, "a")
+    node_b = make_storage(tmp_path, "b")
+    node_a.write_bytes("chat/a.txt", b"first")
+    assert node_b.read_bytes("chat/a.txt") == b"first"
+    path = node_b.local_path("chat/a.txt")
+    with open(path, "rb") as f:
+        assert f.read() == b"first"
+
+    # node_b never hears about this write; the ETag check catches it
+    node_a.write_bytes("chat/a.txt", b"second version")
+    assert node_b.read_bytes("chat/a.txt") == b"second version"
+    assert node_b.read_range("chat/a.txt", 0, 6) == b"second"
+    with open(node_b.local_path("chat/a.txt"), "rb") as f:
+        assert f.read() == b"second version"
+    assert not os.path.exists(path)
+
+    node_a.delete("chat/a.txt")
+    with pytest.raises(FileNotFoundError):
+        node_b.read_bytes("chat/a.txt")
+    assert node_b.local_path("chat/a.txt") is None
+    assert node_b.cache.get("chat/a.txt") is None
+
+
+def test_stale_fill_after_invalidation_is_not_served(s3, tmp_path):
+    storage = make_storage(tmp_path, "node")
+    storage.write_bytes("chat/a.txt", b"old")
+    old_etag = storage.client.head_object(Bucket="files", Key="uploads/chat/a.txt")["ETag"]
+    storage.write_bytes("chat/a.txt", b"new")
+
+    # A read that fetched the old version finishes after the write invalidated the cache
+    storage.cache.put("chat/a.txt", old_etag, b"old")
+    assert storage.read_bytes("chat/a.txt") == b"new"
+    assert storage.cache.get("chat/a.txt")[1] != old_etag
+
+
+def test_invalidation_drops_directory_entries(s3, tmp_path):
+    storage = make_storage(tmp_path, "node")
+    for name in ("chat/a.txt", "chat/sub/b.txt", "other/c.txt"):
+        storage.write_bytes(name, b"x")
+        storage.read_bytes(name)
+
+    storage.cache.invalidate(["chat"])
+    assert storage.cache.get("chat/a.txt") is None
+    assert storage.cache.get("chat/sub/b.txt") is None
+    assert storage.cache.get("other/c.txt") is not None
+
+
+def test_cache_is_bounded(s3, tmp_path):
+    storage = make_storage(tmp_path, "node")
+    storage.cache.max_bytes = 10
+    for name in ("a", "b", "c"):
+        storage.write_bytes(f"chat/{name}", b"12345")
+        storage.read_bytes(f"chat/{name}")
+    assert storage.cache.get("chat/a") is None
+    assert storage.cache.get("chat/c") is not None
+    assert len(os.listdir(storage.cache.directory)) == 2
+
+
+def test_same_size_rewrite_changes_identity(s3, tmp_path):
+    storage = make_storage(tmp_path, "node", cache=False)
+    storage.write_bytes("chat/a.txt", b"first")
+    before = storage.stat("chat/a.txt")
+    storage.write_bytes("chat/a.txt", b"other")
+    # LastModified only has second resolution, so a quick rewrite often keeps it
+    after = dataclasses.replace(storage.stat("chat/a.txt"), modified=before.modified)
+    assert before.inode == after.inode == 0 and before.size == after.size
+
+    assert make_etag(before) != make_etag(after)
+    assert make_etag(after) == make_etag(storage.list_dir("chat")[0].stat)
+
+    files = HotFileCache(max_bytes=1000, max_file_bytes=100, window_ratio=0.5, protected_ratio=0.8)
+    files.put("chat/a.txt", before, b"first")
+    assert files.get("chat/a.txt", after) is None
+
+    checksums = ChecksumService(workers=1, chunk_size=1000, cache_entries=4)
+    checksums.checksum(storage, before)
+    assert checksums.checksum(storage, after).digest == hashlib.sha256(b"other").hexdigest()
+
+
+def test_cache_directories_are_unique_per_worker(tmp_path, monkeypatch):
+    parent = tmp_path / "cache"
+    first = ReadThroughCache(str(parent), MB)
+    first.put("chat/a.txt", '"1"', b"alpha")
+    # Another node, or a container, whose worker happens to have the same PID
+    monkeypatch.setattr("socket.gethostname", lambda: "other-node")
+    second = ReadThroughCache(str(parent), MB)
+    assert second.directory != first.directory
+    assert os.path.exists(first.get("chat/a.txt")[0])
+
+    if os.name != "posix":
+        return
+    # Directories of exited workers on this host are cleared; live ones are kept
+    stale = parent / f"{second.host}-999999999-0123456789ab"
+    stale.mkdir()
+    ReadThroughCache(str(parent), MB)
+    assert not stale.exists()
+    assert os.path.exists(second.directory) and os.path.exists(first.directory)
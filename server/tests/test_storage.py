@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from app.services.storage import LocalStorage, MemoryStorage, join_key, make_etag
+
+
+@pytest.fixture(params=["local", "memory", "s3"])
+def storage(request, tmp_path):
+    if request.param == "local":
+        yield LocalStorage(str(tmp_path / "files"))
+    elif request.param == "memory":
+        yield MemoryStorage()
+    else:
+        moto = pytest.importorskip("moto")
+        from app.services.storage.s3 import S3Storage
+
+        with moto.mock_aws():
+            backend = S3Storage(
+                bucket="files", prefix="uploads", region="us-east-1",
+                access_key_id="test", secret_access_key="test"
+            )
+            backend.client.create_bucket(Bucket="files")
+            yield backend
+
+
+def test_join_key():
+    assert join_key("") == ""
+    assert join_key("chat", "") == "chat"
+    assert join_key("/", "") == ""
+    assert join_key("/chat/", "docs\\a.txt") == "chat/docs/a.txt"
+
+
+def test_root_stat_and_list(storage):
+    root = storage.stat("")
+    assert root is not None and root.is_dir
+    assert storage.list_dir("") == []
+
+    storage.write_bytes("chat/a.txt", b"hello")
+    assert [(e.name, e.stat.is_dir) for e in storage.list_dir("")] == [("chat", True)]
+    assert [(e.key, e.stat.size) for e in storage.list_dir("chat")] == [("chat/a.txt", 5)]
+    assert storage.stat(join_key("chat", "")).is_dir
+
+
+def test_read_write_and_range(storage):
+    storage.write_bytes("chat/a.txt", b"0123456789")
+    assert storage.read_bytes("chat/a.txt") == b"0123456789"
+    assert storage.read_range("chat/a.txt", 2, 5) == b"234"
+    assert b"".join(storage.iter_bytes("chat/a.txt", chunk_size=4)) == b"0123456789"
+    with pytest.raises(FileNotFoundError):
+        storage.read_bytes("chat/missing.txt")
+
+
+def test_move_copy_delete(storage):
+    storage.write_bytes("chat/a.txt", b"a")
+    storage.copy("chat/a.txt", "chat/b.txt")
+    storage.move("chat/a.txt", "chat/sub/c.txt")
+    assert storage.stat("chat/a.txt") is None
+    assert storage.read_bytes("chat/b.txt") == b"a"
+    assert storage.read_bytes("chat/sub/c.txt") == b"a"
+    storage.delete("chat")
+    assert storage.stat("chat") is None
+
+
+def test_etag_changes_for_same_size_rewrite_within_one_mtime_tick(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    storage.write_bytes("chat/a.txt", b"first")
+    path = storage.local_path("chat/a.txt")
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+    before = make_etag(storage.stat("chat/a.txt"))
+
+    storage.write_bytes("chat/a.txt", b"other")
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+    assert make_etag(storage.stat("chat/a.txt")) != before
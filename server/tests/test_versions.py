@@ -0,0 +1,196 @@
+import asyncio
+import os
+
+import pytest
+
+from app.schemas.file import FileCopyRequest, FileMoveRequest
+from app.services.file_service import FileService
+from app.services.storage import LocalStorage
+from app.services.version_service import DIGEST_SIZE, VersionService, version_service
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+def text_file(lines: int, seed: str = "") -> bytes:
+    return "".join(f"{seed}line {i}: {'lorem ipsum ' * (i % 7)}\n" for i in range(lines)).encode()
+
+
+@pytest.fixture
+def versions(tmp_path):
+    return VersionService(str(tmp_path))
+
+
+def manifest(versions, version_id):
+    return versions._connect().execute("SELECT chunks FROM versions WHERE id = ?", (version_id,)).fetchone()[0]
+
+
+def test_append_matches_full_record(versions, tmp_path):
+    base = text_file(5000)
+    tail = text_file(300, seed="more ")
+    first = versions.record("chat", "log.txt", base, etag="e1")
+    appended = versions.record_append("chat", "log.txt", tail, base_etag="e1", etag="e2")
+
+    assert appended.id != first.id
+    assert appended.size == len(base + tail)
+    assert versions.content("chat", appended.id) == base + tail
+
+    # Same chunks and content hash as chunking the whole file
+    reference = VersionService(str(tmp_path / "reference")).record("chat", "log.txt", base + tail)
+    assert appended.manifest_hash == reference.manifest_hash
+    assert manifest(versions, appended.id)[:-DIGEST_SIZE * 2] == manifest(versions, first.id)[:-DIGEST_SIZE * 2]
+
+
+def test_append_without_trailing_newline(versions):
+    versions.record("chat", "a.txt", b"partial line", etag="e1")
+    record = versions.record_append("chat", "a.txt", b" continued\nnext\n", base_etag="e1", etag="e2")
+    assert versions.content("chat", record.id) == b"partial line continued\nnext\n"
+
+
+def test_append_needs_matching_latest_version(versions):
+    assert versions.record_append("chat", "a.txt", b"x", base_etag="e1") is None
+    versions.record("chat", "a.txt", b"content\n", etag="e1")
+    # Changed outside the API since the last version
+    assert versions.record_append("chat", "a.txt", b"x", base_etag="e-other") is None
+
+
+def test_edit_cost_includes_manifest(versions):
+    data = text_file(60000)
+    versions.record("chat", "big.txt", data)
+    before = versions.stored_bytes()
+    edited = data.replace(b"line 30000:", b"LINE 30000:")
+    record = versions.record("chat", "big.txt", edited)
+    added = versions.stored_bytes() - before
+
+    manifest_bytes = len(manifest(versions, record.id))
+    assert manifest_bytes == DIGEST_SIZE * (manifest_bytes // DIGEST_SIZE)
+    # One rewritten chunk (compressed) plus a full manifest for the new version
+    assert manifest_bytes < added < manifest_bytes + settings.VERSION_CHUNK_SIZE * 4
+
+
+def recount(versions):
+    return versions._connect().execute(
+        "SELECT (SELECT COALESCE(SUM(stored_size), 0) FROM chunks) + "
+        "(SELECT COALESCE(SUM(LENGTH(chunks)), 0) FROM versions)"
+    ).fetchone()[0]
+
+
+def test_stored_bytes_is_a_running_total(versions, monkeypatch):
+    monkeypatch.setattr(settings, "VERSION_MAX_COUNT", 3)
+    statements = []
+    versions._connect().set_trace_callback(statements.append)
+    for i in range(6):
+        versions.record("chat", "a.txt", text_file(2000, seed=f"v{i} "))
+        versions.record("chat", "b.txt", text_file(500 + i))
+    versions._connect().set_trace_callback(None)
+    # Retention reads the total instead of scanning the chunk store on every write
+    assert not [sql for sql in statements if "SUM(" in sql]
+    assert len(versions.list_versions("chat", "a.txt")) == 3
+    assert versions.stored_bytes() == recount(versions)
+
+    monkeypatch.setattr(settings, "VERSION_MAX_BYTES", versions.stored_bytes() // 2)
+    versions.record("chat", "c.txt", text_file(100))
+    assert versions.stored_bytes() == recount(versions) <= settings.VERSION_MAX_BYTES
+
+    versions.purge_chat("chat")
+    assert versions.stored_bytes() == recount(versions) == 0
+
+
+def test_stored_bytes_initialised_for_existing_store(tmp_path):
+    versions = VersionService(str(tmp_path))
+    versions.record("chat", "a.txt", text_file(1000))
+    # A store from before the running total existed
+    versions._connect().execute("DROP TABLE meta")
+    assert VersionService(str(tmp_path)).stored_bytes() == recount(versions) > 0
+
+
+def test_manifest_hash_column_renamed_for_existing_store(tmp_path):
+    versions = VersionService(str(tmp_path))
+    record = versions.record("chat", "a.txt", text_file(1000))
+    versions._connect().execute("ALTER TABLE versions RENAME COLUMN manifest_hash TO content_hash")
+    reopened = VersionService(str(tmp_path))
+    assert reopened.latest("chat", "a.txt").manifest_hash == record.manifest_hash
+    # Same content, same manifest: no new version
+    assert reopened.record("chat", "a.txt", text_file(1000)).id == record.id
+
+
+class CountingStorage(LocalStorage):
+    reads = 0
+
+    def read_bytes(self, key):
+        CountingStorage.reads += 1
+        return super().read_bytes(key)
+
+
+def test_file_service_append_does_not_reread_file():
+    service = FileService(CountingStorage(settings.UPLOAD_DIR))
+
+    async def run():
+        await service.write_file("append-chat", "log.txt", content="first\n" * 1000)
+        reads = CountingStorage.reads
+        for i in range(5):
+            await service.write_file("append-chat", "log.txt", content=f"entry {i}\n", mode="append")
+        assert CountingStorage.reads == reads
+
+    asyncio.run(run())
+    history = version_service.list_versions("append-chat", "log.txt")
+    assert len(history) == 6
+    with open(os.path.join(settings.UPLOAD_DIR, "append-chat", "log.txt"), "rb") as f:
+        assert version_service.content("append-chat", history[0].id) == f.read()
+
+
+def history(chat_id, path):
+    return [(r.source, version_service.content(chat_id, r.id)) for r in version_service.list_versions(chat_id, path)]
+
+
+def test_copy_over_existing_file_keeps_its_content():
+    service = FileService(LocalStorage(settings.UPLOAD_DIR))
+    chat_dir = os.path.join(settings.UPLOAD_DIR, "copy-chat")
+
+    async def run():
+        await service.write_file("copy-chat", "a.txt", content="A")
+        await service.write_file("copy-chat", "b.txt", content="B")
+        # c.txt predates versioning
+        with open(os.path.join(chat_dir, "c.txt"), "w") as f:
+            f.write("C")
+        for destination in ("b.txt", "c.txt", "new.txt"):
+            await service.copy_file("copy-chat", FileCopyRequest(chat_id="copy-chat", source="a.txt", destination=destination))
+
+    asyncio.run(run())
+    assert history("copy-chat", "b.txt") == [("copy", b"A"), ("write", b"B")]
+    assert history("copy-chat", "c.txt") == [("copy", b"A"), ("baseline", b"C")]
+    assert history("copy-chat", "new.txt") == [("copy", b"A")]
+
+
+def test_move_over_existing_file_does_not_interleave_histories():
+    service = FileService(LocalStorage(settings.UPLOAD_DIR))
+
+    def move(source, destination):
+        return service.move_file("move-chat", FileMoveRequest(chat_id="move-chat", source=source, destination=destination))
+
+    async def run():
+        await service.write_file("move-chat", "a.txt", content="A1")
+        await service.write_file("move-chat", "b.txt", content="B1")
+        await service.write_file("move-chat", "a.txt", content="A2")
+        await service.write_file("move-chat", "b.txt", content="B2")
+        await move("a.txt", "b.txt")
+        await service.write_file("move-chat", "d.txt", content="D")
+        await move("d.txt", "e.txt")
+
+    asyncio.run(run())
+    # The destination's history continues; the moved file's history stays under its old path
+    assert history("move-chat", "b.txt") == [("move", b"A2"), ("write", b"B2"), ("write", b"B1")]
+    assert history("move-chat", "a.txt") == [("write", b"A2"), ("write", b"A1")]
+    # Without a collision the history follows the file
+    assert history("move-chat", "e.txt") == [("write", b"D")]
+    assert history("move-chat", "d.txt") == []
+
+
+def test_rename_directory_skips_colliding_paths(versions):
+    versions.record("chat", "src/a.txt", b"src a")
+    versions.record("chat", "src/sub/b.txt", b"src b")
+    versions.record("chat", "dst/a.txt", b"dst a")
+    versions.rename("chat", "src", "dst")
+    assert [versions.content("chat", r.id) for r in versions.list_versions("chat", "dst/a.txt")] == [b"dst a"]
+    assert [versions.content("chat", r.id) for r in versions.list_versions("chat", "src/a.txt")] == [b"src a"]
+    assert [versions.content("chat", r.id) for r in versions.list_versions("chat", "dst/sub/b.txt")] == [b"src b"]